@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import SyntheticCorridor
+from config import Config
+from src.file_handling.las import LAS
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+
+# Config fields recorded with every report, so results can be compared across releases
+REPORTED_FIELDS = (
+    "LAS_READER", "CHUNK_SIZE", "STREAM_INGESTION", "USE_CACHE", "LAZY_SEGMENTS", "DISTANCE_UNITS",
+    "SEGMENTATION_MODE", "TILE_SIZE", "SPLIT_SCALE_FACTOR", "VOXEL_PLACEMENT", "PLANE_FITTING", "DISTANCE_THRESHOLD",
+    "NUM_ITERATIONS", "RANSAC_BACKEND", "RANSAC_CONFIDENCE", "RANSAC_BATCH_SIZE", "NUM_WORKERS", "SD_THRESHOLD",
+)
+
+logger = Logger.get_logger(__name__)
+
+
+def run_pipeline(file_path: str) -> LAS:
+    """
+    Runs the LAS pipeline on one file: opening, segmentation, plane fitting and flagging in the constructor, and
+    merging the inliers of the segments within the SD threshold
+    :param file_path:
+    :return: The parent LAS object
+    """
+    las = LAS(file_path)
+    las.merge_segmented_pc(as_numpy=True)
+    return las
+
+
+def benchmark_file(file_path: str) -> dict:
+    """
+    Runs the pipeline twice on one file. The stages are timed by Metrics in the first pass, and the peak traced
+    memory of the run and of each stage is measured in the second pass, so tracing does not slow down the timed
+    stages
+    :param file_path:
+    :return: The measurements of the run and of each stage
+    """
+    enabled = Metrics.enabled()
+    Metrics.reset()
+    Metrics.enable()
+
+    try:
+        start = time.perf_counter()
+        las = run_pipeline(file_path)
+        seconds = time.perf_counter() - start
+        metrics = Metrics.report()
+        Metrics.reset()
+
+        if Config.USE_CACHE.value:
+            logger.warning("The cache is enabled, so the memory pass loads the stages stored by the timed pass")
+
+        tracemalloc.start()
+        try:
+            with Metrics.timer("pipeline"):  # Every stage records its own peak while tracemalloc is tracing
+                run_pipeline(file_path)
+        finally:
+            tracemalloc.stop()
+
+        traced_stages = Metrics.report()["stages"]
+        peak_traced_bytes = traced_stages.pop("pipeline")["peak_traced_bytes"]
+    finally:
+        Metrics.enable(enabled)
+        Metrics.reset()
+
+    for name, stage in metrics["stages"].items():
+        stage["peak_traced_bytes"] = traced_stages.get(name, {}).get("peak_traced_bytes")
+
+    return {
+        "points": len(las.points),
+        "segments": len(las.segment_table),
+        "flagged_segments": int(las.segment_table.flags.sum()),
+        "file_bytes": os.path.getsize(file_path),
+        "seconds": seconds,
+        "points_per_second": len(las.points) / seconds if seconds > 0 else None,
+        "peak_traced_bytes": peak_traced_bytes,
+        "max_rss_bytes": metrics["gauges"].get("max_rss_bytes"),  # High-water mark of the timed pass
+        "stages": metrics["stages"],
+        "counters": metrics["counters"],
+    }
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks each stage of the LAS pipeline on synthetic corridors")
+    parser.add_argument("--points", type=float, nargs="+", default=[1e5, 1e6], help="Point counts to benchmark")
+    parser.add_argument("--bump-height", type=float, default=0.1, help="Height of the speed bumps in metres")
+    parser.add_argument("--bump-count", type=int, default=5, help="No. of speed bumps in each corridor")
+    parser.add_argument("--seed", type=int, default=Config.RANDOM_SEED.value, help="Seed of the generator")
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON report")
+    parser.add_argument("--work-dir", default=None, help="Folder for the generated files, a temporary folder if unset")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {field: Config[field].value for field in REPORTED_FIELDS},
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        work_dir = args.work_dir or temporary_dir
+
+        for point_count in args.points:
+            file_path = os.path.join(work_dir, f"corridor_{int(point_count)}_{args.seed}.las")
+
+            if not os.path.exists(file_path):
+                SyntheticCorridor(
+                    int(point_count),
+                    bump_count=args.bump_count,
+                    bump_height=args.bump_height,
+                    seed=args.seed
+                ).write(file_path)
+
+            run = benchmark_file(file_path)
+            run["bump_height"] = args.bump_height
+            run["bump_count"] = args.bump_count
+            report["runs"].append(run)
+
+            print(f"{run['points']} points in {run['seconds']:.3f}s: " + ", ".join(
+                f"{name} {stage['seconds']:.3f}s" for name, stage in run["stages"].items()
+            ))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import laspy
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+
+
+class SyntheticCorridor:
+    __point_count: int
+    __bump_height: float
+
+    def __init__(
+            self,
+            point_count: int,
+            length: float = 1000.0,
+            width: float = 8.0,
+            bump_count: int = 5,
+            bump_height: float = 0.1,
+            bump_length: float = 4.0,
+            noise: float = 0.01,
+            seed: int = Config.RANDOM_SEED.value,
+            chunk_size: int = Config.CHUNK_SIZE.value
+    ) -> None:
+        """
+        Deterministic generator of a straight road corridor with evenly spaced speed bumps. Points are ordered along
+        the road, like a drive capture, and all lengths are in metres
+        :param point_count: No. of points to generate
+        :param length: Length of the road
+        :param width: Width of the road
+        :param bump_count: No. of speed bumps, evenly spaced along the road
+        :param bump_height: Height of the speed bumps
+        :param bump_length: Length of the speed bumps along the road
+        :param noise: SD of the gaussian noise added to z
+        :param seed: Seed of the random generator, chunk i is generated with seed + i
+        :param chunk_size: No. of points generated and written at a time
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.point_count = point_count
+        self.length = length
+        self.width = width
+        self.bump_count = bump_count
+        self.bump_height = bump_height
+        self.bump_length = bump_length
+        self.noise = noise
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    @property
+    def point_count(self) -> int:
+        return self.__point_count
+
+    @point_count.setter
+    def point_count(self, point_count: int) -> None:
+        if point_count <= 0:
+            raise ValueError("Point count must be larger than 0")
+
+        self.__point_count = int(point_count)
+
+    @property
+    def bump_height(self) -> float:
+        return self.__bump_height
+
+    @bump_height.setter
+    def bump_height(self, bump_height: float) -> None:
+        if bump_height < 0:
+            raise ValueError("Bump height cannot be negative")
+
+        self.__bump_height = bump_height
+
+    @property
+    def bump_centers(self) -> np.ndarray:
+        """
+        Returns the distance along the road to the center of each speed bump
+        :return:
+        """
+        return (np.arange(self.bump_count) + 1) * self.length / (self.bump_count + 1)
+
+    def chunk(self, i: int) -> np.ndarray:
+        """
+        Generates chunk i of the corridor
+        :param i:
+        :return: (n, 3) array of coordinates in metres
+        """
+        start = i * self.chunk_size
+        end = min(start + self.chunk_size, self.point_count)
+        rng = np.random.default_rng(self.seed + i)
+
+        x = (np.arange(start, end) + rng.random(end - start)) * self.length / self.point_count
+        y = rng.uniform(-self.width / 2, self.width / 2, end - start)
+        z = 100.0 + 0.01 * x - 0.02 * np.abs(y)  # Gentle grade and crossfall from the centre line
+
+        if self.bump_count > 0 and self.bump_height > 0:
+            spacing = self.length / (self.bump_count + 1)
+            nearest = np.clip(np.rint(x / spacing) - 1, 0, self.bump_count - 1)
+            distance = x - (nearest + 1) * spacing
+            on_bump = np.abs(distance) < self.bump_length / 2
+            z[on_bump] += self.bump_height * np.cos(np.pi * distance[on_bump] / self.bump_length) ** 2
+
+        z += rng.normal(0, self.noise, end - start)
+        return np.column_stack((x, y, z))
+
+    def write(self, file_path: str) -> None:
+        """
+        Writes the corridor to a LAS file, one chunk at a time
+        :param file_path:
+        :return:
+        """
+        header = laspy.LasHeader(point_format=1, version="1.2")
+        header.scales = np.array([0.001, 0.001, 0.001])  # Millimetre resolution
+        header.offsets = np.array([0.0, 0.0, 0.0])
+
+        self.logger.info(f"Writing {self.point_count} synthetic points to {file_path}")
+        with laspy.open(file_path, mode="w", header=header) as writer:
+            for i in range((self.point_count + self.chunk_size - 1) // self.chunk_size):
+                points = self.chunk(i)
+                record = laspy.ScaleAwarePointRecord.zeros(len(points), header=header)
+                record.x, record.y, record.z = points[:, 0], points[:, 1], points[:, 2]
+                writer.write_points(record)
@@ -4,6 +4,34 @@ from enum import Enum
 
 
 class Config(Enum):
+    def __new__(cls, *setting) -> 'Config':
+        """
+        Keys every member by its position instead of its setting, so settings with equal values, such as the False
+        flags, are separate members instead of aliases of each other. The setting itself is returned by value
+        :param setting: The setting, unpacked if it is a tuple
+        """
+        member = object.__new__(cls)
+        member._value_ = cls.__name__, len(cls.__members__)  # Never equal to a setting
+        member.__setting = setting[0] if len(setting) == 1 else setting
+        return member
+
+    @classmethod
+    def _missing_(cls, value: object) -> 'Config | None':
+        """
+        Looks a member up by its setting, so Config(value) works as for a plain Enum. Of the members with an equal
+        setting of the same type, the first one defined is returned, like the canonical member of aliases
+        :param value:
+        :return:
+        """
+        return next((member for member in cls if type(member.value) is type(value) and member.value == value), None)
+
+    @property
+    def value(self) -> object:
+        return self.__setting
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}.{self.name}: {self.value!r}>"
+
     # PATHS
     ROOT_DIR = os.path.dirname(os.path.abspath(__file__))  # Path to project root
     SOURCE_DIR = os.path.join(ROOT_DIR, "src")  # Path to source folder
@@ -11,23 +39,64 @@ class Config(Enum):
 
     DATA_DIR = os.path.join(ROOT_DIR, "data")  # Path to data folder
     SPEEDBUMP_DATA_PATH = os.path.join(DATA_DIR, "speedbump_lidar.las")  # Path to speedbump lidar data
+    CACHE_DIR = os.path.join(ROOT_DIR, "cache")  # Path to cache folder
+    METRICS_PATH = os.path.join(ROOT_DIR, "metrics.json")  # Metrics report, Prometheus text if it ends with .prom
 
     # SETTINGS
     # General settings
     LOGGING_LEVEL = logging.INFO  # Logging level
     SHOW_NORMAL_VECTORS = False  # Whether to show normal vectors in the 3D viewer
+    BATCH_WORKERS = 4  # Number of tiles processed at the same time by batch.py
+    METRICS_ENABLED = False  # Whether to collect stage timings and counters, exported to METRICS_PATH
+
+    # Ingestion settings
+    LAS_READER = "chunked"  # How LAS files are read; either 'chunked' or 'mmap' (uncompressed files only)
+    STREAM_INGESTION = False  # Whether to segment the LAS file block by block as it is read, spilling points to disk
+    PIPELINE_WORKERS = 2  # Processes fitting streamed blocks while a reader thread decodes the next ones, 0 for none
+    PIPELINE_QUEUE_SIZE = 8  # Max no. of streamed blocks waiting to be fitted, bounding the memory of the pipeline
+    CHUNK_SIZE = 1_000_000  # No. of points decoded per chunk when reading LAS files
+    DISTANCE_UNITS = "raw"  # Units of the distance settings below; either 'raw' (integer steps of the file) or 'metres'
+
+    # Cache settings
+    USE_CACHE = False  # Whether to cache decoded points, segments and plane fits between runs
+    CACHE_MAX_BYTES = 10 * 1024 ** 3  # Maximum size of the cache folder before old entries are evicted
 
     # Voxel grid settings
     VOXEL_SIZE = 1e3  # Voxel size for downsampling
+    VOXEL_MODE = "centroid"  # Point kept per voxel; either 'centroid', 'first' or 'random'
+    VOXEL_PLACEMENT = "none"  # Either 'none', 'global' (before segmentation) or 'segment' (before RANSAC)
 
     # RANSAC settings
     DISTANCE_THRESHOLD = 175  # Distance threshold for RANSAC algorithm
     RANSAC_N = 3  # Number of points to sample for RANSAC algorithm
     NUM_ITERATIONS = 150  # Number of iterations for RANSAC algorithm
+    RANSAC_BACKEND = "open3d"  # Plane fitting engine; either 'open3d' or 'numpy'
+    RANSAC_CONFIDENCE = 0.999  # Confidence target of the numpy engine, used to stop before NUM_ITERATIONS
+    RANSAC_BATCH_SIZE = 32  # No. of hypotheses the numpy engine scores at a time
+    NUM_WORKERS = 1  # Number of processes used to fit the segment planes, 1 fits them in the current process
+    RANDOM_SEED = 42  # Base seed for RANSAC, segment i is fitted with RANDOM_SEED + i
+
+    # Sliding window settings
+    PLANE_FITTING = "ransac"  # Either 'ransac' (one plane per segment) or 'sliding_window' (overlapping windows)
+    WINDOW_SIZE = 4500  # No. of points in each sliding window, rounded to a whole no. of strides
+    WINDOW_STRIDE = 900  # No. of points between two windows; each block of this many points is flagged separately
 
     # Plane split settings
     SPLIT_SCALE_FACTOR = 3e-3  # Scaling factor for splitting the point cloud into smaller dataframes [0, 1]
+    LAZY_SEGMENTS = False  # Fits the segment planes and flags the segments the first time they are needed
+    SEGMENT_CACHE_SIZE = 4096  # No. of segments whose point cloud and plane are kept in memory, None for no limit
+    SEGMENTATION_MODE = "index"  # How the point cloud is split into segments; either 'index', 'grid' or 'along_track'
+    SPATIAL_CELL_SIZE = 5e2  # Side length of the cells of the spatial index, in point cloud units
+    TILE_SIZE = 2e3  # Side length of grid tiles and length of along-track bins, in point cloud units
+
+    # Detection
+    MIN_RUN_LENGTH = 2  # Minimum no. of consecutive flagged segments in a speed bump event
+    MAX_RUN_LENGTH = None  # Maximum no. of consecutive flagged segments in a speed bump event, None for no limit
+
+    # Export
+    FLAGGED_CLASSIFICATION = 31  # Classification of flagged points in exported files, unused by the ASPRS classes
 
     # Thresholds
+    MEAN_THRESHOLD = float("-inf"), float("inf")  # No segments are filtered out by their mean by default
     SE_THRESHOLD = 1.8, 2.3
     SD_THRESHOLD = 430, 435
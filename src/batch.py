@@ -0,0 +1,198 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from config import Config
+from src.file_handling.las import LAS
+from src.logger.logger import Logger
+from src.processing.detection import EventDetector
+
+logger = Logger.get_logger(__name__)
+
+
+def find_tiles(source: str) -> list[str]:
+    """
+    Finds the LAS files in a folder, or the files matching a glob pattern
+    :param source: Folder or glob pattern
+    :return: Sorted file paths
+    """
+    pattern = os.path.join(source, "*.las") if os.path.isdir(source) else source
+    return sorted(path for path in glob.glob(pattern) if path.lower().endswith(".las"))
+
+
+def report_path(file_path: str, output_dir: str) -> str:
+    """
+    Returns the path of the report of a tile. The name holds a hash of the absolute tile path, so tiles with the
+    same name in different folders get different reports
+    :param file_path:
+    :param output_dir:
+    :return:
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    digest = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:12]
+    return os.path.join(output_dir, f"{name}_{digest}.json")
+
+
+def tile_report(las: LAS) -> dict:
+    """
+    Summarises the flagged segments of a processed LAS object. Coordinates, means and SDs are given in metres
+    :param las:
+    :return:
+    """
+    segment_table, frame = las.segment_table, las.frame
+    flagged = np.flatnonzero(segment_table.flags)
+    starts = segment_table.offsets[:-1][flagged]
+
+    points = segment_table.points
+    minimums = frame.to_metres(np.minimum.reduceat(points, segment_table.offsets[:-1], axis=0)[flagged]) \
+        if len(points) else []
+    maximums = frame.to_metres(np.maximum.reduceat(points, segment_table.offsets[:-1], axis=0)[flagged]) \
+        if len(points) else []
+
+    return {
+        "file": las.file_path,
+        "points": len(points),
+        "segments": len(segment_table),
+        "units": "metres",
+        "events": EventDetector().detect(segment_table).to_records(frame),
+        "flagged_segments": [
+            {
+                "segment": int(i),
+                "start": int(start),
+                "points": int(segment_table.lengths[i]),
+                "inliers": int(segment_table.inlier_counts[i]),
+                "mean": float(frame.coordinate_metres(segment_table.means[i])),
+                "SD": float(frame.metres(segment_table.SDs[i])),
+                "residual_SD": float(frame.metres(segment_table.residual_SDs[i])),
+                "min": [float(value) for value in minimum],
+                "max": [float(value) for value in maximum],
+            } for i, start, minimum, maximum in zip(flagged, starts, minimums, maximums)
+        ],
+    }
+
+
+def process_tile(file_path: str, output_dir: str) -> dict:
+    """
+    Processes one tile without opening a viewer and writes its report
+    :param file_path:
+    :param output_dir:
+    :return: Summary of the tile
+    """
+    start = time.perf_counter()
+    report = tile_report(LAS(file_path=file_path))
+    report["seconds"] = time.perf_counter() - start
+
+    path = report_path(file_path, output_dir)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(f"{path}.tmp", path)  # Reports are only visible when complete
+
+    return {
+        "file": file_path,
+        "report": path,
+        "points": report["points"],
+        "segments": report["segments"],
+        "flagged_segments": len(report["flagged_segments"]),
+        "events": len(report["events"]),
+        "seconds": report["seconds"],
+    }
+
+
+def read_progress(progress_path: str) -> dict[str, dict]:
+    """
+    Reads the summaries of the tiles finished by earlier runs
+    :param progress_path:
+    :return: Summaries by absolute file path
+    """
+    finished = {}
+
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut short by a crash
+
+                if entry.get("status") == "done" and os.path.exists(entry["report"]):
+                    finished[os.path.abspath(entry["file"])] = entry
+
+    return finished
+
+
+def run(source: str, output_dir: str, workers: int = Config.BATCH_WORKERS.value, resume: bool = True) -> dict:
+    """
+    Processes all tiles in parallel, skipping tiles finished by an earlier run when resuming
+    :param source: Folder or glob pattern
+    :param output_dir: Folder for the tile reports, the progress file and the summary
+    :param workers: No. of tiles processed at the same time
+    :param resume: Whether to skip tiles that are already finished
+    :return: The merged summary
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    progress_path = os.path.join(output_dir, "progress.jsonl")
+
+    if not resume and os.path.exists(progress_path):
+        os.remove(progress_path)
+
+    tiles = find_tiles(source)
+    finished = read_progress(progress_path)
+    pending = [tile for tile in tiles if os.path.abspath(tile) not in finished]  # Whatever path or pattern found them
+    failed = {}
+    logger.info(f"Found {len(tiles)} tiles, {len(finished)} already finished")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(progress_path, "a") as progress:
+        futures = {executor.submit(process_tile, tile, output_dir): tile for tile in pending}
+
+        for future in as_completed(futures):
+            tile = futures[future]
+
+            try:
+                entry = {"status": "done", **future.result()}
+                finished[os.path.abspath(tile)] = entry
+                logger.info(f"Finished {tile} ({len(finished)}/{len(tiles)})")
+            except Exception as e:
+                entry = {"status": "failed", "file": tile, "error": repr(e)}
+                failed[tile] = entry
+                logger.error(f"Failed {tile}: {e!r}")
+
+            progress.write(json.dumps(entry) + "\n")
+            progress.flush()  # Progress survives a crash of the batch
+
+    summary = {
+        "tiles": len(tiles),
+        "finished": len(finished),
+        "failed": list(failed.values()),
+        "points": sum(entry["points"] for entry in finished.values()),
+        "flagged_segments": sum(entry["flagged_segments"] for entry in finished.values()),
+        "events": sum(entry.get("events", 0) for entry in finished.values()),
+        "results": [finished[path] for path in map(os.path.abspath, tiles) if path in finished],
+    }
+
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    return summary
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Flags speed bumps in many LAS tiles without opening a viewer")
+    parser.add_argument("source", help="Folder with LAS files or a glob pattern")
+    parser.add_argument("--output-dir", default="batch_output", help="Folder for the reports")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_WORKERS.value, help="No. of parallel tiles")
+    parser.add_argument("--restart", action="store_true", help="Process all tiles again instead of resuming")
+    args = parser.parse_args(argv)
+
+    summary = run(args.source, args.output_dir, workers=args.workers, resume=not args.restart)
+    print(f"Finished {summary['finished']}/{summary['tiles']} tiles, {len(summary['failed'])} failed, "
+          f"{summary['flagged_segments']} flagged segments, {summary['events']} events")
+
+
+if __name__ == "__main__":
+    main()
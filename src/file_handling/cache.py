@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+
+
+class PipelineCache:
+    __cache_dir: str
+    __max_bytes: int
+
+    # Config fields that affect the output of each stage. A stage is invalidated when any of its fields change
+    STAGE_FIELDS = {
+        "points": (),
+        "segments": (
+            "SEGMENTATION_MODE", "TILE_SIZE", "SPLIT_SCALE_FACTOR", "DISTANCE_UNITS",
+            "VOXEL_SIZE", "VOXEL_MODE", "VOXEL_PLACEMENT", "RANDOM_SEED",
+            "PLANE_FITTING", "WINDOW_STRIDE", "STREAM_INGESTION",
+        ),
+        "planes": (
+            "SEGMENTATION_MODE", "TILE_SIZE", "SPLIT_SCALE_FACTOR", "DISTANCE_UNITS",
+            "VOXEL_SIZE", "VOXEL_MODE", "VOXEL_PLACEMENT",
+            "DISTANCE_THRESHOLD", "RANSAC_N", "NUM_ITERATIONS", "RANDOM_SEED",
+            "RANSAC_BACKEND", "RANSAC_CONFIDENCE", "RANSAC_BATCH_SIZE",
+            "PLANE_FITTING", "WINDOW_SIZE", "WINDOW_STRIDE", "STREAM_INGESTION",
+        ),
+    }
+
+    def __init__(
+            self,
+            cache_dir: str = Config.CACHE_DIR.value,
+            max_bytes: int = Config.CACHE_MAX_BYTES.value
+    ) -> None:
+        """
+        Stores the arrays produced by each pipeline stage as .npy files, keyed by the content hash of the input file
+        and the Config fields of the stage. The least recently used entries are evicted when the cache grows larger
+        than max_bytes
+        :param cache_dir: Folder the cache entries are stored in
+        :param max_bytes: Maximum total size of the cache
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def cache_dir(self) -> str:
+        return self.__cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, cache_dir: str) -> None:
+        if not cache_dir:
+            raise TypeError("Cache folder cannot be empty")
+
+        self.__cache_dir = cache_dir
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes: int) -> None:
+        if max_bytes <= 0:
+            raise ValueError("Maximum cache size must be larger than 0")
+
+        self.__max_bytes = max_bytes
+
+    def file_hash(self, file_path: str) -> str:
+        """
+        Calculates the SHA-256 hash of the file content. Hashes are remembered by path, size and modification time,
+        so unchanged files are only read once. Each hash is kept in its own file, so processes hashing different
+        files at the same time do not overwrite each other's hashes
+        :param file_path:
+        :return:
+        """
+        stat = os.stat(file_path)
+        hash_index_key = f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        hash_path = os.path.join(self.cache_dir, f"{hashlib.sha256(hash_index_key.encode()).hexdigest()[:32]}.sha256")
+
+        try:
+            with open(hash_path) as f:
+                file_hash = f.read().strip()
+
+            if len(file_hash) == 64:
+                return file_hash
+        except OSError:
+            pass  # Not hashed yet, or removed since
+
+        self.logger.info(f"Hashing {file_path}")
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+
+        file_hash = sha256.hexdigest()
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as f:
+            f.write(file_hash)
+
+        os.replace(temporary_path, hash_path)  # Readers see either no hash or the complete hash
+        return file_hash
+
+    def stage_key(self, stage: str, file_hash: str) -> str:
+        """
+        Calculates the cache key of a stage from the file hash and the current values of the stage's Config fields
+        :param stage:
+        :param file_hash:
+        :return:
+        """
+        if stage not in PipelineCache.STAGE_FIELDS:
+            raise ValueError(f"Stage must be one of {', '.join(PipelineCache.STAGE_FIELDS)}")
+
+        fields = {field: Config[field].value for field in PipelineCache.STAGE_FIELDS[stage]}
+        payload = json.dumps([stage, file_hash, fields], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def load(self, stage: str, key: str) -> dict[str, np.ndarray] | None:
+        """
+        Loads the arrays of a cache entry as read-only memory maps
+        :param stage:
+        :param key:
+        :return: The arrays by name, or None if the entry does not exist
+        """
+        entry_dir = self.__entry_dir(stage, key)
+
+        try:
+            arrays = {
+                filename[:-len(".npy")]: np.load(os.path.join(entry_dir, filename), mmap_mode="r")
+                for filename in os.listdir(entry_dir) if filename.endswith(".npy")
+            }
+            os.utime(entry_dir)  # Marking the entry as recently used
+        except FileNotFoundError:
+            self.logger.debug("Cache miss for %s stage", stage)
+            return None  # Never stored, or evicted by another process while loading
+        except (OSError, ValueError) as error:
+            self.logger.warning(f"Ignoring unreadable {stage} cache entry: {error}")
+            return None
+
+        self.logger.info(f"Loaded {stage} stage from cache")
+        return arrays
+
+    def store(self, stage: str, key: str, arrays: dict[str, np.ndarray]) -> None:
+        """
+        Stores the arrays of a stage and evicts the least recently used entries if the cache is too large
+        :param stage:
+        :param key:
+        :param arrays: The arrays by name
+        :return:
+        """
+        entry_dir = self.__entry_dir(stage, key)
+        temporary_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=f"{stage}-{key}.", suffix=".tmp")
+
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(temporary_dir, f"{name}.npy"), np.asarray(array))
+
+            os.replace(temporary_dir, entry_dir)  # Entries become visible only when they are complete
+            self.logger.debug("Stored %s stage in cache", stage)
+        except OSError:
+            if not os.path.isdir(entry_dir):
+                raise
+
+            self.logger.debug("%s stage was stored by another process", stage)  # Same key, so the same arrays
+        finally:
+            shutil.rmtree(temporary_dir, ignore_errors=True)
+
+        self.__evict()
+
+    def __entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{key}")
+
+    def __evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache is smaller than the maximum size
+        :return:
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(entry_dir) or name.endswith(".tmp"):
+                continue
+
+            try:
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+                entries.append((os.stat(entry_dir).st_mtime, size, entry_dir))
+            except FileNotFoundError:
+                continue  # Evicted by another process
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+
+            evicted_dir = tempfile.mkdtemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                os.replace(entry_dir, os.path.join(evicted_dir, "entry"))  # Loaders see the whole entry or nothing
+                total_size -= size
+                self.logger.info(f"Evicted {os.path.basename(entry_dir)} from cache")
+            except FileNotFoundError:
+                pass  # Evicted by another process
+            finally:
+                shutil.rmtree(evicted_dir, ignore_errors=True)
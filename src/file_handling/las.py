@@ -1,23 +1,43 @@
-import math
+from __future__ import annotations
+
+import tempfile
+from collections.abc import Sequence
 from dataclasses import dataclass
 
-import laspy
 import numpy as np
-import open3d as o3d
-import pandas as pd
-from tqdm import tqdm
 
 from config import Config
+from src.file_handling.cache import PipelineCache
 from src.file_handling.file_handler import FileHandler
+from src.file_handling.las_reader import LASChunkReader, LASMemmapReader
+from src.file_handling.las_writer import LASChunkWriter
+from src.lazy_module import LazyModule
 from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+from src.model.coordinate_frame import CoordinateFrame
 from src.model.plane import Plane
+from src.model.running_statistics import RunningStatistics
+from src.model.segment_table import SegmentSequence, SegmentTable, SegmentView
+from src.processing.downsampling import VoxelDownsampler
+from src.processing.pipeline import BlockPipeline
+from src.processing.plane_fitting import PlaneFitter
+from src.processing.sliding_window import SlidingWindowFitter
+from src.processing.spatial_index import SpatialIndex
+from src.processing.tiling import Tiler
+
+o3d = LazyModule("open3d")  # Only imported when a point cloud is created or displayed
+tqdm = LazyModule("tqdm")
 
 
 @dataclass
 class LAS(FileHandler):
+    __points: np.ndarray
     __point_cloud: o3d.geometry.PointCloud
     __parent_las: 'LAS'
-    __segmented_LAS: list['LAS']
+    __segmented_LAS: Sequence[SegmentView]
+    __segment_table: SegmentTable
+    __spatial_index: SpatialIndex
+    __frame: CoordinateFrame
     __plane: Plane
     __flagged: bool
 
@@ -25,13 +45,16 @@ class LAS(FileHandler):
             self,
             file_path: str = None,
             point_cloud: o3d.geometry.PointCloud = None,
-            parent: 'LAS' = None
+            parent: 'LAS' = None,
+            plane: Plane = None
     ) -> None:
         """
         Initializes the LAS object. If path is not None a new parent LAS object is created,
         otherwise a child object is created
         :param file_path:
         :param point_cloud:
+        :param parent:
+        :param plane: Plane fitted to the point cloud in advance, generated on first access if None
         """
         # TODO: Check why filename is defined all the time
 
@@ -50,11 +73,21 @@ class LAS(FileHandler):
         if parent is not None:
             self.parent_las = parent
 
+        self.__frame = None  # Read from the file header when first needed
+
         if self.__is_parent():
             self.logger.info("Creating parent LAS object")
-            self._open()  # Opening file and setting point cloud
-            self.segmented_LAS = [pc for pc in self.__segment_point_cloud(self.point_cloud)]  # Segments the point cloud
-            self.flag_LAS()  # Flags the LAS object if the difference between plane and point cloud is too large
+
+            with Metrics.timer("las_init") as timer:
+                self.segment_table = self.__build_segment_table()  # Opens and segments the file
+                self.segmented_LAS = SegmentSequence(self.segment_table)  # Views created when first accessed
+
+                if Config.LAZY_SEGMENTS.value:
+                    # Flagged when first read
+                    self.segment_table.flag_lazily(self.distance(Config.SD_THRESHOLD.value[0]))
+                else:
+                    self.flag_LAS()  # Flags the LAS object if the difference between plane and point cloud is too large
+                timer.points = len(self.points)
         else:
             if parent is None:
                 raise TypeError("Parent cannot be None")
@@ -64,18 +97,57 @@ class LAS(FileHandler):
 
             self.logger.debug("Creating child LAS object")
             self.point_cloud = point_cloud
+            self.segment_table = None
             self.segmented_LAS = []
 
-        self.plane = self.__generate_plane(self.point_cloud)
+        self.__plane = None  # Generated when first accessed, unless fitted in advance
+        if plane is not None:
+            self.plane = plane
+
         self.flagged = False  # Sets flagged to False by default
         self.logger.debug("Iteration complete\n")
 
+    @property
+    def points(self) -> np.ndarray:
+        """
+        Returns the (n, 3) coordinate array. This may be a read-only view of a memory mapped file
+        :return:
+        """
+        return self.__points
+
+    @points.setter
+    def points(self, points: np.ndarray) -> None:
+        """
+        Sets the coordinates. The point cloud is created from them the first time it is accessed
+        :param points:
+        :return:
+        """
+        if points is None:
+            raise TypeError("Points cannot be None")
+
+        if not isinstance(points, np.ndarray) or points.ndim != 2 or points.shape[1] != 3:
+            raise TypeError("Points must be an (n, 3) numpy array")
+
+        if len(points) == 0:
+            self.logger.warning("Points are empty")
+
+            if self.__is_parent():
+                raise ValueError(f"{self.file_path} has no points")  # Parent point clouds cannot be empty
+
+        self.__points = points
+        self.__point_cloud = None
+        self.__spatial_index = None
+        self.logger.debug("Points set")
+
     @property
     def point_cloud(self) -> o3d.geometry.PointCloud:
         """
-        Returns the point cloud
+        Returns the point cloud, creating it from the points if it has not been accessed before
         :return:
         """
+        if self.__point_cloud is None:
+            self.__point_cloud = self.__array_to_pc(self.points)
+
         return self.__point_cloud
 
     @point_cloud.setter
@@ -95,6 +167,8 @@ class LAS(FileHandler):
         # TODO: Check if it is necessary to run a voxel downsize here
 
         self.__point_cloud = point_cloud
+        self.__points = np.asarray(point_cloud.points)
+        self.__spatial_index = None
         self.logger.debug("Point cloud set")
 
     @property
@@ -120,9 +194,12 @@ class LAS(FileHandler):
     @property
     def plane(self) -> Plane:
         """
-        Returns the plane
+        Returns the plane, fitted to the points the first time it is accessed
         :return:
         """
+        if self.__plane is None:
+            self.__plane = self.__generate_plane(self.points)
+
         return self.__plane
 
     @plane.setter
@@ -141,7 +218,80 @@ class LAS(FileHandler):
         self.__plane = plane
 
     @property
-    def segmented_LAS(self) -> list['LAS']:
+    def spatial_index(self) -> SpatialIndex:
+        """
+        Returns the grid index over the points, built the first time it is accessed. Points are labelled with their
+        segment when the object has a segment table
+        :return:
+        """
+        if self.__spatial_index is None:
+            with Metrics.timer("spatial_indexing") as timer:
+                self.__spatial_index = SpatialIndex(
+                    self.points,
+                    cell_size=self.distance(Config.SPATIAL_CELL_SIZE, axis=0),
+                    labels=self.__segment_labels()
+                )
+                timer.points = len(self.points)
+
+        return self.__spatial_index
+
+    @property
+    def frame(self) -> CoordinateFrame:
+        """
+        Returns the scale and offset of the raw coordinates. Child objects share the frame of their parent, and
+        objects without a file use raw units as metres
+        :return:
+        """
+        if self.__frame is None:
+            if not self.__is_parent():
+                return self.parent_las.frame
+
+            self.__frame = LASChunkReader(self.file_path).frame if self.file_path else CoordinateFrame()
+
+        return self.__frame
+
+    @property
+    def metres(self) -> np.ndarray:
+        """
+        Returns the points in real coordinates. The scale and offset are applied on every access, so the float64
+        copy only exists for as long as the caller keeps it
+        :return:
+        """
+        return self.frame.to_metres(self.points)
+
+    def distance(self, setting: Config | float, axis: int = 2) -> float:
+        """
+        Returns a distance setting in the units of the points. Settings are converted from metres with the scale of
+        the file when Config.DISTANCE_UNITS is 'metres'
+        :param setting: Config entry holding a distance, e.g. Config.DISTANCE_THRESHOLD, or a distance in
+        Config.DISTANCE_UNITS
+        :param axis: Axis whose scale is used, 2 for vertical distances and 0 for horizontal sizes
+        :return:
+        """
+        return self.frame.distance(setting.value if isinstance(setting, Config) else setting, axis)
+
+    @property
+    def segment_table(self) -> SegmentTable:
+        """
+        Returns the table holding the points, planes and statistics of all segments, None for child objects
+        :return:
+        """
+        return self.__segment_table
+
+    @segment_table.setter
+    def segment_table(self, segment_table: SegmentTable) -> None:
+        """
+        Sets the segment table
+        :param segment_table:
+        :return:
+        """
+        if not isinstance(segment_table, SegmentTable) and segment_table is not None:
+            raise TypeError("Segment table must be a SegmentTable object")
+
+        self.__segment_table = segment_table
+
+    @property
+    def segmented_LAS(self) -> Sequence[SegmentView]:
         """
         Returns the segmented point clouds
         :return:
@@ -149,7 +299,7 @@ class LAS(FileHandler):
         return self.__segmented_LAS
 
     @segmented_LAS.setter
-    def segmented_LAS(self, segmented_LAS: list['LAS']) -> None:
+    def segmented_LAS(self, segmented_LAS: Sequence[SegmentView]) -> None:
         """
         Sets the segmented point clouds
         :param segmented_LAS:
@@ -158,8 +308,8 @@ class LAS(FileHandler):
         if segmented_LAS is None:
             raise TypeError("Segmented point clouds cannot be None")
 
-        if not isinstance(segmented_LAS, list):
-            raise TypeError("Segmented point clouds must be a list")
+        if not isinstance(segmented_LAS, (list, SegmentSequence)):
+            raise TypeError("Segmented point clouds must be a list or a SegmentSequence")
 
         self.__segmented_LAS = segmented_LAS
         self.logger.debug("Segmented point clouds updated")
@@ -188,10 +338,13 @@ class LAS(FileHandler):
             self.planes.append(plane)
             self.logger.info(f"{plane} added")
 
-    def filter(self, filter_type: str) -> list['LAS']:
+    def filter(self, filter_type: str, lower_bound: float = None, upper_bound: float = None) -> list[SegmentView]:
         """
-        Filters the point clouds based on the type
+        Filters the point clouds based on the type. The segments are looked up in the sorted statistics index, so
+        the bounds can be tuned at runtime without recomputing anything
         :param filter_type: The type of filter to apply; either 'mean', 'sd' or 'se'
+        :param lower_bound: Exclusive lower bound in Config.DISTANCE_UNITS, defaults to the threshold in Config
+        :param upper_bound: Exclusive upper bound in Config.DISTANCE_UNITS, defaults to the threshold in Config
         :return:
         """
         if filter_type is None:
@@ -200,53 +353,119 @@ class LAS(FileHandler):
         if not isinstance(filter_type, str):
             raise TypeError("Type must be a string")
 
+        filter_type = filter_type.lower()
         if filter_type not in ["mean", "sd", "se"]:
             raise ValueError("Type must be either 'mean', 'sd' or 'se'")
 
-        filter_type = filter_type.lower()
+        if self.segment_table is None:
+            return []  # Child objects have no segments
+
         match filter_type:
             case "mean":
-                lower_bound, upper_bound = Config.MEAN_THRESHOLD.value
-                return list(filter(lambda las: lower_bound < las.plane.mean < upper_bound, self.segmented_LAS))
+                column, (default_lower_bound, default_upper_bound) = "mean", Config.MEAN_THRESHOLD.value
             case "sd":
-                lower_bound, upper_bound = Config.SD_THRESHOLD.value
-                return list(filter(lambda las: lower_bound < las.plane.SD < upper_bound, self.segmented_LAS))
+                column, (default_lower_bound, default_upper_bound) = "SD", Config.SD_THRESHOLD.value
             case "se":
-                lower_bound, upper_bound = Config.SE_THRESHOLD.value
-                return list(filter(lambda las: lower_bound < las.plane.SE < upper_bound, self.segmented_LAS))
-
-    def merge_segmented_pc(self, *LAS_objects) -> o3d.geometry.PointCloud:
-        merged_las_df = pd.concat(
-            [
-                self.__pc_to_df(s_LAS.plane.point_cloud) for s_LAS in self.segmented_LAS
-                if Config.SD_THRESHOLD.value[0] < self.SD(s_LAS.point_cloud) < Config.SD_THRESHOLD.value[1]
-            ] if len(LAS_objects) == 0 else [
-                self.__pc_to_df(s_LAS.plane.point_cloud) for s_LAS in LAS_objects
-            ]
+                column, (default_lower_bound, default_upper_bound) = "SE", Config.SE_THRESHOLD.value
+
+        # Means are z coordinates, so the offset of the file applies to them, while SDs and SEs are distances
+        to_units = self.frame.coordinate if column == "mean" else self.frame.distance
+        indexes = self.segment_table.statistics.range(
+            column,
+            to_units(default_lower_bound if lower_bound is None else lower_bound),
+            to_units(default_upper_bound if upper_bound is None else upper_bound)
         )
+        return [self.segmented_LAS[i] for i in indexes]
 
-        point_cloud = o3d.geometry.PointCloud()
-        point_cloud.points = o3d.utility.Vector3dVector(merged_las_df.to_numpy())
-        return point_cloud
+    def adjacent_segments(self, index: int) -> list[SegmentView]:
+        """
+        Finds the segments with points in the grid cells touching the cells of segment index
+        :param index:
+        :return:
+        """
+        if self.segment_table is None:
+            return []  # Child objects have no segments
+
+        return [self.segmented_LAS[i] for i in self.spatial_index.adjacent(index)]
+
+    def export(self, output_path: str, flagged_only: bool = True) -> int:
+        """
+        Writes the segments back to a LAS or LAZ file with all attributes of the original file, one chunk at a time.
+        Flagged points are given the classification Config.FLAGGED_CLASSIFICATION
+        :param output_path: Path of the new .las or .laz file
+        :param flagged_only: Whether to write the flagged segments only, or all points
+        :return: The no. of points written
+        """
+        if self.segment_table is None:
+            raise TypeError("Only parent LAS objects can be exported")
+
+        writer = LASChunkWriter(self.file_path)
+        point_flags = self.segment_table.flags[self.__segment_labels()]  # Flag of each point in the file's order
 
-    def flag_LAS(self) -> None:
-        las_list = self.segmented_LAS
+        if len(point_flags) != LASChunkReader(self.file_path).point_count:
+            raise ValueError("Points no longer match the file, e.g. after global downsampling, and cannot be exported")
 
-        for las in las_list:
-            inliers_df = las.plane.inliers
-            x_real = np.array(inliers_df.x)
-            y_real = np.array(inliers_df.y)
-            z_real = np.array(inliers_df.z)
+        return writer.write(output_path, mask=point_flags if flagged_only else None, reclassify=point_flags)
+
+    def merge_segmented_pc(
+            self,
+            *LAS_objects,
+            segments: np.ndarray = None,
+            as_numpy: bool = False
+    ) -> o3d.geometry.PointCloud | np.ndarray:
+        """
+        Merges the plane inliers of the given segments, or of the segments within the SD threshold if none are
+        given. The inliers are selected with a mask over the segments and gathered from the points in one pass, so
+        segments given more than once are only merged once
+        :param LAS_objects: Segments of this object, or child LAS objects
+        :param segments: Boolean mask or indexes of the segments to merge, used instead of LAS_objects
+        :param as_numpy: Returns the merged points as an (n, 3) array instead of converting them to a point cloud
+        :return:
+        """
+        with Metrics.timer("merging") as timer:
+            if segments is not None:
+                merged_points = self.segment_table.gather_inliers(segments)
+            elif len(LAS_objects) == 0:
+                merged_points = self.segment_table.gather_inliers(self.segment_table.statistics.mask(
+                    self.segment_table.statistics.range("SD", *map(self.distance, Config.SD_THRESHOLD.value))
+                ))
+            elif all(isinstance(s_LAS, SegmentView) and s_LAS.table is self.segment_table for s_LAS in LAS_objects):
+                merged_points = self.segment_table.gather_inliers([s_LAS.index for s_LAS in LAS_objects])
+            else:
+                merged_points = np.concatenate([
+                    np.asarray(s_LAS.plane.point_cloud.points) for s_LAS in LAS_objects
+                ])  # Child LAS objects from other tables
+
+            timer.points = len(merged_points)
+
+        if as_numpy:
+            return merged_points
+
+        point_cloud = o3d.geometry.PointCloud()
+        point_cloud.points = o3d.utility.Vector3dVector(np.ascontiguousarray(merged_points, dtype=np.float64))
+        return point_cloud
 
-            z_plane = np.array([
-                las.plane.z(x, y) for x, y in zip(x_real, y_real)
-            ])
+    def flag_LAS(self, threshold: float = None) -> None:
+        """
+        Flags the segments where the SD of the vertical distance between the inliers and the plane is larger than
+        the threshold. The residuals of all segments are evaluated in one grouped pass when the table is built, so
+        flagging again with another threshold is a lookup in the statistics index
+        :param threshold: In Config.DISTANCE_UNITS, defaults to the lower SD threshold in Config
+        :return:
+        """
+        if self.segment_table is None:
+            return  # Child objects have no segments
 
-            diff = np.abs(z_real - z_plane)  # Difference in z-value between the plane and the point cloud
-            SD = np.std(diff)
+        with Metrics.timer("flagging") as timer:
+            flags = self.segment_table.flag(
+                self.distance(Config.SD_THRESHOLD.value[0] if threshold is None else threshold)
+            )  # Flagging if difference SD is larger than threshold
+            timer.points = len(self.segment_table.points)
 
-            if SD > Config.SD_THRESHOLD.value[0]:
-                las.flagged = True  # Flagging if difference SD is larger than threshold
+        Metrics.gauge("segments", len(flags))
+        Metrics.gauge("flagged_segments", int(flags.sum()))
+        Metrics.observe("residual_sd", self.segment_table.residual_SDs)
+        self.logger.info(f"Flagged {int(flags.sum())} of {len(flags)} segments")
 
     def display(self, *point_clouds: o3d.geometry.PointCloud) -> None:
         """
@@ -257,7 +476,7 @@ class LAS(FileHandler):
             point_clouds = None
 
         self.logger.info("Displaying point cloud...")
-        self.logger.info(f"Point cloud has {len(self.point_cloud.points) if point_clouds is None else sum([len(pc.points) for pc in point_clouds])} points")
+        self.logger.info(f"Point cloud has {len(self.points) if point_clouds is None else sum([len(pc.points) for pc in point_clouds])} points")
 
         o3d.visualization.draw_geometries(
             [self.point_cloud] if point_clouds is None else [pc for pc in point_clouds],  # Point cloud to display
@@ -271,159 +490,389 @@ class LAS(FileHandler):
         Opens the LAS file and sets the point cloud
         :return:
         """
-        with laspy.open(self.file_path) as lf:
-            las = lf.read()
+        with Metrics.timer("open") as timer:
+            if Config.LAS_READER.value == "mmap" and LASMemmapReader.supports(self.file_path):
+                reader = LASMemmapReader(self.file_path)
+                self.logger.info(f"Memory mapping {self.file_path}")
+                self.logger.debug("Dimension names: %s", reader.dimension_names)
 
-        self.logger.info(f"Reading {self.file_path}")
-        self.logger.debug(f"Dimension names: {', '.join(las.point_format.dimension_names)}")
+                self.points = reader.points  # Strided int32 view of the X, Y, Z fields, nothing is copied
+            else:
+                reader = LASChunkReader(self.file_path)
 
-        print()
+                self.logger.info(f"Reading {self.file_path}")
+                self.logger.debug("Dimension names: %s", reader.dimension_names)
 
-        x, y, z = las.X, las.Y, las.Z  # Get the X, Y, Z coordinates
-        points = pd.DataFrame(data=np.array([x, y, z]).T, columns=["x", "y", "z"])  # Storing coordinates in a DataFrame
-        point_cloud = self.__df_to_pc(points)  # Converting the DataFrame to a PointCloud object
-        self.point_cloud = point_cloud  # Setting the point cloud
+                self.points = reader.read()  # Decoding the raw X, Y, Z integers chunk by chunk into one array
 
-    @property
-    def mean(self, point_cloud: o3d.geometry.PointCloud) -> float:
+            self.__frame = reader.frame
+            timer.points = len(self.points)
+
+    def __build_segment_table(self) -> SegmentTable:
         """
-        Calculates the mean of the inliers
+        Opens the LAS file, segments it and fits the segment planes. When the cache is enabled each stage is loaded
+        from the cache if the file and the Config fields of the stage are unchanged
         :return:
         """
-        return self.__pc_to_df(point_cloud).z.mean()
+        cache = PipelineCache() if Config.USE_CACHE.value else None
+        file_hash = cache.file_hash(self.file_path) if cache is not None else None
+        cached_points = cache.load("points", cache.stage_key("points", file_hash)) if cache is not None else None
+
+        streaming = Config.STREAM_INGESTION.value \
+            and Config.SEGMENTATION_MODE.value == "index" and Config.PLANE_FITTING.value == "ransac" \
+            and Config.VOXEL_PLACEMENT.value != "global"  # A global voxel grid needs all points at once
+
+        if Config.STREAM_INGESTION.value and not streaming:
+            self.logger.warning(
+                "Streaming ingestion only supports index segmentation with RANSAC planes and no global downsampling, "
+                "reading the full file"
+            )
+
+        if cached_points is not None:
+            self.points = cached_points["points"]  # Setting the points from the cache
+            self.__downsample_globally()
+        elif streaming:
+            segment_table = self.__stream_segments()  # Reads and segments the file block by block
+
+            if cache is not None:
+                cache.store("points", cache.stage_key("points", file_hash), {"points": segment_table.points})
+                cache.store("segments", cache.stage_key("segments", file_hash), {"offsets": segment_table.offsets})
+                self.__store_planes(
+                    cache,
+                    file_hash,
+                    segment_table.plane_coefficients,
+                    segment_table.inlier_indexes,
+                    segment_table.inlier_offsets
+                )
+
+            return segment_table
+        else:
+            self._open()  # Opening file and setting point cloud
 
-    def VAR(self, point_cloud: o3d.geometry.PointCloud) -> float:
-        return self.__pc_to_df(point_cloud).z.var()
+            if cache is not None:
+                cache.store("points", cache.stage_key("points", file_hash), {"points": self.points})
 
-    def SD(self, point_cloud: o3d.geometry.PointCloud) -> float:
-        return self.__pc_to_df(point_cloud).z.std()
+            self.__downsample_globally()
 
-    def SE(self, point_cloud: o3d.geometry.PointCloud) -> float:
-        return self.SD(point_cloud) / np.sqrt(self.__pc_to_df(point_cloud).size)
+        return self.__segment_point_cloud(self.points, cache, file_hash)  # Segments the point cloud
 
-    def __is_parent(self) -> bool:
+    @staticmethod
+    def __store_planes(
+            cache: PipelineCache,
+            file_hash: str,
+            plane_coefficients: np.ndarray,
+            inlier_indexes: np.ndarray,
+            inlier_offsets: np.ndarray
+    ) -> None:
         """
-        Checks if the LAS object is a parent
+        Stores the plane columns of a segment table in the cache
+        :param cache:
+        :param file_hash:
+        :param plane_coefficients:
+        :param inlier_indexes:
+        :param inlier_offsets:
         :return:
         """
-        return self.parent_las is None
+        cache.store("planes", cache.stage_key("planes", file_hash), {
+            "plane_coefficients": plane_coefficients,
+            "inlier_indexes": inlier_indexes,
+            "inlier_offsets": inlier_offsets,
+        })
 
-    def __voxel_downsample(self, point_cloud: o3d.geometry.PointCloud) -> o3d.geometry.PointCloud:
+    def __stream_segments(self) -> SegmentTable:
         """
-        Downsamples the point cloud using a voxel grid
-        :param point_cloud:
+        Reads the LAS file in fixed-size blocks and fits the plane of each block as soon as it is decoded. Blocks are
+        read ahead in a separate thread while the previous blocks are fitted, so reading and fitting overlap. The
+        points and inlier indexes are spilled to temporary memory mapped files, and only the statistics and plane of
+        each block are kept in memory, so the resident memory depends on the block size and not on the file size
         :return:
         """
-        self.logger.info(f"Downsampling point cloud with voxel size: {Config.VOXEL_SIZE.value}")
-        point_cloud = point_cloud.voxel_down_sample(
-            voxel_size=Config.VOXEL_SIZE.value
-        )  # Downsampling the point cloud
-        self.logger.info(f"Point cloud downsampled to {len(point_cloud.points)} points")
-        return point_cloud
-
-    def __generate_plane(self, point_cloud: o3d.geometry.PointCloud) -> Plane:
-        if self.__is_parent():
-            pass
-            # point_cloud = self.__voxel_downsample(point_cloud)  # Downsampling the point cloud if self is parent
+        reader = LASChunkReader(self.file_path)
+        self.logger.info(f"Streaming {self.file_path} in chunks of {reader.chunk_size} points")
+
+        rows_per_split = Tiler.rows_per_split_of(reader.point_count)
+        self.logger.info(f"No. of rows per split: {rows_per_split}")
+
+        self.__frame = reader.frame
+        distance_threshold = self.distance(Config.DISTANCE_THRESHOLD)
+        downsampler = self.__downsampler() if Config.VOXEL_PLACEMENT.value == "segment" else None  # Applied per block
+        points = self.__spill(reader.point_count, 3, np.int32)
+        inlier_indexes = self.__spill(reader.point_count, None, np.int64)  # A block has at most as many inliers
+        offsets, inlier_offsets = [0], [0]
+        plane_coefficients, means, VARs, residual_SDs = [], [], [], []
+        progress_bar = tqdm.tqdm(total=reader.point_count)
+
+        blocks = BlockPipeline().run(
+            reader.blocks(rows_per_split), Config.RANDOM_SEED.value, distance_threshold, downsampler
+        )  # Block i is fitted with RANDOM_SEED + i, in the order the blocks were read
+
+        for block, (plane_model, block_inliers) in blocks:
+            Metrics.count("streamed_blocks")
+            points[offsets[-1]:offsets[-1] + len(block)] = block
+            inlier_indexes[inlier_offsets[-1]:inlier_offsets[-1] + len(block_inliers)] = block_inliers + offsets[-1]
+
+            statistics = RunningStatistics.from_values(block[:, 2])
+            plane_coefficients.append(plane_model)
+            means.append(statistics.mean)
+            VARs.append(statistics.VAR)
+            residual_SDs.append(
+                Plane.grouped_residual_SD(block[block_inliers], plane_model[None], [len(block_inliers)])[0]
+            )
+
+            offsets.append(offsets[-1] + len(block))
+            inlier_offsets.append(inlier_offsets[-1] + len(block_inliers))
+            progress_bar.update(len(block))
 
-        self.logger.debug("Generating plane...")
-        plane_model, inlier_indexes = point_cloud.segment_plane(
-            distance_threshold=Config.DISTANCE_THRESHOLD.value,
-            ransac_n=Config.RANSAC_N.value,
-            num_iterations=Config.NUM_ITERATIONS.value,
-        )  # Generating plane model
+        progress_bar.close()
+        self.points = points[:offsets[-1]]
+        return SegmentTable(
+            self.points,
+            np.array(offsets),
+            np.array(plane_coefficients, dtype=np.float64).reshape(-1, 4),
+            inlier_indexes[:inlier_offsets[-1]],
+            np.array(inlier_offsets),
+            means=np.array(means),
+            VARs=np.array(VARs),
+            residual_SDs=np.array(residual_SDs)
+        )
 
-        a, b, c, d = plane_model  # Extracting the plane model parameters
-        plane = Plane(a, b, c, d)  # Creating a Plane object
+    @staticmethod
+    def __spill(rows: int, columns: int | None, dtype: type) -> np.ndarray:
+        """
+        Creates an array backed by an anonymous temporary file, so its pages can be written back to disk instead of
+        being held in memory. The file is deleted when the array is no longer used
+        :param rows:
+        :param columns: None for a 1-dimensional array
+        :param dtype:
+        :return:
+        """
+        shape = (rows,) if columns is None else (rows, columns)
 
-        inlier_points_df = self.__pc_to_df(point_cloud).iloc[inlier_indexes]  # Converting the pc to df
-        plane.inliers = inlier_points_df  # Setting the inliers
+        if rows == 0:
+            return np.empty(shape, dtype=dtype)  # Empty files cannot be memory mapped
 
-        self.logger.debug(f"Generated plane: {plane} with {len(plane.inliers)} inliers")
-        return plane
+        return np.memmap(tempfile.TemporaryFile(), dtype=dtype, mode="w+", shape=shape)
 
-    def __segment_point_cloud(self, point_cloud: o3d.geometry.PointCloud) -> list['LAS']:
+    def mean(self, point_cloud: o3d.geometry.PointCloud) -> float:
         """
-        Segments the point cloud into smaller point clouds
-        :param point_cloud:
+        Calculates the mean of the z values
         :return:
         """
-        self.logger.info("Segmenting point cloud into smaller frames...")
-        pc_df = self.__pc_to_df(point_cloud)  # Converting the point cloud to a DataFrame
-        origin = pc_df.iloc[0]  # Getting the origin point
-        Logger.get_logger(__name__).debug(f"Origin {origin.x, origin.y, origin.z}")
-        pc_df -= origin  # Adjusting the DataFrame by subtracting the origin
-        Logger.get_logger(__name__).debug(f"Translated origin to (0, 0, 0)")
+        return self.__z_statistics(point_cloud).mean
 
-        segment_count = math.floor(
-            Config.SPLIT_SCALE_FACTOR.value * pc_df.size  # TODO: Setup a new formula for this
-        )  # No. of rows per split
+    def VAR(self, point_cloud: o3d.geometry.PointCloud) -> float:
+        return self.__z_statistics(point_cloud).VAR
 
-        self.logger.info(f"No. of rows per split: {segment_count}")
+    def SD(self, point_cloud: o3d.geometry.PointCloud) -> float:
+        return self.__z_statistics(point_cloud).SD
 
-        segmented_point_clouds = []
-        self.logger.info("Splitting point cloud into smaller frames...")
-        progress_bar = tqdm(total=len(point_cloud.points))
+    def SE(self, point_cloud: o3d.geometry.PointCloud) -> float:
+        return self.__z_statistics(point_cloud).SE
 
-        for i in range(segment_count):
-            start = i * segment_count
-            end = (i + 1) * segment_count
+    @staticmethod
+    def __z_statistics(point_cloud: o3d.geometry.PointCloud) -> RunningStatistics:
+        """
+        Calculates the statistics of the z values directly from the point buffer
+        :param point_cloud:
+        :return:
+        """
+        return RunningStatistics.from_values(np.asarray(point_cloud.points)[:, 2])
 
-            if start > len(point_cloud.points):
-                break  # Break if start is greater than the no. of points
+    def __is_parent(self) -> bool:
+        """
+        Checks if the LAS object is a parent
+        :return:
+        """
+        return self.parent_las is None
 
-            if end > len(point_cloud.points):
-                end = len(point_cloud.points)  # Set end to the no. of points if end is greater than the no. of points
+    def __downsample_globally(self) -> None:
+        """
+        Replaces the parent's points with their voxel downsampled points when downsampling before segmentation
+        :return:
+        """
+        if Config.VOXEL_PLACEMENT.value != "global":
+            return
 
-            self.logger.debug(f"Splitting points from {start} to {end}")
+        with Metrics.timer("downsampling") as timer:
+            timer.points = len(self.points)
+            downsampler = self.__downsampler()
+            self.points, _ = downsampler.downsample(self.points)
 
-            df = pd.DataFrame(np.asarray(point_cloud.points), columns=["x", "y", "z"])
+        self.logger.info(
+            f"Downsampled point cloud to {len(self.points)} points with voxel size {Config.VOXEL_SIZE.value} "
+            f"({downsampler.reduction:.1%} reduction)"
+        )
 
-            df = pd.DataFrame(np.asarray(point_cloud.points)[start:end], columns=["x", "y", "z"])
-            segmented_point_cloud = self.__df_to_pc(df)
-            segmented_las_obj = LAS(point_cloud=segmented_point_cloud, parent=self)
-            segmented_point_clouds.append(segmented_las_obj)
+    def __downsampler(self) -> VoxelDownsampler:
+        """
+        Creates a voxel downsampler with Config.VOXEL_SIZE in the units of the points
+        :return:
+        """
+        return VoxelDownsampler(voxel_size=self.distance(Config.VOXEL_SIZE, axis=0))
 
-            progress_bar.update(end - start)
+    def __generate_plane(self, points: np.ndarray) -> Plane:
+        self.logger.debug("Generating plane...")
+        Metrics.count("parent_plane_fits")
+        distance_threshold = self.distance(Config.DISTANCE_THRESHOLD)
+
+        if self.__is_parent() and Config.VOXEL_PLACEMENT.value == "segment":
+            # Fitting the parent plane to the downsampled points, and selecting the inliers from all points
+            sampled_points, _ = self.__downsampler().downsample(points)
+            plane_model, _ = PlaneFitter.fit_segment(sampled_points, Config.RANDOM_SEED.value, distance_threshold)
+            inlier_indexes = PlaneFitter.inliers_within(
+                points, np.array([0, len(points)]), [plane_model], distance_threshold
+            )[0]
+        else:
+            plane_model, inlier_indexes = PlaneFitter.fit_segment(
+                points, Config.RANDOM_SEED.value, distance_threshold
+            )  # Generating plane model
 
-        progress_bar.close()
-        return segmented_point_clouds
+        return self.__create_plane(points, plane_model, inlier_indexes)
 
-    def __df_to_pc(self, points: pd.DataFrame) -> o3d.geometry.PointCloud:
+    def __create_plane(self, points: np.ndarray, plane_model: np.ndarray, inlier_indexes: np.ndarray) -> Plane:
         """
-        Converts a pandas DataFrame to an open3d.geometry.PointCloud object
+        Creates a Plane object from a fitted plane model and the indexes of its inliers
+        :param points: Points the plane was fitted to
+        :param plane_model: The plane parameters a, b, c and d
+        :param inlier_indexes: Indexes of the inliers in points
         :return:
         """
-        self.logger.debug("Converting DataFrame to PointCloud object...")
-        if points.empty:
-            self.logger.warning("Points are empty")
+        a, b, c, d = plane_model  # Extracting the plane model parameters
+        plane = Plane(a, b, c, d)  # Creating a Plane object
+        plane.inlier_points = points[inlier_indexes]  # Setting the inliers, converted to a DataFrame on first access
 
-            if self.__is_parent():
-                exit(-1)  # Exits program if parent point cloud is empty
+        self.logger.debug("Generated plane: %s with %d inliers", plane, len(plane.inlier_points))
+        return plane
 
-        self.logger.debug(f"No. of points in DataFrame: {len(points)}")
+    def __segment_point_cloud(
+            self,
+            points: np.ndarray,
+            cache: PipelineCache = None,
+            file_hash: str = None
+    ) -> SegmentTable:
+        """
+        Segments the point cloud into smaller point clouds. Every point is assigned to a tile in one pass, and the
+        points are sorted by tile once, so each segment is a contiguous slice of the sorted points
+        :param points:
+        :param cache: Cache to load and store the segments and plane fits in, None to disable caching
+        :param file_hash: Content hash of the LAS file, used in the cache keys
+        :return:
+        """
+        self.logger.info(f"Segmenting point cloud into smaller frames using {Config.SEGMENTATION_MODE.value} mode...")
+
+        cached_segments = cache.load("segments", cache.stage_key("segments", file_hash)) if cache is not None else None
+        if cached_segments is not None:
+            offsets, order = np.asarray(cached_segments["offsets"]), cached_segments.get("order")
+        else:
+            rows_per_split = Tiler.rows_per_split_of(len(points))  # No. of rows per split, only used in index mode
+            self.logger.info(f"No. of rows per split: {rows_per_split}")
+
+            with Metrics.timer("segmentation") as timer:
+                offsets, order = Tiler.segment(points, self.frame)
+                timer.points = len(points)
+
+            if cache is not None:
+                arrays = {"offsets": offsets} if order is None else {"offsets": offsets, "order": order}
+                cache.store("segments", cache.stage_key("segments", file_hash), arrays)
+
+        with Metrics.timer("sorting") as timer:
+            sorted_points = points if order is None else points[order]
+            timer.points = len(points) if order is not None else 0
+
+        cached_planes = cache.load("planes", cache.stage_key("planes", file_hash)) if cache is not None else None
+        if cached_planes is not None:
+            return SegmentTable(
+                sorted_points,
+                offsets,
+                cached_planes["plane_coefficients"],
+                cached_planes["inlier_indexes"],
+                cached_planes["inlier_offsets"],
+                order=order
+            )
+
+        if Config.LAZY_SEGMENTS.value:
+            self.logger.info(f"Deferring plane fitting for {len(offsets) - 1} frames until first use")
+            return SegmentTable(
+                sorted_points,
+                offsets,
+                order=order,
+                fit=self.__fit_planes,  # Fits only the segments that are used
+                independent=Config.PLANE_FITTING.value != "sliding_window",  # Windows span neighbouring segments
+                on_fitted=lambda table: self.__store_planes(
+                    cache, file_hash, table.plane_coefficients, table.inlier_indexes, table.inlier_offsets
+                ) if cache is not None else None
+            )
+
+        self.logger.info(f"Fitting planes to {len(offsets) - 1} frames...")
+        fits = self.__fit_planes(sorted_points, offsets)
+
+        if cache is not None:
+            self.__store_planes(cache, file_hash, *SegmentTable.planes_from_fits(offsets, fits))
+
+        return SegmentTable.from_fits(sorted_points, offsets, fits, order=order)
+
+    def __fit_planes(
+            self,
+            points: np.ndarray,
+            offsets: np.ndarray,
+            first_segment: int = 0
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Fits the plane of every segment
+        :param points: Points sorted by segment
+        :param offsets:
+        :param first_segment: Index of the first segment in the table, so segment i is always fitted with the same seed
+        :return: The plane model and local inlier indexes of each segment
+        """
+        self.logger.debug("Fitting planes to %d frames", len(offsets) - 1)
+        with Metrics.timer("plane_generation") as timer:
+            if Config.PLANE_FITTING.value == "sliding_window":
+                fits = SlidingWindowFitter().fit_blocks(points, offsets)
+            else:
+                downsampler = self.__downsampler() if Config.VOXEL_PLACEMENT.value == "segment" else None
+                plane_fitter = PlaneFitter(
+                    seed=Config.RANDOM_SEED.value + first_segment,
+                    distance_threshold=self.distance(Config.DISTANCE_THRESHOLD)
+                )
+                fits = plane_fitter.fit(points, offsets, downsampler)
+
+            timer.points = len(points)
+
+        return fits
+
+    def __segment_labels(self) -> np.ndarray:
+        """
+        Returns the segment of every point in the order of the points, None for child objects
+        :return:
+        """
+        if self.segment_table is None:
+            return None
 
-        origin = points.iloc[0]  # Getting the origin point
+        labels = np.repeat(np.arange(len(self.segment_table), dtype=np.int64), self.segment_table.lengths)
 
-        x, y, z = origin  # Getting the x, y, z coordinates of the origin point
-        self.logger.debug(f"Origin point: ({x}, {y}, {z})")
+        if self.segment_table.order is not None:
+            labels[self.segment_table.order] = labels.copy()  # From segment order to point order
 
-        point_cloud = o3d.geometry.PointCloud()
-        point_cloud.points = o3d.utility.Vector3dVector(points.to_numpy())
-        return point_cloud
+        return labels
 
-    def __pc_to_df(self, point_cloud: o3d.geometry.PointCloud) -> pd.DataFrame:
+    def __array_to_pc(self, points: np.ndarray) -> o3d.geometry.PointCloud:
         """
-        Converts an open3d.geometry.PointCloud object to a pandas DataFrame
+        Converts an (n, 3) array to an open3d.geometry.PointCloud object
+        :param points:
         :return:
         """
-        self.logger.debug("Converting PointCloud object to DataFrame...")
-        points = np.asarray(point_cloud.points)
-        points = pd.DataFrame(data=points, columns=["x", "y", "z"])
-        return points
+        if len(points) == 0:
+            self.logger.warning("Points are empty")
+
+            if self.__is_parent():
+                raise ValueError(f"{self.file_path} has no points")  # Parent point clouds cannot be empty
+
+        point_cloud = o3d.geometry.PointCloud()
+        point_cloud.points = o3d.utility.Vector3dVector(np.ascontiguousarray(points, dtype=np.float64))
+        return point_cloud
 
     def __repr__(self) -> str:
         return f"is parent: {self.__is_parent()}; " \
                f"no. of children: {len(self.segmented_LAS)}; " \
-               f"no. of points: {len(self.point_cloud.points)}; " \
+               f"no. of points: {len(self.points)}; " \
                f"plane: {self.plane};"
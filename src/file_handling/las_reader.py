@@ -0,0 +1,211 @@
+import numbers
+from typing import Iterator
+
+import numpy as np
+
+from config import Config
+from src.lazy_module import LazyModule
+from src.logger.logger import Logger
+from src.model.coordinate_frame import CoordinateFrame
+
+laspy = LazyModule("laspy")
+
+
+class LASChunkReader:
+    __file_path: str
+    __chunk_size: int
+
+    def __init__(self, file_path: str, chunk_size: int = Config.CHUNK_SIZE.value) -> None:
+        """
+        Reads the raw integer X, Y, Z coordinates of a LAS file in fixed-size chunks, so that only one chunk of point
+        records is decoded at a time. The scale and offset of the file are kept in frame and never applied here
+        :param file_path: Path to the LAS file
+        :param chunk_size: No. of points decoded per chunk
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+
+        with laspy.open(self.file_path) as lf:
+            self.__point_count = lf.header.point_count
+            self.__dimension_names = list(lf.header.point_format.dimension_names)
+            self.__frame = CoordinateFrame.from_header(lf.header)
+
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
+    @file_path.setter
+    def file_path(self, file_path: str) -> None:
+        if not file_path:
+            raise TypeError("File path cannot be empty")
+
+        self.__file_path = file_path
+
+    @property
+    def chunk_size(self) -> int:
+        return self.__chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, chunk_size: int) -> None:
+        if not isinstance(chunk_size, numbers.Integral):
+            raise TypeError("Chunk size must be an integer")
+
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be larger than 0")
+
+        self.__chunk_size = int(chunk_size)
+
+    @property
+    def point_count(self) -> int:
+        """
+        Returns the no. of points in the file as stated in the header
+        :return:
+        """
+        return self.__point_count
+
+    @property
+    def dimension_names(self) -> list[str]:
+        return self.__dimension_names
+
+    @property
+    def frame(self) -> CoordinateFrame:
+        return self.__frame
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """
+        Yields the raw coordinates of the file as (n, 3) int32 arrays of at most chunk_size points
+        :return:
+        """
+        with laspy.open(self.file_path) as lf:
+            for chunk in lf.chunk_iterator(self.chunk_size):
+                points = np.empty((len(chunk), 3), dtype=np.int32)
+                points[:, 0] = chunk.X
+                points[:, 1] = chunk.Y
+                points[:, 2] = chunk.Z
+                yield points
+
+    def blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """
+        Re-blocks the decoded chunks into (block_size, 3) arrays. The last block holds the remaining points
+        :param block_size: No. of points per block
+        :return:
+        """
+        if block_size <= 0:
+            raise ValueError("Block size must be larger than 0")
+
+        block = np.empty((block_size, 3), dtype=np.int32)
+        filled = 0
+
+        for chunk in self:
+            start = 0
+            while start < len(chunk):
+                count = min(block_size - filled, len(chunk) - start)
+                block[filled:filled + count] = chunk[start:start + count]
+                filled += count
+                start += count
+
+                if filled == block_size:
+                    yield block
+                    block = np.empty((block_size, 3), dtype=np.int32)
+                    filled = 0
+
+        if filled > 0:
+            yield block[:filled]
+
+    def read(self) -> np.ndarray:
+        """
+        Reads all raw coordinates into a single preallocated (n, 3) int32 array, one chunk at a time
+        :return:
+        """
+        points = np.empty((self.point_count, 3), dtype=np.int32)
+        filled = 0
+
+        for chunk in self:
+            points[filled:filled + len(chunk)] = chunk
+            filled += len(chunk)
+
+        self.logger.debug("Read %d points in chunks of %d", filled, self.chunk_size)
+        return points[:filled]
+
+
+class LASMemmapReader:
+    __file_path: str
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Exposes the X, Y, Z integer fields of an uncompressed LAS file as a strided view over a memory map of the
+        file, so no points are copied when the file is opened
+        :param file_path: Path to the LAS file
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.file_path = file_path
+
+        with laspy.open(self.file_path) as lf:
+            header = lf.header
+
+            if header.are_points_compressed:
+                raise ValueError("Only uncompressed LAS files can be memory mapped")
+
+            self.__point_count = header.point_count
+            self.__point_data_offset = header.offset_to_point_data
+            self.__record_length = header.point_format.size
+            self.__dimension_names = list(header.point_format.dimension_names)
+            self.__frame = CoordinateFrame.from_header(header)
+
+        self.__memmap = np.memmap(
+            self.file_path,
+            dtype=np.uint8,
+            mode="r",
+            offset=self.__point_data_offset,
+            shape=(self.__point_count * self.__record_length,)
+        ) if self.__point_count > 0 else np.empty(0, dtype=np.uint8)
+
+    @property
+    def file_path(self) -> str:
+        return self.__file_path
+
+    @file_path.setter
+    def file_path(self, file_path: str) -> None:
+        if not file_path:
+            raise TypeError("File path cannot be empty")
+
+        self.__file_path = file_path
+
+    @property
+    def point_count(self) -> int:
+        return self.__point_count
+
+    @property
+    def dimension_names(self) -> list[str]:
+        return self.__dimension_names
+
+    @property
+    def frame(self) -> CoordinateFrame:
+        return self.__frame
+
+    @property
+    def points(self) -> np.ndarray:
+        """
+        Returns a read-only (n, 3) int32 view of the X, Y, Z fields. X, Y and Z are the first 12 bytes of every
+        point record in all point formats, so one record length apart in the file
+        :return:
+        """
+        points = np.ndarray(
+            shape=(self.__point_count, 3),
+            dtype="<i4",
+            buffer=self.__memmap,
+            strides=(self.__record_length, 4)
+        )
+        self.logger.debug("Mapped %d points with record length %d", self.__point_count, self.__record_length)
+        return points
+
+    @staticmethod
+    def supports(file_path: str) -> bool:
+        """
+        Checks if the points of the file can be memory mapped
+        :param file_path:
+        :return:
+        """
+        with laspy.open(file_path) as lf:
+            return not lf.header.are_points_compressed
@@ -0,0 +1,106 @@
+import numbers
+
+import numpy as np
+
+from config import Config
+from src.lazy_module import LazyModule
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+
+laspy = LazyModule("laspy")
+
+
+class LASChunkWriter:
+    __source_path: str
+    __chunk_size: int
+
+    def __init__(self, source_path: str, chunk_size: int = Config.CHUNK_SIZE.value) -> None:
+        """
+        Copies the point records of a LAS file to a new LAS or LAZ file one chunk at a time, keeping every
+        attribute of the original records. Points are selected and reclassified with arrays indexed like the points
+        of the source file
+        :param source_path: Path to the original LAS file
+        :param chunk_size: No. of points decoded and written per chunk
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.source_path = source_path
+        self.chunk_size = chunk_size
+
+    @property
+    def source_path(self) -> str:
+        return self.__source_path
+
+    @source_path.setter
+    def source_path(self, source_path: str) -> None:
+        if not source_path:
+            raise TypeError("Source path cannot be empty")
+
+        self.__source_path = source_path
+
+    @property
+    def chunk_size(self) -> int:
+        return self.__chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, chunk_size: int) -> None:
+        if not isinstance(chunk_size, numbers.Integral):
+            raise TypeError("Chunk size must be an integer")
+
+        if chunk_size <= 0:
+            raise ValueError("Chunk size must be larger than 0")
+
+        self.__chunk_size = int(chunk_size)
+
+    def write(
+            self,
+            output_path: str,
+            mask: np.ndarray = None,
+            reclassify: np.ndarray = None,
+            class_value: int = Config.FLAGGED_CLASSIFICATION.value
+    ) -> int:
+        """
+        Writes the selected points of the source file. The output is compressed when the path ends with .laz
+        :param output_path: Path of the new .las or .laz file
+        :param mask: Boolean array with one entry per source point, None to write all points
+        :param reclassify: Boolean array with one entry per source point, marking the points whose classification is
+        set to class_value. The other points keep their original class
+        :param class_value: Classification of the reclassified points
+        :return: The no. of points written
+        """
+        if not output_path.lower().endswith((".las", ".laz")):
+            raise TypeError("Output must be a .las or .laz file")
+
+        written = 0
+        start = 0
+
+        with laspy.open(self.source_path) as reader:
+            point_count = reader.header.point_count
+
+            for name, values in (("Mask", mask), ("Reclassify", reclassify)):
+                if values is not None and len(values) != point_count:
+                    raise ValueError(f"{name} must have one entry per point in {self.source_path}")
+
+            self.logger.info(f"Writing {output_path} from {self.source_path} in chunks of {self.chunk_size} points")
+
+            with Metrics.timer("export") as timer, laspy.open(output_path, mode="w", header=reader.header) as writer:
+                for chunk in reader.chunk_iterator(self.chunk_size):
+                    end = start + len(chunk)
+
+                    if reclassify is not None:
+                        classification = np.array(chunk.classification)
+                        classification[reclassify[start:end]] = class_value
+                        chunk.classification = classification
+
+                    if mask is not None:
+                        chunk = chunk[mask[start:end]]
+
+                    if len(chunk) > 0:
+                        writer.write_points(chunk)
+                        written += len(chunk)
+
+                    start = end
+
+                timer.points = point_count
+
+        self.logger.info(f"Wrote {written} of {point_count} points to {output_path}")
+        return written
@@ -0,0 +1,34 @@
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name: str) -> None:
+        """
+        Stands in for a module that is only imported the first time one of its attributes is used, so heavy
+        dependencies like open3d and pandas are not loaded by code paths that never use them
+        :param name: Name of the module, e.g. 'open3d'
+        """
+        super().__init__(name)
+        self.__module = None
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Returns whether the module has been imported, by this object or anywhere else
+        :return:
+        """
+        return self.__module is not None or self.__name__ in sys.modules
+
+    def __getattr__(self, attribute: str) -> object:
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)  # Lookups like __path__ or __file__ should not import the module
+
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name__)
+
+        return getattr(self.__module, attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self.__name__}' ({'loaded' if self.__module is not None else 'not loaded'})>"
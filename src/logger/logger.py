@@ -1,11 +1,60 @@
+import atexit
 import logging
+import multiprocessing
 import ntpath
 import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
 from config import Config
 
 
+class _RoutingHandler(logging.Handler):
+    def __init__(self) -> None:
+        """
+        Writes every record to the log file of the logger it was created by
+        """
+        super().__init__()
+        self.file_handlers: dict[str, logging.FileHandler] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        file_handler = self.file_handlers.get(record.name)
+
+        if file_handler is not None:
+            file_handler.handle(record)
+
+    def close(self) -> None:
+        for file_handler in self.file_handlers.values():
+            file_handler.close()
+
+        super().close()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merges the arguments into the message before enqueueing the record, so mutable arguments are logged with
+        the values they had at the call. Formatting with the handlers' formatters still happens on the listener thread
+        :param record:
+        :return:
+        """
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+
 class Logger:
+    __loggers: dict[str, logging.Logger] = {}
+    __lock = threading.Lock()
+    __queue: queue.SimpleQueue = None
+    __listener: QueueListener = None
+    __router: _RoutingHandler = None
+    # Worker processes, whether forked or spawned, append to the log files of their parent. The process name is set
+    # before a spawned worker imports its modules, unlike its parent process
+    __file_mode = "w" if multiprocessing.current_process().name == "MainProcess" else "a"
+
     @staticmethod
     def __config_library_loggers() -> None:
         """
@@ -15,24 +64,100 @@ class Logger:
 
     @staticmethod
     def get_logger(filepath: str) -> logging.Logger:
+        """
+        Returns the logger of a module. Handlers are only configured the first time a module asks for its logger,
+        and records are written to file by a background thread
+        :param filepath: Name or path of the module
+        :return:
+        """
+        filename = ntpath.basename(filepath)  # Get filename from filepath, and removes .py from the end
+        logger = Logger.__loggers.get(filename)
+
+        if logger is not None:
+            return logger
+
+        with Logger.__lock:
+            if filename not in Logger.__loggers:
+                if Logger.__listener is None:
+                    Logger.__start()
+
+                Logger.__loggers[filename] = Logger.__attach(filename)
+
+        return Logger.__loggers[filename]
+
+    @staticmethod
+    def shutdown() -> None:
+        """
+        Stops the background thread after writing all queued records
+        :return:
+        """
+        with Logger.__lock:
+            if Logger.__listener is not None:
+                Logger.__listener.stop()
+                Logger.__router.close()
+                Logger.__listener = None
+
+    @staticmethod
+    def __start() -> None:
+        """
+        Starts the queue listener writing records to the console and the log files
+        :return:
+        """
         Logger.__config_library_loggers()  # Configuring library loggers
 
-        filename = ntpath.basename(filepath)  # Get filename from filepath, and removes .py from the end
-        log_save_path = os.path.join(Config.LOG_DIR.value, f"{filename}.log")
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(Config.LOGGING_LEVEL.value)
+        console_handler.setFormatter(logging.Formatter(fmt="%(levelname)s:%(name)s:%(message)s"))
 
-        # Logger configuration
-        logging.basicConfig(
-            level=Config.LOGGING_LEVEL.value,
+        Logger.__queue = queue.SimpleQueue()
+        Logger.__router = _RoutingHandler()
+        Logger.__listener = QueueListener(
+            Logger.__queue, Logger.__router, console_handler, respect_handler_level=True
         )
+        Logger.__listener.start()
 
-        logger = logging.getLogger(filename)
-        handler = logging.FileHandler(filename=log_save_path, mode="w")
+    @staticmethod
+    def __attach(filename: str) -> logging.Logger:
+        """
+        Creates the file handler of a module and connects its logger to the queue
+        :param filename:
+        :return:
+        """
+        log_save_path = os.path.join(Config.LOG_DIR.value, f"{filename}.log")
+
+        handler = logging.FileHandler(filename=log_save_path, mode=Logger.__file_mode, delay=True)
         formatter = logging.Formatter(
             fmt='{:<15}{:<15}{:<15}{:<15}'.format('%(asctime)s', '%(levelname)s', '%(filename)s', '%(message)s'),
             datefmt='%Y-%m-%d %H:%M:%S'
         )
-
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        Logger.__router.file_handlers[filename] = handler
+
+        logger = logging.getLogger(filename)
+        logger.setLevel(Config.LOGGING_LEVEL.value)
+        logger.handlers = [_DeferredQueueHandler(Logger.__queue)]
+        logger.propagate = False  # The console handler is served by the listener as well
 
         return logger
+
+    @staticmethod
+    def _reset_after_fork() -> None:
+        """
+        Restarts the listener in a forked child process, whose copy of the listener thread is not running
+        :return:
+        """
+        Logger.__lock = threading.Lock()
+        Logger.__file_mode = "a"
+        Logger.__listener = None
+
+        if Logger.__loggers:
+            Logger.__start()
+
+            for filename in Logger.__loggers:
+                Logger.__loggers[filename] = Logger.__attach(filename)
+
+
+atexit.register(Logger.shutdown)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=Logger._reset_after_fork)
@@ -0,0 +1,271 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+from config import Config
+
+try:
+    import resource
+except ImportError:  # Only available on Unix
+    resource = None
+
+
+class StageTimer:
+    __slots__ = ("points",)
+
+    def __init__(self) -> None:
+        """
+        Handle yielded by Metrics.timer. Setting points records how many points the stage processed
+        """
+        self.points = 0
+
+
+class Metrics:
+    __enabled: bool = Config.METRICS_ENABLED.value
+    __lock = threading.Lock()
+    __null_timer = StageTimer()  # Shared handle yielded when metrics are disabled
+
+    __stages: dict[str, dict[str, float]] = {}
+    __counters: dict[str, float] = {}
+    __gauges: dict[str, float] = {}
+    __observations: dict[str, list[np.ndarray]] = {}
+    __traced_peaks: list[int] = []  # Peak traced memory of each running stage, innermost last
+
+    @staticmethod
+    def enabled() -> bool:
+        return Metrics.__enabled
+
+    @staticmethod
+    def enable(enabled: bool = True) -> None:
+        """
+        Turns metric collection on or off at runtime
+        :param enabled:
+        :return:
+        """
+        Metrics.__enabled = enabled
+
+    @staticmethod
+    @contextmanager
+    def timer(name: str) -> Iterator[StageTimer]:
+        """
+        Measures the wall time of a stage and the peak resident memory after it. When tracemalloc is tracing, the
+        peak traced memory during the stage is recorded as well. The no. of points the stage processed can be set on
+        the yielded handle
+        :param name: Name of the stage
+        :return:
+        """
+        if not Metrics.__enabled:
+            yield Metrics.__null_timer
+            return
+
+        timer = StageTimer()
+        tracing = tracemalloc.is_tracing()
+
+        if tracing:
+            Metrics.__start_traced_peak()
+
+        start = time.perf_counter()
+
+        try:
+            yield timer
+        finally:
+            seconds = time.perf_counter() - start
+            max_rss_bytes = Metrics.__max_rss_bytes()
+            peak_traced_bytes = Metrics.__stop_traced_peak() if tracing else None
+
+            with Metrics.__lock:
+                stage = Metrics.__stages.setdefault(name, {"calls": 0, "seconds": 0.0, "points": 0})
+                stage["calls"] += 1
+                stage["seconds"] += seconds
+                stage["points"] += timer.points
+
+                if peak_traced_bytes is not None:
+                    stage["peak_traced_bytes"] = max(stage.get("peak_traced_bytes", 0), peak_traced_bytes)
+
+                if max_rss_bytes is not None:
+                    Metrics.__gauges["max_rss_bytes"] = max(Metrics.__gauges.get("max_rss_bytes", 0), max_rss_bytes)
+
+    @staticmethod
+    def __start_traced_peak() -> None:
+        """
+        Starts measuring the peak traced memory of a stage. The peak of the enclosing stage so far is kept before
+        tracemalloc's peak is reset, so nested stages do not hide the peaks of the stages around them
+        :return:
+        """
+        with Metrics.__lock:
+            if Metrics.__traced_peaks:
+                Metrics.__traced_peaks[-1] = max(Metrics.__traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+
+            tracemalloc.reset_peak()
+            Metrics.__traced_peaks.append(0)
+
+    @staticmethod
+    def __stop_traced_peak() -> int:
+        """
+        Returns the peak traced memory since the stage started, and folds it into the peak of the enclosing stage
+        :return:
+        """
+        with Metrics.__lock:
+            peak = max(Metrics.__traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+
+            if Metrics.__traced_peaks:
+                Metrics.__traced_peaks[-1] = max(Metrics.__traced_peaks[-1], peak)
+
+            return peak
+
+    @staticmethod
+    def __max_rss_bytes() -> int | None:
+        """
+        Returns the peak resident memory of the process in bytes, None if it cannot be read on this platform
+        :return:
+        """
+        if resource is not None:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return max_rss if sys.platform == "darwin" else max_rss * 1024  # Bytes on macOS, kilobytes elsewhere
+
+        try:
+            import psutil
+        except ImportError:
+            return None
+
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss)  # Peak working set on Windows
+
+    @staticmethod
+    def count(name: str, value: float = 1) -> None:
+        """
+        Increments a counter
+        :param name:
+        :param value:
+        :return:
+        """
+        if not Metrics.__enabled:
+            return
+
+        with Metrics.__lock:
+            Metrics.__counters[name] = Metrics.__counters.get(name, 0) + value
+
+    @staticmethod
+    def gauge(name: str, value: float) -> None:
+        """
+        Sets a gauge to the latest value
+        :param name:
+        :param value:
+        :return:
+        """
+        if not Metrics.__enabled:
+            return
+
+        with Metrics.__lock:
+            Metrics.__gauges[name] = value
+
+    @staticmethod
+    def observe(name: str, values: np.ndarray | float) -> None:
+        """
+        Records one or more values of a distribution, e.g. one value per segment
+        :param name:
+        :param values:
+        :return:
+        """
+        if not Metrics.__enabled:
+            return
+
+        with Metrics.__lock:
+            Metrics.__observations.setdefault(name, []).append(np.atleast_1d(np.asarray(values, dtype=np.float64)))
+
+    @staticmethod
+    def reset() -> None:
+        with Metrics.__lock:
+            Metrics.__stages.clear()
+            Metrics.__counters.clear()
+            Metrics.__gauges.clear()
+            Metrics.__observations.clear()
+            Metrics.__traced_peaks.clear()
+
+    @staticmethod
+    def report() -> dict:
+        """
+        Returns all metrics collected so far
+        :return:
+        """
+        with Metrics.__lock:
+            stages = {
+                name: {
+                    **stage,
+                    "points_per_second": stage["points"] / stage["seconds"] if stage["seconds"] > 0 else None,
+                } for name, stage in Metrics.__stages.items()
+            }
+            observations = {}
+
+            for name, chunks in Metrics.__observations.items():
+                values = np.concatenate(chunks)
+                values = values[~np.isnan(values)]
+                observations[name] = {
+                    "count": int(len(values)),
+                    "sum": float(values.sum()),
+                    "mean": float(values.mean()) if len(values) else None,
+                    "min": float(values.min()) if len(values) else None,
+                    "p50": float(np.percentile(values, 50)) if len(values) else None,
+                    "p95": float(np.percentile(values, 95)) if len(values) else None,
+                    "max": float(values.max()) if len(values) else None,
+                }
+
+            return {
+                "stages": stages,
+                "counters": dict(Metrics.__counters),
+                "gauges": dict(Metrics.__gauges),
+                "observations": observations,
+            }
+
+    @staticmethod
+    def export(file_path: str) -> None:
+        """
+        Writes the report to a JSON file, or to a Prometheus text file if the path ends with .prom
+        :param file_path:
+        :return:
+        """
+        report = Metrics.report()
+
+        with open(file_path, "w") as f:
+            if file_path.endswith(".prom"):
+                f.write(Metrics.__to_prometheus(report))
+            else:
+                json.dump(report, f, indent=2)
+
+    @staticmethod
+    def __to_prometheus(report: dict) -> str:
+        """
+        Formats the report in the Prometheus text exposition format
+        :param report:
+        :return:
+        """
+        stages = report["stages"].items()
+        lines = [
+            "# TYPE las_stage_seconds_total counter",
+            *(f'las_stage_seconds_total{{stage="{name}"}} {stage["seconds"]}' for name, stage in stages),
+            "# TYPE las_stage_calls_total counter",
+            *(f'las_stage_calls_total{{stage="{name}"}} {stage["calls"]}' for name, stage in stages),
+            "# TYPE las_stage_points_total counter",
+            *(f'las_stage_points_total{{stage="{name}"}} {stage["points"]}' for name, stage in stages),
+            "# TYPE las_events_total counter",
+            *(f'las_events_total{{name="{name}"}} {value}' for name, value in report["counters"].items()),
+            "# TYPE las_gauge gauge",
+            *(f'las_gauge{{name="{name}"}} {value}' for name, value in report["gauges"].items()),
+            "# TYPE las_observation summary",
+        ]
+
+        for name, summary in report["observations"].items():
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95")):
+                if summary[key] is not None:
+                    lines.append(f'las_observation{{name="{name}",quantile="{quantile}"}} {summary[key]}')
+
+            lines.append(f'las_observation_sum{{name="{name}"}} {summary["sum"]}')
+            lines.append(f'las_observation_count{{name="{name}"}} {summary["count"]}')
+
+        return "\n".join(lines) + "\n"
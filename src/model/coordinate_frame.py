@@ -0,0 +1,112 @@
+import numpy as np
+
+from config import Config
+
+
+class CoordinateFrame:
+    __slots__ = ("__scale", "__offset")
+
+    def __init__(self, scale: np.ndarray = (1.0, 1.0, 1.0), offset: np.ndarray = (0.0, 0.0, 0.0)) -> None:
+        """
+        Scale and offset of the integer coordinates stored in a LAS file. Points are kept as the raw integers of the
+        file, and the scale and offset are only applied when real coordinates are asked for
+        :param scale: Size of one integer step along x, y and z, in metres
+        :param offset: Real coordinate of the integer 0 along x, y and z
+        """
+        self.__scale = np.asarray(scale, dtype=np.float64).reshape(3)
+        self.__offset = np.asarray(offset, dtype=np.float64).reshape(3)
+
+        if np.any(self.__scale <= 0):
+            raise ValueError("Scale must be larger than 0")
+
+    @classmethod
+    def from_header(cls, header) -> 'CoordinateFrame':
+        """
+        Creates the frame from the scales and offsets of a laspy header
+        :param header:
+        :return:
+        """
+        return cls(header.scales, header.offsets)
+
+    @property
+    def scale(self) -> np.ndarray:
+        return self.__scale
+
+    @property
+    def offset(self) -> np.ndarray:
+        return self.__offset
+
+    def to_metres(self, points: np.ndarray) -> np.ndarray:
+        """
+        Applies the scale and offset to raw integer coordinates
+        :param points: (n, 3) array of raw coordinates
+        :return: (n, 3) float64 array of real coordinates
+        """
+        return np.asarray(points, dtype=np.float64) * self.__scale + self.__offset
+
+    def to_units(self, points: np.ndarray) -> np.ndarray:
+        """
+        Converts real coordinates to raw integer coordinates, rounding to the nearest step
+        :param points: (n, 3) array of real coordinates
+        :return: (n, 3) int32 array of raw coordinates
+        """
+        return np.rint((np.asarray(points, dtype=np.float64) - self.__offset) / self.__scale).astype(np.int32)
+
+    def units(self, metres: float, axis: int = 2) -> float:
+        """
+        Converts a distance in metres to raw units along an axis. The offset does not apply to distances
+        :param metres:
+        :param axis: 0, 1 or 2 for x, y or z
+        :return:
+        """
+        return metres / self.__scale[axis]
+
+    def metres(self, units: float, axis: int = 2) -> float:
+        """
+        Converts a distance in raw units along an axis to metres
+        :param units:
+        :param axis: 0, 1 or 2 for x, y or z
+        :return:
+        """
+        return units * self.__scale[axis]
+
+    def distance(self, value: float, axis: int = 2) -> float:
+        """
+        Converts a distance given in Config.DISTANCE_UNITS to raw units
+        :param value:
+        :param axis: Axis whose scale is used, 2 for vertical distances and 0 for horizontal sizes
+        :return:
+        """
+        if Config.DISTANCE_UNITS.value == "raw":
+            return value
+
+        if Config.DISTANCE_UNITS.value != "metres":
+            raise ValueError("Distance units must be either 'raw' or 'metres'")
+
+        return self.units(value, axis)
+
+    def coordinate(self, value: float, axis: int = 2) -> float:
+        """
+        Converts a coordinate given in Config.DISTANCE_UNITS to raw units, e.g. a threshold on the z mean of a
+        segment. Unlike distances, the offset of the file applies to coordinates
+        :param value:
+        :param axis: 0, 1 or 2 for x, y or z
+        :return:
+        """
+        if Config.DISTANCE_UNITS.value == "raw":
+            return value
+
+        return self.distance(value - self.__offset[axis], axis)
+
+    def coordinate_metres(self, units: np.ndarray | float, axis: int = 2) -> np.ndarray | float:
+        """
+        Converts raw coordinates along one axis to real coordinates
+        :param units:
+        :param axis: 0, 1 or 2 for x, y or z
+        :return:
+        """
+        return units * self.__scale[axis] + self.__offset[axis]
+
+    def __repr__(self) -> str:
+        return f"scale: {tuple(self.__scale.tolist())}; " \
+               f"offset: {tuple(self.__offset.tolist())};"
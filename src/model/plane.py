@@ -1,11 +1,15 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
 
 import numpy as np
-import open3d as o3d
-import pandas as pd
 
+from src.lazy_module import LazyModule
 from src.logger.logger import Logger
 
+o3d = LazyModule("open3d")  # Only imported when the inliers are converted to a point cloud
+pd = LazyModule("pandas")  # Only imported when the inliers are read as a DataFrame
+
 
 @dataclass
 class Plane:
@@ -14,7 +18,9 @@ class Plane:
     __b: float  # y
     __c: float  # z
     __d: float  # Distance from origin
-    __inliers: pd.DataFrame  # Inliers of the plane
+    __inlier_points: np.ndarray  # (n, 3) array of the inliers of the plane
+    __inliers: pd.DataFrame  # Inliers as a DataFrame, created on first access
+    __point_cloud: o3d.geometry.PointCloud  # Point cloud of the inliers, created on first access
 
     def __init__(self, a: float, b: float, c: float, d: float) -> None:
         """
@@ -30,11 +36,7 @@ class Plane:
         self.b = b
         self.c = c
         self.d = d
-        self.inliers = pd.DataFrame({
-            "x": [],
-            "y": [],
-            "z": [],
-        })
+        self.inlier_points = np.empty((0, 3))
 
     @property
     def logger(self) -> Logger:
@@ -88,8 +90,29 @@ class Plane:
 
         self.__d = d
 
+    @property
+    def inlier_points(self) -> np.ndarray:
+        return self.__inlier_points
+
+    @inlier_points.setter
+    def inlier_points(self, inlier_points: np.ndarray) -> None:
+        if not isinstance(inlier_points, np.ndarray) or inlier_points.ndim != 2 or inlier_points.shape[1] != 3:
+            raise TypeError("Inlier points must be an (n, 3) numpy array")
+
+        self.__inlier_points = inlier_points
+        self.__inliers = None
+        self.__point_cloud = None
+
     @property
     def inliers(self) -> pd.DataFrame:
+        """
+        Returns the inliers as a DataFrame with the columns x, y and z, created the first time it is accessed after
+        the inliers change
+        :return:
+        """
+        if self.__inliers is None:
+            self.__inliers = pd.DataFrame(self.__inlier_points, columns=["x", "y", "z"])
+
         return self.__inliers
 
     @inliers.setter
@@ -97,6 +120,7 @@ class Plane:
         if not isinstance(inliers, pd.DataFrame):
             raise TypeError("Inliers must be a pandas DataFrame")
 
+        self.inlier_points = inliers[["x", "y", "z"]].to_numpy()
         self.__inliers = inliers
 
     def add_point(self, point: np.array) -> None:
@@ -108,8 +132,7 @@ class Plane:
         if point is None:
             raise TypeError("Point cannot be null")
 
-        # FIXME: Points to dataframe is not being added correctly
-        self.inliers.loc[len(self.inliers)] = point
+        self.inlier_points = np.vstack((self.inlier_points, np.asarray(point).reshape(1, 3)))
 
     def z(self, x: float, y: float) -> float:
         """
@@ -141,12 +164,92 @@ class Plane:
 
         return z - plane_z
 
+    @property
+    def coefficients(self) -> np.ndarray:
+        """
+        Returns the plane parameters as an array (a, b, c, d)
+        :return:
+        """
+        return np.array([self.a, self.b, self.c, self.d], dtype=np.float64)
+
+    def z_batch(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the z value of the plane for every point
+        :param points: (n, 2) or (n, 3) array, only x and y are used
+        :return:
+        """
+        points = np.asarray(points, dtype=np.float64)
+        return (-self.a * points[:, 0] - self.b * points[:, 1] - self.d) / self.c
+
+    def z_distance_batch(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the vertical distance between every point and the plane
+        :param points: (n, 3) array
+        :return:
+        """
+        points = np.asarray(points, dtype=np.float64)
+        return points[:, 2] - self.z_batch(points)
+
+    def signed_distance_batch(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the signed orthogonal distance between every point and the plane, positive on the side the
+        normal vector points to
+        :param points: (n, 3) array
+        :return:
+        """
+        points = np.asarray(points, dtype=np.float64)
+        normal = np.array([self.a, self.b, self.c], dtype=np.float64)
+        return (points @ normal + self.d) / np.linalg.norm(normal)
+
+    def orthogonal_distance_batch(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the orthogonal distance between every point and the plane
+        :param points: (n, 3) array
+        :return:
+        """
+        return np.abs(self.signed_distance_batch(points))
+
+    @staticmethod
+    def grouped_residual_SD(points: np.ndarray, coefficients: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Calculates the SD of the absolute vertical residuals of many planes in one grouped pass
+        :param points: (n, 3) array of the points of all groups, stored group after group
+        :param coefficients: (k, 4) array with the parameters a, b, c, d of each group's plane
+        :param lengths: No. of points in each group
+        :return: (k,) array of residual SDs, NaN for empty groups
+        """
+        points = np.asarray(points, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        residual_SD = np.full(len(lengths), np.nan)
+
+        if len(points) == 0:
+            return residual_SD
+
+        a, b, c, d = np.repeat(coefficients, lengths, axis=0).T  # Plane parameters of each point's group
+        residuals = np.abs(points[:, 2] - (-a * points[:, 0] - b * points[:, 1] - d) / c)
+
+        non_empty = lengths > 0
+        starts = (np.cumsum(lengths) - lengths)[non_empty]
+        counts = lengths[non_empty]
+
+        means = np.add.reduceat(residuals, starts) / counts
+        squared_deviations = (residuals - np.repeat(means, counts)) ** 2
+        residual_SD[non_empty] = np.sqrt(np.add.reduceat(squared_deviations, starts) / counts)
+        return residual_SD
+
     @property
     def point_cloud(self) -> o3d.geometry.PointCloud:
-        df = self.inliers
-        point_cloud = o3d.geometry.PointCloud()
-        point_cloud.points = o3d.utility.Vector3dVector(df.to_numpy())
-        return point_cloud
+        """
+        Returns the inliers as a point cloud, created the first time it is accessed after the inliers change
+        :return:
+        """
+        if self.__point_cloud is None:
+            self.__point_cloud = o3d.geometry.PointCloud()
+            self.__point_cloud.points = o3d.utility.Vector3dVector(
+                np.ascontiguousarray(self.inlier_points, dtype=np.float64)
+            )
+
+        return self.__point_cloud
 
     def __repr__(self):
         return f"a: {self.a}, b: {self.b}, c: {self.c}, d: {self.d}"
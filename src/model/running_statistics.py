@@ -0,0 +1,219 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class GroupStatistics:
+    counts: np.ndarray  # No. of values in each group
+    means: np.ndarray  # Mean of each group, NaN for empty groups
+    M2: np.ndarray  # Sum of the squared deviations from the mean of each group
+    M3: np.ndarray = None  # Sums of the 3rd and 4th powers of the deviations, None unless asked for
+    M4: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def VARs(self) -> np.ndarray:
+        """
+        Sample variance of each group, like pandas. NaN for groups with fewer than two values
+        :return:
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.counts > 1, self.M2 / (self.counts - 1), np.nan)
+
+
+class RunningStatistics:
+    __slots__ = ("__count", "__mean", "__M2", "__M3", "__M4", "__min", "__max")
+
+    def __init__(self) -> None:
+        """
+        Count, mean, central moments, min and max of a stream of values. Batches are folded in with the pairwise
+        update of Chan et al., so statistics of chunks, segments or workers can be merged without revisiting the
+        values
+        """
+        self.__count = 0
+        self.__mean = 0.0
+        self.__M2 = 0.0  # Sums of the 2nd, 3rd and 4th powers of the deviations from the mean
+        self.__M3 = 0.0
+        self.__M4 = 0.0
+        self.__min = np.inf
+        self.__max = -np.inf
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> 'RunningStatistics':
+        """
+        Creates the statistics of an array of values
+        :param values:
+        :return:
+        """
+        return cls().update(values)
+
+    @staticmethod
+    def from_groups(values: np.ndarray, offsets: np.ndarray, higher_moments: bool = False) -> 'GroupStatistics':
+        """
+        Calculates the statistics of every group of a grouped array as columns, with one set of grouped passes over
+        the values
+        :param values: 1-dimensional values of all groups, stored group after group
+        :param offsets: Start of each group in values, followed by the total no. of values
+        :param higher_moments: Whether to also sum the 3rd and 4th powers of the deviations, which needs two more
+        passes
+        :return:
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        counts = np.diff(offsets)
+        statistics = GroupStatistics(
+            counts=counts,
+            means=np.full(len(counts), np.nan),
+            M2=np.zeros(len(counts)),
+            M3=np.zeros(len(counts)) if higher_moments else None,
+            M4=np.zeros(len(counts)) if higher_moments else None,
+        )
+
+        non_empty = counts > 0
+        if not np.any(non_empty):
+            return statistics
+
+        values = np.asarray(values)[offsets[0]:offsets[-1]]
+        starts = offsets[:-1][non_empty] - offsets[0]
+        lengths = counts[non_empty]
+
+        means = np.add.reduceat(values, starts, dtype=np.float64) / lengths
+        deviations = np.repeat(means, lengths)
+        np.subtract(values, deviations, out=deviations)  # Reusing the buffer, so only one value-sized array is made
+        statistics.means[non_empty] = means
+
+        if higher_moments:
+            squared_deviations = deviations * deviations
+            statistics.M2[non_empty] = np.add.reduceat(squared_deviations, starts)
+            statistics.M3[non_empty] = np.add.reduceat(squared_deviations * deviations, starts)
+            statistics.M4[non_empty] = np.add.reduceat(squared_deviations * squared_deviations, starts)
+        else:
+            np.multiply(deviations, deviations, out=deviations)
+            statistics.M2[non_empty] = np.add.reduceat(deviations, starts)
+
+        return statistics
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    @property
+    def mean(self) -> float:
+        return self.__mean if self.__count > 0 else np.nan
+
+    @property
+    def VAR(self) -> float:
+        """
+        Sample variance, like pandas
+        :return:
+        """
+        return self.__M2 / (self.__count - 1) if self.__count > 1 else np.nan
+
+    @property
+    def SD(self) -> float:
+        return float(np.sqrt(self.VAR))
+
+    @property
+    def SE(self) -> float:
+        return self.SD / np.sqrt(self.__count) if self.__count > 0 else np.nan
+
+    @property
+    def skewness(self) -> float:
+        if self.__count < 2 or self.__M2 == 0:
+            return np.nan
+
+        return float(np.sqrt(self.__count) * self.__M3 / self.__M2 ** 1.5)
+
+    @property
+    def kurtosis(self) -> float:
+        """
+        Excess kurtosis, without bias correction
+        :return:
+        """
+        if self.__count < 2 or self.__M2 == 0:
+            return np.nan
+
+        return self.__count * self.__M4 / self.__M2 ** 2 - 3
+
+    @property
+    def min(self) -> float:
+        return self.__min if self.__count > 0 else np.nan
+
+    @property
+    def max(self) -> float:
+        return self.__max if self.__count > 0 else np.nan
+
+    def update(self, values: np.ndarray) -> 'RunningStatistics':
+        """
+        Folds a batch of values into the statistics
+        :param values: Values of any shape; integer buffers are accumulated in float64
+        :return: self
+        """
+        values = np.asarray(values).ravel()
+
+        if len(values) == 0:
+            return self
+
+        batch = RunningStatistics()
+        batch.__count = len(values)
+        batch.__mean = float(np.mean(values, dtype=np.float64))
+        deviations = values - batch.__mean
+        squared_deviations = deviations * deviations
+        batch.__M2 = float(squared_deviations.sum())
+        batch.__M3 = float((squared_deviations * deviations).sum())
+        batch.__M4 = float((squared_deviations * squared_deviations).sum())
+        batch.__min = float(values.min())
+        batch.__max = float(values.max())
+
+        return self.merge(batch)
+
+    def merge(self, other: 'RunningStatistics') -> 'RunningStatistics':
+        """
+        Merges the statistics of another set of values into these
+        :param other:
+        :return: self
+        """
+        if not isinstance(other, RunningStatistics):
+            raise TypeError("Can only merge RunningStatistics")
+
+        if other.__count == 0:
+            return self
+
+        if self.__count == 0:
+            self.__count, self.__mean = other.__count, other.__mean
+            self.__M2, self.__M3, self.__M4 = other.__M2, other.__M3, other.__M4
+            self.__min, self.__max = other.__min, other.__max
+            return self
+
+        n_a, n_b = self.__count, other.__count
+        n = n_a + n_b
+        delta = other.__mean - self.__mean
+        delta_n = delta / n
+
+        M2 = self.__M2 + other.__M2 + delta * delta_n * n_a * n_b
+        M3 = self.__M3 + other.__M3 \
+            + delta * delta_n ** 2 * n_a * n_b * (n_a - n_b) \
+            + 3 * delta_n * (n_a * other.__M2 - n_b * self.__M2)
+        M4 = self.__M4 + other.__M4 \
+            + delta * delta_n ** 3 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2) \
+            + 6 * delta_n ** 2 * (n_a ** 2 * other.__M2 + n_b ** 2 * self.__M2) \
+            + 4 * delta_n * (n_a * other.__M3 - n_b * self.__M3)
+
+        self.__count = n
+        self.__mean += delta_n * n_b
+        self.__M2, self.__M3, self.__M4 = M2, M3, M4
+        self.__min = min(self.__min, other.__min)
+        self.__max = max(self.__max, other.__max)
+        return self
+
+    def __add__(self, other: 'RunningStatistics') -> 'RunningStatistics':
+        return RunningStatistics().merge(self).merge(other)
+
+    def __repr__(self) -> str:
+        return f"count: {self.__count}; " \
+               f"mean: {self.mean}; " \
+               f"SD: {self.SD}; " \
+               f"min: {self.min}; " \
+               f"max: {self.max};"
@@ -0,0 +1,615 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Callable, Iterator
+
+import numpy as np
+
+from config import Config
+from src.lazy_module import LazyModule
+from src.model.plane import Plane
+from src.model.running_statistics import RunningStatistics
+from src.model.statistics_index import StatisticsIndex
+
+o3d = LazyModule("open3d")  # Only imported when a segment's point cloud is created
+
+
+class SegmentTable:
+    __slots__ = (
+        "__points",
+        "__offsets",
+        "__order",
+        "__plane_coefficients",
+        "__inlier_indexes",
+        "__inlier_offsets",
+        "__means",
+        "__VARs",
+        "__residual_SDs",
+        "__flags",
+        "__flag_threshold",
+        "__statistics",
+        "__fitted",
+        "__segment_inliers",
+        "__fit",
+        "__independent",
+        "__on_fitted",
+    )
+
+    def __init__(
+            self,
+            points: np.ndarray,
+            offsets: np.ndarray,
+            plane_coefficients: np.ndarray = None,
+            inlier_indexes: np.ndarray = None,
+            inlier_offsets: np.ndarray = None,
+            order: np.ndarray = None,
+            fit: Callable[[np.ndarray, np.ndarray, int], list[tuple[np.ndarray, np.ndarray]]] = None,
+            independent: bool = True,
+            on_fitted: Callable[['SegmentTable'], None] = None,
+            means: np.ndarray = None,
+            VARs: np.ndarray = None,
+            residual_SDs: np.ndarray = None
+    ) -> None:
+        """
+        Columnar storage of all segments of a point cloud. The points of every segment are stored in one contiguous
+        buffer, and every per-segment value is stored as one entry in a NumPy column
+        :param points: (n, 3) array of the points of all segments, stored segment after segment. May be a read-only
+        view of a memory mapped file
+        :param offsets: Start of each segment in points, followed by the total no. of points
+        :param plane_coefficients: (k, 4) array with the plane parameters a, b, c, d of each segment
+        :param inlier_indexes: Indexes into points of the inliers of all segments, stored segment after segment
+        :param inlier_offsets: Start of each segment in inlier_indexes, followed by the total no. of inliers
+        :param order: Index of each point in the parent point cloud, None if points are in the parent's order
+        :param fit: Fits the planes of a run of segments, taking their points, their offsets and the index of the first
+        segment in the run, and returning the plane model and local inlier indexes of each segment. Used instead of
+        the plane arguments to fit each plane the first time it is used
+        :param independent: Whether the plane of a segment only depends on its own points. When False all planes are
+        fitted together on first use, e.g. when every plane is fitted to a window spanning the neighbouring segments
+        :param on_fitted: Called with the table once the planes of all segments are fitted
+        :param means: z mean of each segment, computed from the points if None
+        :param VARs: z variance of each segment, computed from the points together with the means if None
+        :param residual_SDs: Residual SD of each segment's plane, computed from the inliers if None. The columns are
+        given when they were computed while the points were read, so the points are not passed over again
+        """
+        if plane_coefficients is None and fit is None:
+            raise TypeError("Either the planes or a function fitting them must be set")
+
+        self.__points = points
+        self.__offsets = np.asarray(offsets, dtype=np.int64)
+        self.__order = order
+        self.__plane_coefficients = np.full((len(self), 4), np.nan)
+        self.__inlier_indexes = None
+        self.__inlier_offsets = None
+        self.__residual_SDs = np.full(len(self), np.nan)
+        self.__fitted = np.zeros(len(self), dtype=bool)
+        self.__segment_inliers = {}  # Inlier indexes of the segments fitted so far, until all are fitted
+        self.__fit = fit
+        self.__independent = independent
+        self.__on_fitted = on_fitted
+        self.__flags = np.zeros(len(self), dtype=bool)
+        self.__flag_threshold = None
+        self.__statistics = None
+
+        if means is None or VARs is None:
+            self.__compute_statistics()
+        else:
+            self.__means = np.asarray(means, dtype=np.float64)
+            self.__VARs = np.asarray(VARs, dtype=np.float64)
+
+        if plane_coefficients is not None:
+            self.__set_planes(plane_coefficients, inlier_indexes, inlier_offsets, residual_SDs)
+
+    @classmethod
+    def from_fits(
+            cls,
+            points: np.ndarray,
+            offsets: np.ndarray,
+            fits: list[tuple[np.ndarray, np.ndarray]],
+            order: np.ndarray = None
+    ) -> 'SegmentTable':
+        """
+        Creates a segment table from the plane fits of each segment
+        :param points: (n, 3) array of the points of all segments, stored segment after segment
+        :param offsets: Start of each segment in points, followed by the total no. of points
+        :param fits: Plane model and local inlier indexes of each segment
+        :param order: Index of each point in the parent point cloud
+        :return:
+        """
+        return cls(points, offsets, *cls.planes_from_fits(offsets, fits), order=order)
+
+    @staticmethod
+    def planes_from_fits(
+            offsets: np.ndarray,
+            fits: list[tuple[np.ndarray, np.ndarray]]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Converts the plane fits of each segment to the plane columns of the table
+        :param offsets:
+        :param fits:
+        :return: The plane coefficients, the inlier indexes into points and the inlier offsets
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        plane_coefficients = np.array([plane_model for plane_model, _ in fits], dtype=np.float64).reshape(-1, 4)
+
+        inlier_counts = np.array([len(inlier_indexes) for _, inlier_indexes in fits], dtype=np.int64)
+        inlier_offsets = np.concatenate(([0], np.cumsum(inlier_counts)))
+        inlier_indexes = np.concatenate(
+            [inlier_indexes for _, inlier_indexes in fits] or [np.empty(0, dtype=np.int64)]
+        ).astype(np.int64)
+        inlier_indexes += np.repeat(offsets[:-1], inlier_counts)  # Local indexes to indexes into points
+
+        return plane_coefficients, inlier_indexes, inlier_offsets
+
+    @property
+    def points(self) -> np.ndarray:
+        return self.__points
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.__offsets
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.__offsets)
+
+    @property
+    def order(self) -> np.ndarray:
+        return self.__order
+
+    @property
+    def plane_coefficients(self) -> np.ndarray:
+        self.__ensure_planes()
+        return self.__plane_coefficients
+
+    @property
+    def inlier_indexes(self) -> np.ndarray:
+        self.__ensure_planes()
+        return self.__inlier_indexes
+
+    @property
+    def inlier_offsets(self) -> np.ndarray:
+        self.__ensure_planes()
+        return self.__inlier_offsets
+
+    @property
+    def inlier_counts(self) -> np.ndarray:
+        return np.diff(self.inlier_offsets)
+
+    @property
+    def planes_fitted(self) -> bool:
+        return bool(self.__fitted.all())
+
+    @property
+    def fitted(self) -> np.ndarray:
+        """
+        Returns whether the plane of each segment has been fitted
+        :return:
+        """
+        return self.__fitted.copy()
+
+    @property
+    def means(self) -> np.ndarray:
+        return self.__means
+
+    @property
+    def VARs(self) -> np.ndarray:
+        return self.__VARs
+
+    @property
+    def SDs(self) -> np.ndarray:
+        return np.sqrt(self.__VARs)
+
+    @property
+    def SEs(self) -> np.ndarray:
+        return self.SDs / np.sqrt(self.lengths)
+
+    @property
+    def residual_SDs(self) -> np.ndarray:
+        self.__ensure_planes()
+        return self.__residual_SDs
+
+    @property
+    def statistics(self) -> StatisticsIndex:
+        """
+        Returns the sorted statistics index of the segments, built on first use
+        :return:
+        """
+        if self.__statistics is None:
+            self.__statistics = StatisticsIndex.from_table(self)
+
+        return self.__statistics
+
+    @property
+    def flags(self) -> np.ndarray:
+        if self.__flag_threshold is not None:
+            self.flag(self.__flag_threshold)  # Flagging deferred by flag_lazily
+
+        return self.__flags
+
+    @flags.setter
+    def flags(self, flags: np.ndarray) -> None:
+        flags = np.asarray(flags, dtype=bool)
+
+        if flags.shape != (len(self),):
+            raise ValueError("There must be one flag per segment")
+
+        self.__flags = flags
+        self.__flag_threshold = None
+
+    def segment_points(self, i: int) -> np.ndarray:
+        """
+        Returns a view of the points of segment i
+        :param i:
+        :return:
+        """
+        return self.__points[self.__offsets[i]:self.__offsets[i + 1]]
+
+    def plane_model(self, i: int) -> np.ndarray:
+        """
+        Returns the plane parameters a, b, c, d of segment i, fitting only that plane if it was deferred
+        :param i:
+        :return:
+        """
+        self.__ensure_planes([i])
+        return self.__plane_coefficients[i]
+
+    def residual_SD(self, i: int) -> float:
+        """
+        Returns the residual SD of segment i, fitting only that plane if it was deferred
+        :param i:
+        :return:
+        """
+        self.__ensure_planes([i])
+        return float(self.__residual_SDs[i])
+
+    def inlier_points(self, i: int) -> np.ndarray:
+        """
+        Returns the inliers of segment i, fitting only that plane if it was deferred
+        :param i:
+        :return:
+        """
+        self.__ensure_planes([i])
+
+        if self.__inlier_offsets is None:
+            return self.__points[self.__segment_inliers[i]]
+
+        return self.__points[self.__inlier_indexes[self.__inlier_offsets[i]:self.__inlier_offsets[i + 1]]]
+
+    def fit_planes(self, segments: np.ndarray = None) -> None:
+        """
+        Fits the deferred planes of the given segments. Planes that are already fitted are kept
+        :param segments: Boolean mask over the segments, or the indexes of the segments. All segments if None
+        :return:
+        """
+        self.__ensure_planes(segments)
+
+    def gather_inliers(self, segments: np.ndarray) -> np.ndarray:
+        """
+        Returns the inliers of many segments with one gather from the point buffer
+        :param segments: Boolean mask over the segments, or the indexes of the segments
+        :return: (m, 3) array of the inliers in segment order, with the dtype of the points
+        """
+        segments = np.asarray(segments)
+        selected = segments if segments.dtype == bool else np.isin(np.arange(len(self)), segments)
+
+        inlier_offsets = self.inlier_offsets
+        starts = inlier_offsets[:-1][selected]
+        lengths = np.diff(inlier_offsets)[selected]
+
+        # Concatenating the ranges starts[i]:starts[i] + lengths[i] of the inlier indexes
+        ranges = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return self.__points[self.__inlier_indexes[ranges]]
+
+    def flag(self, threshold: float) -> np.ndarray:
+        """
+        Flags the segments where the residual SD is larger than the threshold
+        :param threshold:
+        :return: The flags
+        """
+        self.__flag_threshold = None
+        self.__flags = self.statistics.mask(self.statistics.above("residual_SD", threshold))
+        return self.__flags
+
+    def flag_lazily(self, threshold: float) -> None:
+        """
+        Flags the segments with the threshold the first time the flags are read, so the planes are only fitted when
+        they are needed
+        :param threshold:
+        :return:
+        """
+        self.__flag_threshold = threshold
+
+    def __set_planes(
+            self,
+            plane_coefficients: np.ndarray,
+            inlier_indexes: np.ndarray,
+            inlier_offsets: np.ndarray,
+            residual_SDs: np.ndarray = None
+    ) -> None:
+        """
+        Sets the plane columns and computes the residual SD of every segment in one grouped pass
+        :param plane_coefficients:
+        :param inlier_indexes:
+        :param inlier_offsets:
+        :param residual_SDs: Residual SDs computed in advance, None to compute them from the inliers
+        :return:
+        """
+        if len(self) != len(plane_coefficients):
+            raise ValueError("There must be one plane per segment")
+
+        if len(inlier_offsets) != len(self.__offsets):
+            raise ValueError("Inlier offsets and offsets must have the same length")
+
+        self.__plane_coefficients = np.asarray(plane_coefficients, dtype=np.float64)
+        self.__inlier_indexes = np.asarray(inlier_indexes, dtype=np.int64)
+        self.__inlier_offsets = np.asarray(inlier_offsets, dtype=np.int64)
+
+        if residual_SDs is not None:
+            self.__residual_SDs = np.asarray(residual_SDs, dtype=np.float64)
+        else:
+            self.__residual_SDs = Plane.grouped_residual_SD(
+                self.__points[self.__inlier_indexes],
+                self.__plane_coefficients,
+                np.diff(self.__inlier_offsets)
+            )
+        self.__fitted[:] = True
+        self.__segment_inliers = {}
+
+    def __ensure_planes(self, segments: np.ndarray = None) -> None:
+        """
+        Fits the deferred planes of the given segments, one run of adjacent segments at a time, and builds the inlier
+        columns once every plane is fitted
+        :param segments: Boolean mask over the segments, or the indexes of the segments. All segments if None
+        :return:
+        """
+        if self.__fit is None:
+            return
+
+        missing = ~self.__fitted
+
+        if segments is not None and self.__independent:
+            segments = np.asarray(segments)
+            missing &= segments if segments.dtype == bool else np.isin(np.arange(len(self)), segments)
+
+        if not missing.any():
+            return
+
+        if missing.all():
+            fits = self.__fit(self.__points, self.__offsets, 0)  # Fitting every plane in one call
+            self.__set_planes(*self.planes_from_fits(self.__offsets, fits))
+        else:
+            indexes = np.flatnonzero(missing)
+            breaks = np.flatnonzero(np.diff(indexes) > 1) + 1
+
+            for run in np.split(indexes, breaks):
+                self.__fit_run(int(run[0]), int(run[-1]) + 1)
+
+            if self.__fitted.all():
+                self.__set_planes(self.__plane_coefficients, *self.__collect_inliers())
+
+        if self.planes_fitted:
+            self.__fit = None
+
+            if self.__on_fitted is not None:
+                self.__on_fitted(self)
+
+    def __fit_run(self, start: int, stop: int) -> None:
+        """
+        Fits the planes of the segments start to stop, which are stored next to each other in the points
+        :param start:
+        :param stop:
+        :return:
+        """
+        offsets = self.__offsets[start:stop + 1] - self.__offsets[start]
+        fits = self.__fit(self.__points[self.__offsets[start]:self.__offsets[stop]], offsets, start)
+        plane_coefficients, inlier_indexes, inlier_offsets = self.planes_from_fits(offsets, fits)
+        inlier_indexes += self.__offsets[start]  # Indexes into the run to indexes into points
+
+        self.__plane_coefficients[start:stop] = plane_coefficients
+        self.__residual_SDs[start:stop] = Plane.grouped_residual_SD(
+            self.__points[inlier_indexes], plane_coefficients, np.diff(inlier_offsets)
+        )
+
+        for i in range(stop - start):
+            self.__segment_inliers[start + i] = inlier_indexes[inlier_offsets[i]:inlier_offsets[i + 1]]
+
+        self.__fitted[start:stop] = True
+
+    def __collect_inliers(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenates the inlier indexes of the segments fitted one run at a time into the inlier columns
+        :return: The inlier indexes and the inlier offsets
+        """
+        inliers = [self.__segment_inliers[i] for i in range(len(self))]
+        inlier_offsets = np.concatenate(([0], np.cumsum([len(indexes) for indexes in inliers]))).astype(np.int64)
+        return np.concatenate(inliers or [np.empty(0, dtype=np.int64)]), inlier_offsets
+
+    def __compute_statistics(self) -> None:
+        """
+        Computes the z mean and z variance of every segment in one grouped pass
+        :return:
+        """
+        statistics = RunningStatistics.from_groups(self.__points[:, 2], self.__offsets)
+        self.__means = statistics.means
+        self.__VARs = statistics.VARs  # Sample variance, like pandas
+
+    def __len__(self) -> int:
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, i: int) -> 'SegmentView':
+        if not -len(self) <= i < len(self):
+            raise IndexError("Segment index out of range")
+
+        return SegmentView(self, i % len(self))
+
+    def __iter__(self) -> Iterator['SegmentView']:
+        for i in range(len(self)):
+            yield SegmentView(self, i)
+
+    def __repr__(self) -> str:
+        return f"no. of segments: {len(self)}; " \
+               f"no. of points: {len(self.__points)}; " \
+               f"no. of flagged segments: {int(self.flags.sum()) if self.planes_fitted else 'not fitted'};"
+
+
+class SegmentView:
+    __slots__ = ("__table", "__index", "__point_cloud", "__plane")
+
+    def __init__(self, table: SegmentTable, index: int) -> None:
+        """
+        Lightweight view of one segment in a segment table, offering the same attributes as a child LAS object. The
+        point cloud and plane are created the first time they are accessed
+        :param table:
+        :param index:
+        """
+        self.__table = table
+        self.__index = index
+        self.__point_cloud = None
+        self.__plane = None
+
+    @property
+    def table(self) -> SegmentTable:
+        return self.__table
+
+    @property
+    def index(self) -> int:
+        return self.__index
+
+    @property
+    def points(self) -> np.ndarray:
+        return self.__table.segment_points(self.__index)
+
+    @property
+    def point_cloud(self) -> o3d.geometry.PointCloud:
+        """
+        Returns the points of the segment as a point cloud, created on first access
+        :return:
+        """
+        if self.__point_cloud is None:
+            self.__point_cloud = o3d.geometry.PointCloud()
+            self.__point_cloud.points = o3d.utility.Vector3dVector(
+                np.ascontiguousarray(self.points, dtype=np.float64)
+            )
+
+        return self.__point_cloud
+
+    @property
+    def plane(self) -> Plane:
+        """
+        Returns the plane of the segment as a Plane object, created on first access
+        :return:
+        """
+        if self.__plane is None:
+            a, b, c, d = self.__table.plane_model(self.__index)
+            self.__plane = Plane(a, b, c, d)
+            self.__plane.inlier_points = self.__table.inlier_points(self.__index)
+
+        return self.__plane
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.__table.flags[self.__index])
+
+    @flagged.setter
+    def flagged(self, flagged: bool) -> None:
+        self.__table.flags[self.__index] = flagged
+
+    def mean(self) -> float:
+        return float(self.__table.means[self.__index])
+
+    def VAR(self) -> float:
+        return float(self.__table.VARs[self.__index])
+
+    def SD(self) -> float:
+        return float(self.__table.SDs[self.__index])
+
+    def SE(self) -> float:
+        return float(self.__table.SEs[self.__index])
+
+    def residual_SD(self) -> float:
+        return self.__table.residual_SD(self.__index)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, SegmentView) and other.table is self.__table and other.index == self.__index
+
+    def __hash__(self) -> int:
+        return hash((id(self.__table), self.__index))
+
+    def __repr__(self) -> str:
+        return f"segment: {self.__index}; " \
+               f"no. of points: {len(self.points)}; " \
+               f"flagged: {self.flagged};"
+
+
+class SegmentSequence(Sequence):
+    __slots__ = ("__table", "__cache_size", "__views")
+
+    def __init__(self, table: SegmentTable, cache_size: int = Config.SEGMENT_CACHE_SIZE.value) -> None:
+        """
+        Sequence of the segments in a segment table. A segment view is created when the segment is first accessed
+        and memoized together with its point cloud and plane, evicting the least recently used views when more than
+        cache_size are held
+        :param table:
+        :param cache_size: Maximum no. of memoized views, None for no limit and 0 to create a new view on every access
+        """
+        if cache_size is not None and cache_size < 0:
+            raise ValueError("Cache size cannot be negative")
+
+        self.__table = table
+        self.__cache_size = cache_size
+        self.__views: OrderedDict[int, SegmentView] = OrderedDict()
+
+    @property
+    def table(self) -> SegmentTable:
+        return self.__table
+
+    @property
+    def cache_size(self) -> int:
+        return self.__cache_size
+
+    @property
+    def cached(self) -> int:
+        """
+        Returns the no. of memoized views
+        :return:
+        """
+        return len(self.__views)
+
+    def clear(self) -> None:
+        self.__views.clear()
+
+    def __getitem__(self, i: int | slice) -> SegmentView | list[SegmentView]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if not -len(self) <= i < len(self):
+            raise IndexError("Segment index out of range")
+
+        i = int(i) % len(self)
+        view = self.__views.get(i)
+
+        if view is not None:
+            self.__views.move_to_end(i)
+            return view
+
+        view = SegmentView(self.__table, i)
+
+        if self.__cache_size != 0:
+            self.__views[i] = view
+
+            if self.__cache_size is not None and len(self.__views) > self.__cache_size:
+                self.__views.popitem(last=False)  # Evicting the least recently used view
+
+        return view
+
+    def __len__(self) -> int:
+        return len(self.__table)
+
+    def __iter__(self) -> Iterator[SegmentView]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"no. of segments: {len(self)}; " \
+               f"no. of memoized segments: {len(self.__views)};"
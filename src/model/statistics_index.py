@@ -0,0 +1,129 @@
+from typing import Callable
+
+import numpy as np
+
+
+class StatisticsIndex:
+    __slots__ = ("__columns", "__orders", "__sorted_columns")
+
+    COLUMNS = ("mean", "SD", "SE", "residual_SD", "inlier_count")
+
+    def __init__(self, columns: dict[str, np.ndarray | Callable[[], np.ndarray]]) -> None:
+        """
+        Sorted views of the per-segment statistics, so range queries are binary searches instead of scans. NaN values
+        are sorted last and never match a query
+        :param columns: One value per segment for every name in StatisticsIndex.COLUMNS, or a function returning
+        them. Functions are called and their column sorted the first time the column is queried
+        """
+        if set(columns) != set(StatisticsIndex.COLUMNS):
+            raise ValueError(f"Columns must be {', '.join(StatisticsIndex.COLUMNS)}")
+
+        self.__columns = dict(columns)
+        self.__orders = {}
+        self.__sorted_columns = {}
+
+    @classmethod
+    def from_table(cls, segment_table) -> 'StatisticsIndex':
+        """
+        Creates the index from the statistics columns of a segment table
+        :param segment_table:
+        :return:
+        """
+        return cls({
+            "mean": segment_table.means,
+            "SD": segment_table.SDs,
+            "SE": segment_table.SEs,
+            "residual_SD": lambda: segment_table.residual_SDs,  # Plane columns may not be fitted yet
+            "inlier_count": lambda: segment_table.inlier_counts,
+        })
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Returns the values of a column in segment order
+        :param name:
+        :return:
+        """
+        self.__validate(name)
+        return self.__resolve(name)
+
+    def range(self, name: str, lower_bound: float = -np.inf, upper_bound: float = np.inf) -> np.ndarray:
+        """
+        Finds the segments whose value lies strictly between the bounds
+        :param name: Name of the column
+        :param lower_bound:
+        :param upper_bound:
+        :return: Indexes of the matching segments in ascending order
+        """
+        self.__validate(name)
+        sorted_values = self.__sorted(name)
+        start = np.searchsorted(sorted_values, lower_bound, side="right")
+        end = np.searchsorted(sorted_values, upper_bound, side="left")
+
+        return np.sort(self.__orders[name][start:max(start, end)])
+
+    def above(self, name: str, threshold: float) -> np.ndarray:
+        """
+        Finds the segments whose value is larger than the threshold
+        :param name:
+        :param threshold:
+        :return: Indexes of the matching segments in ascending order
+        """
+        self.__validate(name)
+        sorted_values = self.__sorted(name)
+        start = np.searchsorted(sorted_values, threshold, side="right")
+        end = len(sorted_values) - np.count_nonzero(np.isnan(sorted_values))
+
+        return np.sort(self.__orders[name][start:max(start, end)])
+
+    def mask(self, indexes: np.ndarray) -> np.ndarray:
+        """
+        Converts segment indexes returned by a query to a boolean mask over all segments
+        :param indexes:
+        :return:
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        mask[indexes] = True
+        return mask
+
+    def __resolve(self, name: str) -> np.ndarray:
+        """
+        Returns the values of a column, calling its function the first time it is used
+        :param name:
+        :return:
+        """
+        values = self.__columns[name]
+
+        if callable(values):
+            values = self.__columns[name] = np.asarray(values(), dtype=np.float64)
+        elif values.dtype != np.float64:
+            values = self.__columns[name] = np.asarray(values, dtype=np.float64)
+
+        if len({len(column) for column in self.__columns.values() if not callable(column)}) > 1:
+            raise ValueError("All columns must have one value per segment")
+
+        return values
+
+    def __sorted(self, name: str) -> np.ndarray:
+        """
+        Returns the sorted values of a column, sorting the column the first time it is queried
+        :param name:
+        :return:
+        """
+        if name not in self.__sorted_columns:
+            values = self.__resolve(name)
+            self.__orders[name] = np.argsort(values, kind="stable")
+            self.__sorted_columns[name] = values[self.__orders[name]]
+
+        return self.__sorted_columns[name]
+
+    @staticmethod
+    def __validate(name: str) -> None:
+        if name not in StatisticsIndex.COLUMNS:
+            raise ValueError(f"Column must be one of {', '.join(StatisticsIndex.COLUMNS)}")
+
+    def __len__(self) -> int:
+        return len(self.__resolve("mean"))
+
+    def __repr__(self) -> str:
+        return f"no. of segments: {len(self)}; " \
+               f"columns: {', '.join(StatisticsIndex.COLUMNS)};"
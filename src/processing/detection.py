@@ -0,0 +1,195 @@
+import numbers
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+from src.model.coordinate_frame import CoordinateFrame
+from src.model.segment_table import SegmentTable
+
+
+@dataclass
+class Events:
+    starts: np.ndarray  # First segment of each event
+    ends: np.ndarray  # Segment after the last segment of each event
+    minimums: np.ndarray  # (k, 3) lower corner of the bounding box of each event
+    maximums: np.ndarray  # (k, 3) upper corner of the bounding box of each event
+    peak_residual_SDs: np.ndarray  # Largest residual SD among the segments of each event
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """
+        Yields the start and end segment of each event
+        :return:
+        """
+        for start, end in zip(self.starts, self.ends):
+            yield int(start), int(end)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """
+        Returns the no. of segments in each event
+        :return:
+        """
+        return self.ends - self.starts
+
+    def mask(self, segment_count: int) -> np.ndarray:
+        """
+        Returns a boolean mask over all segments marking the segments that are part of an event
+        :param segment_count:
+        :return:
+        """
+        boundaries = np.zeros(segment_count + 1, dtype=np.int64)
+        np.add.at(boundaries, self.starts, 1)
+        np.add.at(boundaries, self.ends, -1)
+        return np.cumsum(boundaries[:-1]) > 0
+
+    def to_records(self, frame: CoordinateFrame = None) -> list[dict]:
+        """
+        Converts the events to JSON serializable dictionaries
+        :param frame: Converts the extents and residuals to metres when set, raw units otherwise
+        :return:
+        """
+        minimums, maximums, peak_residual_SDs = self.minimums, self.maximums, self.peak_residual_SDs
+
+        if frame is not None:
+            minimums, maximums = frame.to_metres(minimums), frame.to_metres(maximums)
+            peak_residual_SDs = frame.metres(peak_residual_SDs)
+
+        return [
+            {
+                "start": int(start),
+                "end": int(end),
+                "length": int(end - start),
+                "min": [float(value) for value in minimum],
+                "max": [float(value) for value in maximum],
+                "peak_residual_SD": float(peak),
+            } for start, end, minimum, maximum, peak in zip(
+                self.starts, self.ends, minimums, maximums, peak_residual_SDs
+            )
+        ]
+
+
+class EventDetector:
+    __min_run_length: int
+    __max_run_length: int
+
+    def __init__(
+            self,
+            min_run_length: int = Config.MIN_RUN_LENGTH.value,
+            max_run_length: int = Config.MAX_RUN_LENGTH.value
+    ) -> None:
+        """
+        Turns runs of consecutive flagged segments into events using run-length encoding of the flags
+        :param min_run_length: Minimum no. of consecutive flagged segments in an event
+        :param max_run_length: Maximum no. of consecutive flagged segments in an event, None for no limit
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.min_run_length = min_run_length
+        self.max_run_length = max_run_length
+
+    @property
+    def min_run_length(self) -> int:
+        return self.__min_run_length
+
+    @min_run_length.setter
+    def min_run_length(self, min_run_length: int) -> None:
+        if not isinstance(min_run_length, numbers.Integral):
+            raise TypeError("Minimum run length must be an integer")
+
+        if min_run_length < 1:
+            raise ValueError("Minimum run length must be at least 1")
+
+        self.__min_run_length = int(min_run_length)
+
+    @property
+    def max_run_length(self) -> int:
+        return self.__max_run_length
+
+    @max_run_length.setter
+    def max_run_length(self, max_run_length: int) -> None:
+        if max_run_length is not None and max_run_length < self.min_run_length:
+            raise ValueError("Maximum run length cannot be smaller than the minimum run length")
+
+        self.__max_run_length = max_run_length
+
+    def detect(self, segment_table: SegmentTable) -> Events:
+        """
+        Finds the runs of flagged segments and measures their extent and peak residual
+        :param segment_table:
+        :return:
+        """
+        with Metrics.timer("detection") as timer:
+            flags = segment_table.flags
+            starts, ends = self.runs(flags)
+            minimums, maximums = self.__extents(segment_table, starts, ends)
+
+            residual_SDs = np.append(segment_table.residual_SDs, np.nan)  # Padding, ends may equal the no. of segments
+            peak_residual_SDs = self.__reduce_runs(np.fmax, residual_SDs, starts, ends)
+            timer.points = len(flags)
+
+        Metrics.gauge("events", len(starts))
+        self.logger.info(f"Detected {len(starts)} events in {len(flags)} segments")
+        return Events(starts, ends, minimums, maximums, peak_residual_SDs)
+
+    def runs(self, flags: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the start and end of every run of True values within the run length limits
+        :param flags:
+        :return:
+        """
+        changes = np.diff(np.concatenate(([0], np.asarray(flags, dtype=np.int8), [0])))
+        starts = np.flatnonzero(changes == 1)
+        ends = np.flatnonzero(changes == -1)
+
+        lengths = ends - starts
+        keep = lengths >= self.min_run_length
+        if self.max_run_length is not None:
+            keep &= lengths <= self.max_run_length
+
+        return starts[keep], ends[keep]
+
+    @staticmethod
+    def __extents(segment_table: SegmentTable, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculates the bounding box of the points in each run of segments
+        :param segment_table:
+        :param starts:
+        :param ends:
+        :return:
+        """
+        lengths = segment_table.lengths
+        non_empty = lengths > 0
+        segment_minimums = np.full((len(segment_table) + 1, 3), np.nan)  # Padding, ends may equal the no. of segments
+        segment_maximums = np.full((len(segment_table) + 1, 3), np.nan)
+
+        if np.any(non_empty):
+            points, segment_starts = segment_table.points, segment_table.offsets[:-1][non_empty]
+            segment_minimums[:-1][non_empty] = np.minimum.reduceat(points, segment_starts, axis=0)
+            segment_maximums[:-1][non_empty] = np.maximum.reduceat(points, segment_starts, axis=0)
+
+        return (
+            EventDetector.__reduce_runs(np.fmin, segment_minimums, starts, ends),
+            EventDetector.__reduce_runs(np.fmax, segment_maximums, starts, ends),
+        )
+
+    @staticmethod
+    def __reduce_runs(function: np.ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """
+        Reduces values[starts[i]:ends[i]] for every run in one reduceat call, ignoring NaN values
+        :param function: np.fmin or np.fmax
+        :param values: Per-segment values padded with one extra row
+        :param starts:
+        :param ends:
+        :return:
+        """
+        if len(starts) == 0:
+            return np.empty((0,) + values.shape[1:])
+
+        boundaries = np.column_stack((starts, ends)).ravel()  # Every second reduction is the gap between two runs
+        return function.reduceat(values, boundaries, axis=0)[::2]
@@ -0,0 +1,156 @@
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+
+
+class VoxelDownsampler:
+    __voxel_size: float
+    __mode: str
+    __seed: int
+    __reduction: float
+
+    MODES = ("centroid", "first", "random")
+    PLACEMENTS = ("none", "global", "segment")
+
+    def __init__(
+            self,
+            voxel_size: float = Config.VOXEL_SIZE.value,
+            mode: str = Config.VOXEL_MODE.value,
+            seed: int = Config.RANDOM_SEED.value
+    ) -> None:
+        """
+        Reduces a point cloud to one point per voxel. Every point is mapped to the integer coordinates of its voxel,
+        the voxel coordinates are packed into one integer key, and the points are grouped by key in one stable sort
+        :param voxel_size: Side length of a voxel, in point cloud units
+        :param mode: Either 'centroid' (mean of the points in a voxel), 'first' (first point of a voxel in the
+        original order) or 'random' (random point of a voxel)
+        :param seed: Seed used to draw the random points
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.voxel_size = voxel_size
+        self.mode = mode
+        self.seed = seed
+        self.__reduction = 0.0
+
+    @property
+    def voxel_size(self) -> float:
+        return self.__voxel_size
+
+    @voxel_size.setter
+    def voxel_size(self, voxel_size: float) -> None:
+        if voxel_size is None or voxel_size <= 0:
+            raise ValueError("Voxel size must be larger than 0")
+
+        self.__voxel_size = voxel_size
+
+    @property
+    def mode(self) -> str:
+        return self.__mode
+
+    @mode.setter
+    def mode(self, mode: str) -> None:
+        if mode not in VoxelDownsampler.MODES:
+            raise ValueError(f"Mode must be one of {', '.join(VoxelDownsampler.MODES)}")
+
+        self.__mode = mode
+
+    @property
+    def seed(self) -> int:
+        return self.__seed
+
+    @seed.setter
+    def seed(self, seed: int) -> None:
+        if not isinstance(seed, (int, np.integer)):
+            raise TypeError("Seed must be an integer")
+
+        self.__seed = int(seed)
+
+    @property
+    def reduction(self) -> float:
+        """
+        Share of the points removed by the last call to downsample
+        :return:
+        """
+        return self.__reduction
+
+    def downsample(self, points: np.ndarray, offsets: np.ndarray = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Downsamples the points. When offsets are given, voxels never span two segments and the segments stay
+        contiguous in the output
+        :param points: (n, 3) array of coordinates, sorted by segment if offsets are given
+        :param offsets: Start of each segment followed by the total no. of points, None to downsample globally
+        :return: The downsampled points and the offsets of each segment in them
+        """
+        point_count = len(points)
+        if offsets is None:
+            offsets = np.array([0, point_count], dtype=np.int64)  # One segment holding all points
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+
+        if point_count == 0:
+            return np.empty((0, 3), dtype=np.float64), np.zeros_like(offsets)
+
+        segment_ids = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        keys = self.__voxel_keys(points, segment_ids)
+
+        order = np.argsort(keys, kind="stable")  # Stable sort puts the first point of a voxel first
+        sorted_keys = keys[order]
+        is_start = np.empty(point_count, dtype=bool)
+        is_start[0] = True
+        np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+        starts = np.flatnonzero(is_start)
+        lengths = np.diff(np.append(starts, point_count))
+
+        match self.mode:
+            case "centroid":
+                sampled_points = np.add.reduceat(points[order], starts, axis=0, dtype=np.float64) / lengths[:, None]
+                sampled_segment_ids = segment_ids[order[starts]]  # Keys are sorted by segment first
+            case "first" | "random":
+                if self.mode == "first":
+                    picks = starts
+                else:
+                    random_generator = np.random.default_rng(self.seed)
+                    picks = starts + (random_generator.random(len(starts)) * lengths).astype(np.int64)
+
+                indexes = np.sort(order[picks])  # Back to the original point order
+                sampled_points = np.asarray(points[indexes], dtype=np.float64)
+                sampled_segment_ids = segment_ids[indexes]
+
+        sampled_offsets = np.searchsorted(sampled_segment_ids, np.arange(len(offsets)), side="left")
+        self.__reduction = 1 - len(sampled_points) / point_count
+
+        Metrics.count("voxel_input_points", point_count)
+        Metrics.count("voxel_output_points", len(sampled_points))
+        Metrics.gauge("voxel_reduction", self.__reduction)
+        self.logger.debug(
+            "Downsampled %d points to %d with voxel size %s (%.1f%% reduction)",
+            point_count, len(sampled_points), self.voxel_size, 100 * self.__reduction
+        )
+
+        return sampled_points, sampled_offsets
+
+    def __voxel_keys(self, points: np.ndarray, segment_ids: np.ndarray) -> np.ndarray:
+        """
+        Calculates one integer key per point from its segment and the integer coordinates of its voxel, with the
+        segment as the most significant part
+        :param points:
+        :param segment_ids:
+        :return:
+        """
+        cells = np.floor((points - points.min(axis=0)) / self.voxel_size).astype(np.int64)
+        columns = [segment_ids, cells[:, 0], cells[:, 1], cells[:, 2]]
+        widths = [max(int(column.max()).bit_length(), 1) for column in columns]
+
+        if sum(widths) > 63:
+            # Too many voxels to pack into one integer, numbering the distinct voxels instead
+            _, keys = np.unique(np.column_stack(columns), axis=0, return_inverse=True)
+            return keys.ravel()
+
+        keys = np.zeros(len(points), dtype=np.int64)
+        for column, width in zip(columns, widths):
+            keys <<= width
+            keys |= column
+
+        return keys
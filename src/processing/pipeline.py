@@ -0,0 +1,186 @@
+import numbers
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from queue import Full, Queue
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+from src.processing.downsampling import VoxelDownsampler
+from src.processing.plane_fitting import PlaneFitter
+
+_END = None  # Put in the queue by the reader thread after the last block
+
+
+def _fit_block(
+        block: np.ndarray,
+        seed: int,
+        distance_threshold: float,
+        downsampler: VoxelDownsampler = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Fits the plane of one block, in a worker process or in the calling thread
+    :param block: (n, 3) array of coordinates
+    :param seed:
+    :param distance_threshold:
+    :param downsampler: Fits the plane to the voxel downsampled block when set
+    :return: The plane model and the local inlier indexes of the block
+    """
+    plane_fitter = PlaneFitter(workers=1, seed=seed, distance_threshold=distance_threshold)
+    return plane_fitter.fit(block, np.array([0, len(block)]), downsampler)[0]
+
+
+class BlockPipeline:
+    __workers: int
+    __queue_size: int
+
+    def __init__(
+            self,
+            workers: int = Config.PIPELINE_WORKERS.value,
+            queue_size: int = Config.PIPELINE_QUEUE_SIZE.value
+    ) -> None:
+        """
+        Overlaps reading and plane fitting. A reader thread decodes blocks into a bounded queue while a process pool
+        fits the blocks already read, and the fits are returned in block order. The reader waits when the queue is
+        full, so at most queue_size blocks are waiting in the queue and queue_size blocks are being fitted
+        :param workers: No. of processes fitting blocks, 0 fits them in the calling thread
+        :param queue_size: Max no. of decoded blocks waiting to be fitted
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.workers = workers
+        self.queue_size = queue_size
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @workers.setter
+    def workers(self, workers: int) -> None:
+        if not isinstance(workers, numbers.Integral):
+            raise TypeError("Workers must be an integer")
+
+        if workers < 0:
+            raise ValueError("Workers cannot be negative")
+
+        self.__workers = int(workers)
+
+    @property
+    def queue_size(self) -> int:
+        return self.__queue_size
+
+    @queue_size.setter
+    def queue_size(self, queue_size: int) -> None:
+        if not isinstance(queue_size, numbers.Integral):
+            raise TypeError("Queue size must be an integer")
+
+        if queue_size < 1:
+            raise ValueError("Queue size must be at least 1")
+
+        self.__queue_size = int(queue_size)
+
+    def run(
+            self,
+            blocks: Iterable[np.ndarray],
+            seed: int = Config.RANDOM_SEED.value,
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value,
+            downsampler: VoxelDownsampler = None
+    ) -> Iterator[tuple[np.ndarray, tuple[np.ndarray, np.ndarray]]]:
+        """
+        Fits the plane of every block while the next blocks are being read
+        :param blocks: Blocks of (n, 3) coordinates, e.g. LASChunkReader.blocks
+        :param seed: Base seed, block i is fitted with seed + i so results do not depend on the no. of workers
+        :param distance_threshold: Max distance between a point and its plane, in the units of the points
+        :param downsampler: Fits the planes to the voxel downsampled blocks when set
+        :return: Yields each block with its plane model and local inlier indexes, in block order
+        """
+        queue = Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        reader = threading.Thread(target=self.__read, args=(blocks, queue, stop), daemon=True)
+        reader.start()
+        self.logger.info(f"Fitting blocks in {max(self.workers, 1)} workers, reading {self.queue_size} blocks ahead")
+
+        try:
+            if self.workers == 0:
+                for i, block in enumerate(self.__blocks(queue)):
+                    yield block, _fit_block(block, seed + i, distance_threshold, downsampler)
+                return
+
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                pending: deque[tuple[np.ndarray, Future]] = deque()
+
+                for i, block in enumerate(self.__blocks(queue)):
+                    future = executor.submit(_fit_block, block, seed + i, distance_threshold, downsampler)
+                    pending.append((block, future))
+
+                    if len(pending) >= self.queue_size:  # Waiting for the oldest block before reading more
+                        block, future = pending.popleft()
+                        yield block, future.result()
+
+                while pending:
+                    block, future = pending.popleft()
+                    yield block, future.result()
+        finally:
+            stop.set()
+            reader.join()
+
+    def __blocks(self, queue: Queue) -> Iterator[np.ndarray]:
+        """
+        Takes the blocks out of the queue until the reader thread is done, raising the reader's errors
+        :param queue:
+        :return:
+        """
+        while True:
+            with Metrics.timer("pipeline_wait"):
+                item = queue.get()
+
+            if item is _END:
+                return
+
+            if isinstance(item, BaseException):
+                raise item
+
+            yield item
+
+    @staticmethod
+    def __read(blocks: Iterable[np.ndarray], queue: Queue, stop: threading.Event) -> None:
+        """
+        Puts the blocks in the queue, waiting while the queue is full. Runs in the reader thread
+        :param blocks:
+        :param queue:
+        :param stop: Set when the consumer stops early, so the reader does not wait on a full queue forever
+        :return:
+        """
+        try:
+            for block in blocks:
+                if not BlockPipeline.__put(queue, block, stop):
+                    return
+
+            BlockPipeline.__put(queue, _END, stop)
+        except Exception as error:
+            BlockPipeline.__put(queue, error, stop)  # Raised in the consuming thread
+
+    @staticmethod
+    def __put(queue: Queue, item: object, stop: threading.Event) -> bool:
+        """
+        Puts an item in the queue unless the consumer has stopped
+        :param queue:
+        :param item:
+        :param stop:
+        :return: Whether the item was put in the queue
+        """
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+    def __repr__(self) -> str:
+        return f"workers: {self.workers}; " \
+               f"queue size: {self.queue_size};"
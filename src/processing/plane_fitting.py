@@ -0,0 +1,298 @@
+import numbers
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import Config
+from src.lazy_module import LazyModule
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+from src.processing.downsampling import VoxelDownsampler
+from src.processing.ransac import NumpyRANSAC
+
+o3d = LazyModule("open3d")  # Only imported by the open3d engine, the numpy engine never loads it
+
+_shared_points: np.ndarray = None  # Points attached from shared memory in each worker process
+_shared_memory: shared_memory.SharedMemory = None  # Kept alive for as long as the worker uses the points
+_shared_distance_threshold: float = None  # Distance threshold of the pool's PlaneFitter
+_shared_num_iterations: int = None  # No. of RANSAC iterations of the pool's PlaneFitter
+
+
+def _attach_shared_points(
+        name: str,
+        shape: tuple[int, int],
+        dtype: str,
+        distance_threshold: float,
+        num_iterations: int
+) -> None:
+    """
+    Attaches a worker process to the shared point buffer
+    :param name: Name of the shared memory block
+    :param shape: Shape of the point array
+    :param dtype: Data type of the point array, raw int32 coordinates are shared without converting them
+    :param distance_threshold:
+    :param num_iterations:
+    :return:
+    """
+    global _shared_points, _shared_memory, _shared_distance_threshold, _shared_num_iterations
+    _shared_memory = shared_memory.SharedMemory(name=name)
+    _shared_points = np.ndarray(shape, dtype=dtype, buffer=_shared_memory.buf)
+    _shared_distance_threshold = distance_threshold
+    _shared_num_iterations = num_iterations
+
+
+def _fit_shared_segment(start: int, end: int, seed: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Fits a plane to a slice of the shared point buffer
+    :param start:
+    :param end:
+    :param seed:
+    :return:
+    """
+    return PlaneFitter.fit_segment_with_iterations(
+        _shared_points[start:end], seed, _shared_distance_threshold, _shared_num_iterations
+    )
+
+
+class PlaneFitter:
+    __workers: int
+    __seed: int
+    __distance_threshold: float
+    __num_iterations: int
+
+    def __init__(
+            self,
+            workers: int = Config.NUM_WORKERS.value,
+            seed: int = Config.RANDOM_SEED.value,
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value,
+            num_iterations: int = Config.NUM_ITERATIONS.value
+    ) -> None:
+        """
+        Fits one RANSAC plane per segment, either serially or across a process pool
+        :param workers: No. of processes, 1 fits the segments in the current process
+        :param seed: Base seed, segment i is fitted with seed + i so results do not depend on the worker count
+        :param distance_threshold: Max distance between a point and its plane, in the units of the points
+        :param num_iterations: No. of RANSAC iterations, an upper bound for the numpy engine
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.workers = workers
+        self.seed = seed
+        self.distance_threshold = distance_threshold
+        self.num_iterations = num_iterations
+
+    @property
+    def workers(self) -> int:
+        return self.__workers
+
+    @workers.setter
+    def workers(self, workers: int) -> None:
+        if not isinstance(workers, numbers.Integral):
+            raise TypeError("Workers must be an integer")
+
+        if workers < 1:
+            raise ValueError("Workers must be at least 1")
+
+        self.__workers = int(workers)
+
+    @property
+    def seed(self) -> int:
+        return self.__seed
+
+    @seed.setter
+    def seed(self, seed: int) -> None:
+        if not isinstance(seed, numbers.Integral):
+            raise TypeError("Seed must be an integer")
+
+        self.__seed = int(seed)
+
+    @property
+    def distance_threshold(self) -> float:
+        return self.__distance_threshold
+
+    @distance_threshold.setter
+    def distance_threshold(self, distance_threshold: float) -> None:
+        if distance_threshold is None or distance_threshold <= 0:
+            raise ValueError("Distance threshold must be larger than 0")
+
+        self.__distance_threshold = distance_threshold
+
+    @property
+    def num_iterations(self) -> int:
+        return self.__num_iterations
+
+    @num_iterations.setter
+    def num_iterations(self, num_iterations: int) -> None:
+        if not isinstance(num_iterations, numbers.Integral):
+            raise TypeError("No. of iterations must be an integer")
+
+        if num_iterations < 1:
+            raise ValueError("No. of iterations must be at least 1")
+
+        self.__num_iterations = int(num_iterations)
+
+    @staticmethod
+    def fit_segment(
+            points: np.ndarray,
+            seed: int,
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value,
+            num_iterations: int = Config.NUM_ITERATIONS.value
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Fits a plane to the points with the RANSAC engine selected in Config.RANSAC_BACKEND
+        :param points: (n, 3) array of coordinates
+        :param seed: Seed for the engine's random generator
+        :param distance_threshold: Max distance between a point and the plane, in the units of the points
+        :param num_iterations: No. of RANSAC iterations
+        :return: The plane model (a, b, c, d) and the indexes of the inliers
+        """
+        plane_model, inlier_indexes, _ = PlaneFitter.fit_segment_with_iterations(
+            points, seed, distance_threshold, num_iterations
+        )
+        return plane_model, inlier_indexes
+
+    @staticmethod
+    def fit_segment_with_iterations(
+            points: np.ndarray,
+            seed: int,
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value,
+            num_iterations: int = Config.NUM_ITERATIONS.value
+    ) -> tuple[np.ndarray, np.ndarray, int]:
+        """
+        Fits a plane to the points and also returns the no. of RANSAC iterations used
+        :param points: (n, 3) array of coordinates
+        :param seed: Seed for the engine's random generator
+        :param distance_threshold: Max distance between a point and the plane, in the units of the points
+        :param num_iterations: No. of RANSAC iterations, an upper bound for the numpy engine
+        :return: The plane model (a, b, c, d), the indexes of the inliers and the no. of iterations
+        """
+        if len(points) < Config.RANSAC_N.value:
+            # Too few points to sample from, falling back to a horizontal plane through the points
+            plane_model = np.array([0, 0, 1, -points[:, 2].mean() if len(points) else 0], dtype=np.float64)
+            return plane_model, np.arange(len(points), dtype=np.int64), 0
+
+        if Config.RANSAC_BACKEND.value == "numpy":
+            ransac = NumpyRANSAC(distance_threshold=distance_threshold, max_iterations=num_iterations, seed=seed)
+            plane_model, inlier_indexes = ransac.fit(points)
+            return plane_model, inlier_indexes, ransac.iterations
+
+        point_cloud = o3d.geometry.PointCloud()
+        point_cloud.points = o3d.utility.Vector3dVector(np.ascontiguousarray(points, dtype=np.float64))
+
+        o3d.utility.random.seed(seed)
+        plane_model, inlier_indexes = point_cloud.segment_plane(
+            distance_threshold=distance_threshold,
+            ransac_n=Config.RANSAC_N.value,
+            num_iterations=num_iterations,
+        )  # Generating plane model
+
+        return (
+            np.asarray(plane_model, dtype=np.float64),
+            np.asarray(inlier_indexes, dtype=np.int64),
+            num_iterations  # Open3D always runs all iterations
+        )
+
+    def fit(
+            self,
+            points: np.ndarray,
+            offsets: np.ndarray,
+            downsampler: VoxelDownsampler = None
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Fits a plane to every segment points[offsets[i]:offsets[i + 1]]
+        :param points: (n, 3) array of coordinates, sorted by segment
+        :param offsets: Start of each segment followed by the total no. of points
+        :param downsampler: Fits the planes to the voxel downsampled segments when set. The inliers are then
+        selected from all points of each segment
+        :return: The plane model and local inlier indexes of each segment, in segment order
+        """
+        if downsampler is not None:
+            sampled_points, sampled_offsets = downsampler.downsample(points, offsets)
+            self.logger.debug("Fitting planes to %d of %d points after downsampling", len(sampled_points), len(points))
+            plane_models = [plane_model for plane_model, _ in self.fit(sampled_points, sampled_offsets)]
+            return list(zip(plane_models, self.inliers_within(points, offsets, plane_models, self.distance_threshold)))
+
+        starts = [int(start) for start in offsets[:-1]]
+        ends = [int(end) for end in offsets[1:]]
+        seeds = [self.seed + i for i in range(len(starts))]
+
+        if self.workers == 1 or len(starts) <= 1:
+            self.logger.debug("Fitting %d planes serially", len(starts))
+            results = [
+                self.fit_segment_with_iterations(points[start:end], seed, self.distance_threshold, self.num_iterations)
+                for start, end, seed in zip(starts, ends, seeds)
+            ]
+        else:
+            results = self.__fit_in_pool(points, starts, ends, seeds)
+
+        if Metrics.enabled():
+            lengths = np.maximum(np.array(ends) - np.array(starts), 1)
+            Metrics.observe("ransac_iterations", [iterations for _, _, iterations in results])
+            Metrics.observe("inlier_ratio", np.array([len(inliers) for _, inliers, _ in results]) / lengths)
+
+        return [(plane_model, inlier_indexes) for plane_model, inlier_indexes, _ in results]
+
+    @staticmethod
+    def inliers_within(
+            points: np.ndarray,
+            offsets: np.ndarray,
+            plane_models: list[np.ndarray],
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value
+    ) -> list[np.ndarray]:
+        """
+        Selects the points of each segment within the distance threshold of the segment's plane, in one pass
+        :param points: (n, 3) array of coordinates, sorted by segment
+        :param offsets: Start of each segment followed by the total no. of points
+        :param plane_models: The plane model (a, b, c, d) of each segment
+        :param distance_threshold: Max distance between a point and its plane, in the units of the points
+        :return: The local inlier indexes of each segment
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        coefficients = np.array(plane_models, dtype=np.float64).reshape(-1, 4)
+        coefficients /= np.linalg.norm(coefficients[:, :3], axis=1, keepdims=True)  # Unit normals
+
+        a, b, c, d = np.repeat(coefficients, np.diff(offsets), axis=0).T
+        points = np.asarray(points, dtype=np.float64)
+        distances = np.abs(a * points[:, 0] + b * points[:, 1] + c * points[:, 2] + d)
+
+        inlier_indexes = np.flatnonzero(distances <= distance_threshold)
+        bounds = np.searchsorted(inlier_indexes, offsets)
+        return [
+            inlier_indexes[bounds[i]:bounds[i + 1]] - offsets[i] for i in range(len(offsets) - 1)
+        ]
+
+    def __fit_in_pool(
+            self,
+            points: np.ndarray,
+            starts: list[int],
+            ends: list[int],
+            seeds: list[int]
+    ) -> list[tuple[np.ndarray, np.ndarray, int]]:
+        """
+        Fits the segment planes across a process pool, sharing the points with the workers through shared memory. The
+        points are shared in their own data type, so raw int32 coordinates take half the memory of float64
+        :param points:
+        :param starts:
+        :param ends:
+        :param seeds:
+        :return:
+        """
+        self.logger.info(f"Fitting {len(starts)} planes across {self.workers} processes")
+        points = np.ascontiguousarray(points)
+        shared_points = shared_memory.SharedMemory(create=True, size=max(points.nbytes, 1))
+
+        try:
+            np.ndarray(points.shape, dtype=points.dtype, buffer=shared_points.buf)[:] = points
+
+            with ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_attach_shared_points,
+                    initargs=(
+                        shared_points.name, points.shape, points.dtype.str, self.distance_threshold, self.num_iterations
+                    )
+            ) as executor:
+                chunk_size = max(len(starts) // (self.workers * 4), 1)
+                return list(executor.map(_fit_shared_segment, starts, ends, seeds, chunksize=chunk_size))
+        finally:
+            shared_points.close()
+            shared_points.unlink()
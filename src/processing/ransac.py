@@ -0,0 +1,188 @@
+import math
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+
+
+class NumpyRANSAC:
+    __distance_threshold: float
+    __max_iterations: int
+    __confidence: float
+    __batch_size: int
+    __seed: int
+
+    MAX_DISTANCE_ELEMENTS = 1 << 22  # Upper bound on the size of the (points x hypotheses) distance matrix
+
+    def __init__(
+            self,
+            distance_threshold: float = Config.DISTANCE_THRESHOLD.value,
+            max_iterations: int = Config.NUM_ITERATIONS.value,
+            confidence: float = Config.RANSAC_CONFIDENCE.value,
+            batch_size: int = Config.RANSAC_BATCH_SIZE.value,
+            seed: int = Config.RANDOM_SEED.value
+    ) -> None:
+        """
+        Plane fitting with RANSAC, scoring a batch of 3-point hypotheses at a time as one matrix operation. The
+        no. of iterations is adapted to the best inlier ratio seen so far, and the best plane is refitted to its
+        inliers with least squares
+        :param distance_threshold: Max distance between a point and the plane for the point to be an inlier
+        :param max_iterations: Upper bound on the no. of hypotheses
+        :param confidence: Probability of having sampled at least one outlier-free hypothesis when stopping [0, 1)
+        :param batch_size: No. of hypotheses scored at a time
+        :param seed: Seed of the random generator
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.distance_threshold = distance_threshold
+        self.max_iterations = max_iterations
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.seed = seed
+        self.__iterations = 0
+
+    @property
+    def distance_threshold(self) -> float:
+        return self.__distance_threshold
+
+    @distance_threshold.setter
+    def distance_threshold(self, distance_threshold: float) -> None:
+        if distance_threshold <= 0:
+            raise ValueError("Distance threshold must be larger than 0")
+
+        self.__distance_threshold = distance_threshold
+
+    @property
+    def max_iterations(self) -> int:
+        return self.__max_iterations
+
+    @max_iterations.setter
+    def max_iterations(self, max_iterations: int) -> None:
+        if max_iterations < 1:
+            raise ValueError("Max iterations must be at least 1")
+
+        self.__max_iterations = max_iterations
+
+    @property
+    def confidence(self) -> float:
+        return self.__confidence
+
+    @confidence.setter
+    def confidence(self, confidence: float) -> None:
+        if not 0 <= confidence < 1:
+            raise ValueError("Confidence must be in [0, 1)")
+
+        self.__confidence = confidence
+
+    @property
+    def batch_size(self) -> int:
+        return self.__batch_size
+
+    @batch_size.setter
+    def batch_size(self, batch_size: int) -> None:
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        self.__batch_size = batch_size
+
+    @property
+    def seed(self) -> int:
+        return self.__seed
+
+    @seed.setter
+    def seed(self, seed: int) -> None:
+        self.__seed = seed
+
+    @property
+    def iterations(self) -> int:
+        """
+        Returns the no. of hypotheses scored in the last fit
+        :return:
+        """
+        return self.__iterations
+
+    def fit(self, points: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Fits a plane to the points
+        :param points: (n, 3) array with at least 3 points
+        :return: The plane model (a, b, c, d) with a unit normal and the indexes of the inliers
+        """
+        point_count = len(points)
+        if point_count < 3:
+            raise ValueError("At least 3 points are needed to fit a plane")
+
+        rng = np.random.default_rng(self.seed)
+        origin = np.asarray(points[0], dtype=np.float64)
+        centered = np.asarray(points, dtype=np.float64) - origin  # Centering keeps d small for large coordinates
+
+        batch_size = max(min(self.batch_size, self.MAX_DISTANCE_ELEMENTS // point_count), 1)
+        best_normal, best_d, best_count = None, 0.0, -1
+        required_iterations = self.max_iterations
+        self.__iterations = 0
+
+        while self.__iterations < required_iterations:
+            count = min(batch_size, required_iterations - self.__iterations)
+            samples = centered[rng.integers(0, point_count, size=(count, 3))]  # (count, 3, 3)
+
+            normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+            norms = np.linalg.norm(normals, axis=1)
+            valid = norms > 0  # Collinear or repeated samples do not define a plane
+            normals[valid] /= norms[valid, None]
+            d = -np.einsum("ij,ij->i", normals, samples[:, 0])
+
+            inlier_counts = (np.abs(centered @ normals.T + d) < self.distance_threshold).sum(axis=0)
+            inlier_counts[~valid] = -1
+
+            best = int(np.argmax(inlier_counts))
+            if inlier_counts[best] > best_count:
+                best_normal, best_d, best_count = normals[best], d[best], int(inlier_counts[best])
+
+            self.__iterations += count
+            required_iterations = min(self.max_iterations, self.__required_iterations(best_count / point_count))
+
+        if best_normal is None:
+            self.logger.warning("All sampled hypotheses were degenerate")
+            return np.array([0, 0, 1, -float(origin[2])]), np.arange(point_count, dtype=np.int64)
+
+        inliers = np.abs(centered @ best_normal + best_d) < self.distance_threshold
+        normal, d = self.__refit(centered[inliers]) if inliers.sum() >= 3 else (best_normal, best_d)
+        inlier_indexes = np.flatnonzero(np.abs(centered @ normal + d) < self.distance_threshold)
+
+        self.logger.debug(
+            "Fitted plane in %d iterations with %d of %d inliers", self.__iterations, len(inlier_indexes), point_count
+        )
+        return np.append(normal, d - normal @ origin), inlier_indexes
+
+    def __required_iterations(self, inlier_ratio: float) -> int:
+        """
+        Calculates the no. of hypotheses needed to sample at least one outlier-free hypothesis with the confidence
+        :param inlier_ratio:
+        :return:
+        """
+        if inlier_ratio <= 0:
+            return self.max_iterations
+
+        outlier_probability = 1 - inlier_ratio ** 3
+        if outlier_probability <= 0:
+            return 0
+
+        if outlier_probability >= 1:
+            return self.max_iterations  # The inlier ratio is too small for the probability to differ from 1
+
+        return math.ceil(math.log(1 - self.confidence) / math.log(outlier_probability))
+
+    @staticmethod
+    def __refit(inliers: np.ndarray) -> tuple[np.ndarray, float]:
+        """
+        Fits a plane to the inliers with least squares, using the direction of least variance as the normal
+        :param inliers:
+        :return: The unit normal and d
+        """
+        centroid = inliers.mean(axis=0)
+        _, _, right_singular_vectors = np.linalg.svd(inliers - centroid, full_matrices=False)
+        normal = right_singular_vectors[-1]
+
+        if normal[2] < 0:
+            normal = -normal  # Normals point upwards, so z residuals keep the same sign across segments
+
+        return normal, -float(normal @ centroid)
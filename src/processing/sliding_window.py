@@ -0,0 +1,177 @@
+import numbers
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+from src.metrics.metrics import Metrics
+
+
+class SlidingWindowFitter:
+    __window_size: int
+    __stride: int
+
+    # Sums kept per block: n, Σx, Σy, Σz, Σxx, Σxy, Σxz, Σyy, Σyz, Σzz
+    SUMS = ("n", "x", "y", "z", "xx", "xy", "xz", "yy", "yz", "zz")
+
+    def __init__(self, window_size: int = Config.WINDOW_SIZE.value, stride: int = Config.WINDOW_STRIDE.value) -> None:
+        """
+        Fits least-squares planes to overlapping windows of points. The points are split into blocks of stride
+        points, and every block is given the plane of the window of about window_size points centred on it. The sums
+        of each block are computed once, so moving the window by one block only adds and removes the sums of one
+        block instead of refitting the whole window
+        :param window_size: No. of points in each window, rounded to a whole no. of blocks
+        :param stride: No. of points the window moves between two planes
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.stride = stride
+        self.window_size = window_size
+
+    @property
+    def window_size(self) -> int:
+        return self.__window_size
+
+    @window_size.setter
+    def window_size(self, window_size: int) -> None:
+        if not isinstance(window_size, numbers.Integral):
+            raise TypeError("Window size must be an integer")
+
+        if window_size < self.stride:
+            raise ValueError("Window size cannot be smaller than the stride")
+
+        self.__window_size = int(window_size)
+
+    @property
+    def stride(self) -> int:
+        return self.__stride
+
+    @stride.setter
+    def stride(self, stride: int) -> None:
+        if not isinstance(stride, numbers.Integral):
+            raise TypeError("Stride must be an integer")
+
+        if stride < 1:
+            raise ValueError("Stride must be at least 1")
+
+        self.__stride = int(stride)
+
+    @property
+    def blocks_per_window(self) -> int:
+        """
+        Returns the odd no. of blocks in each window, so every window is centred on a block
+        :return:
+        """
+        return 2 * (round(self.window_size / self.stride) // 2) + 1
+
+    def block_offsets(self, point_count: int) -> np.ndarray:
+        """
+        Returns the start of each block followed by the total no. of points
+        :param point_count:
+        :return:
+        """
+        return np.append(np.arange(0, point_count, self.stride, dtype=np.int64), point_count)
+
+    def fit_blocks(self, points: np.ndarray, offsets: np.ndarray) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Fits the plane of the window centred on every block, in the form PlaneFitter.fit returns
+        :param points: (n, 3) array of coordinates, ordered along the track
+        :param offsets: Block offsets returned by block_offsets
+        :return: The plane model and local inlier indexes of each block, where every point of a block is scored
+        against the plane of its window
+        """
+        plane_coefficients, _ = self.fit(points, offsets)
+        return [(plane_model, np.arange(length)) for plane_model, length in zip(plane_coefficients, np.diff(offsets))]
+
+    def fit(self, points: np.ndarray, offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Fits the plane z = αx + βy + γ of the window centred on every block
+        :param points: (n, 3) array of coordinates, ordered along the track
+        :param offsets: Block offsets returned by block_offsets
+        :return: (k, 4) plane parameters a, b, c, d of each block with a unit normal, and the residual SD of each
+        window's least-squares fit
+        """
+        offsets = np.asarray(offsets, dtype=np.int64)
+        block_count = len(offsets) - 1
+
+        if block_count == 0:
+            return np.empty((0, 4)), np.empty(0)
+
+        with Metrics.timer("window_fitting") as timer:
+            center = np.asarray(points[:, :3], dtype=np.float64).mean(axis=0)  # Keeps the sums well conditioned
+            window_sums = self.__window_sums(self.__block_sums(points, offsets, center))
+            coefficients, residual_SDs = self.__solve(window_sums, center)
+            timer.points = len(points)
+
+        Metrics.observe("window_residual_sd", residual_SDs)
+        self.logger.debug("Fitted %d windows of %d blocks", block_count, self.blocks_per_window)
+        return coefficients, residual_SDs
+
+    @staticmethod
+    def __block_sums(points: np.ndarray, offsets: np.ndarray, center: np.ndarray) -> np.ndarray:
+        """
+        Calculates the sums of every block in one grouped pass
+        :param points:
+        :param offsets:
+        :param center: Subtracted from the points before summing
+        :return: (k, 10) array with the sums in the order of SlidingWindowFitter.SUMS
+        """
+        x, y, z = (np.asarray(points, dtype=np.float64) - center).T
+        starts = offsets[:-1]
+        non_empty = np.diff(offsets) > 0
+        sums = np.zeros((len(starts), len(SlidingWindowFitter.SUMS)))
+        sums[:, 0] = np.diff(offsets)
+
+        if np.any(non_empty):
+            columns = np.column_stack((x, y, z, x * x, x * y, x * z, y * y, y * z, z * z))
+            sums[non_empty, 1:] = np.add.reduceat(columns, starts[non_empty], axis=0)
+
+        return sums
+
+    def __window_sums(self, block_sums: np.ndarray) -> np.ndarray:
+        """
+        Adds up the sums of the blocks in every window, clipping the windows at both ends
+        :param block_sums:
+        :return:
+        """
+        block_count = len(block_sums)
+        half_window = self.blocks_per_window // 2
+
+        prefix_sums = np.zeros((block_count + 1, block_sums.shape[1]))
+        np.cumsum(block_sums, axis=0, out=prefix_sums[1:])
+
+        blocks = np.arange(block_count)
+        first_blocks = np.clip(blocks - half_window, 0, block_count)
+        last_blocks = np.clip(blocks + half_window + 1, 0, block_count)
+        return prefix_sums[last_blocks] - prefix_sums[first_blocks]
+
+    @staticmethod
+    def __solve(sums: np.ndarray, center: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Solves the normal equations of every window in closed form
+        :param sums: (k, 10) sums of each window
+        :param center: Offset subtracted from the points before summing
+        :return: The plane parameters and residual SD of each window
+        """
+        n, x, y, z, xx, xy, xz, yy, yz, zz = sums.T
+        count = np.maximum(n, 1)
+        mean_x, mean_y, mean_z = x / count, y / count, z / count
+
+        # Sums of the products of the deviations from the window means
+        cxx, cxy, cxz = xx - x * mean_x, xy - x * mean_y, xz - x * mean_z
+        cyy, cyz, czz = yy - y * mean_y, yz - y * mean_z, zz - z * mean_z
+
+        determinant = cxx * cyy - cxy * cxy
+        solvable = (n >= 3) & (determinant > 1e-12 * np.maximum(cxx * cyy, 1e-300))
+        safe_determinant = np.where(solvable, determinant, 1)
+        alpha = np.where(solvable, (cxz * cyy - cyz * cxy) / safe_determinant, 0)  # Horizontal plane if degenerate
+        beta = np.where(solvable, (cyz * cxx - cxz * cxy) / safe_determinant, 0)
+
+        squared_residuals = np.maximum(czz - alpha * cxz - beta * cyz, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            residual_SDs = np.where(n > 3, np.sqrt(squared_residuals / (n - 3)), np.nan)
+
+        # z = αx + βy + γ in the original coordinates, written as ax + by + cz + d = 0 with a unit normal
+        gamma = center[2] + mean_z - alpha * (center[0] + mean_x) - beta * (center[1] + mean_y)
+        norm = np.sqrt(alpha ** 2 + beta ** 2 + 1)
+        coefficients = np.column_stack((-alpha, -beta, np.ones_like(alpha), -gamma)) / norm[:, None]
+        return coefficients, residual_SDs
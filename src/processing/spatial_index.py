@@ -0,0 +1,220 @@
+import math
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+
+
+class SpatialIndex:
+    __points: np.ndarray
+    __cell_size: float
+    __labels: np.ndarray
+    __origin: np.ndarray  # Lower XY corner of the grid
+    __point_cells: np.ndarray  # (column, row) of the cell of each point
+    __column_count: int
+    __row_count: int
+    __order: np.ndarray  # Point indexes sorted by cell
+    __cell_keys: np.ndarray  # Sorted keys of the non-empty cells
+    __cell_starts: np.ndarray  # Start and end of each non-empty cell in order
+    __cell_ends: np.ndarray
+    __label_order: np.ndarray  # Point indexes sorted by label
+    __label_offsets: np.ndarray  # Start of each label in label_order, followed by the no. of points
+
+    def __init__(
+            self,
+            points: np.ndarray,
+            cell_size: float = Config.SPATIAL_CELL_SIZE.value,
+            labels: np.ndarray = None
+    ) -> None:
+        """
+        Uniform XY grid over a point cloud. The point indexes are sorted by grid cell once, and the points of a cell
+        are found with a binary search over the sorted cell keys, so queries only touch the cells they overlap
+        :param points: (n, 3) array of coordinates
+        :param cell_size: Side length of a grid cell, in point cloud units
+        :param labels: Segment of each point, required by adjacent
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.cell_size = cell_size
+        self.__points = points
+        self.__labels = None if labels is None else np.asarray(labels, dtype=np.int64)
+
+        if self.__labels is not None and len(self.__labels) != len(points):
+            raise ValueError("There must be one label per point")
+
+        self.__build()
+
+    @property
+    def points(self) -> np.ndarray:
+        return self.__points
+
+    @property
+    def cell_size(self) -> float:
+        return self.__cell_size
+
+    @cell_size.setter
+    def cell_size(self, cell_size: float) -> None:
+        if cell_size is None or cell_size <= 0:
+            raise ValueError("Cell size must be larger than 0")
+
+        self.__cell_size = cell_size
+
+    @property
+    def labels(self) -> np.ndarray:
+        return self.__labels
+
+    def box(self, minimum: np.ndarray, maximum: np.ndarray) -> np.ndarray:
+        """
+        Finds the points inside an axis-aligned box
+        :param minimum: Lower corner (x, y) or (x, y, z)
+        :param maximum: Upper corner (x, y) or (x, y, z)
+        :return: Indexes of the points inside the box, in ascending order
+        """
+        minimum = np.asarray(minimum, dtype=np.float64)
+        maximum = np.asarray(maximum, dtype=np.float64)
+        dimensions = len(minimum)
+
+        candidates = self.__candidates(minimum[:2], maximum[:2])
+        coordinates = self.__points[candidates, :dimensions]
+        inside = np.all((coordinates >= minimum) & (coordinates <= maximum), axis=1)
+        return np.sort(candidates[inside])
+
+    def radius(self, center: np.ndarray, radius: float) -> np.ndarray:
+        """
+        Finds the points within a 3D distance of a center point
+        :param center:
+        :param radius:
+        :return: Indexes of the points within the radius, in ascending order
+        """
+        center = np.asarray(center, dtype=np.float64)
+        candidates = self.__candidates(center[:2] - radius, center[:2] + radius)
+        distances = np.linalg.norm(self.__points[candidates] - center, axis=1)
+        return np.sort(candidates[distances <= radius])
+
+    def nearest(self, point: np.ndarray, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest neighbours of a point by searching rings of cells outwards until no closer point can be
+        outside the searched cells
+        :param point:
+        :param k:
+        :return: Indexes of the neighbours and their distances, sorted by distance
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+        point = np.asarray(point, dtype=np.float64)
+        k = min(k, len(self.__points))
+        ring = 0
+
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        while True:
+            reach = ring * self.cell_size  # Every point closer than this in XY lies in the searched cells
+            candidates = self.__candidates(point[:2] - reach, point[:2] + reach)
+            covers_all = len(candidates) == len(self.__points)
+
+            if len(candidates) >= k:
+                distances = np.linalg.norm(self.__points[candidates] - point, axis=1)
+                nearest = np.argpartition(distances, k - 1)[:k]
+                kth_distance = distances[nearest].max()
+
+                if kth_distance <= reach or covers_all:
+                    nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+                    return candidates[nearest], distances[nearest]
+
+                ring = max(ring + 1, math.ceil(kth_distance / self.cell_size))  # Enough cells to hold the k nearest
+            else:
+                ring = max(2 * ring, 1)  # Too few points, doubling the searched area
+
+    def adjacent(self, label: int) -> np.ndarray:
+        """
+        Finds the segments with points in the cells touching the cells of a segment
+        :param label: Segment to find the neighbours of
+        :return: Labels of the adjacent segments, in ascending order
+        """
+        if self.__labels is None:
+            raise TypeError("Labels must be set to find adjacent segments")
+
+        if not 0 <= label < len(self.__label_offsets) - 1:
+            return np.empty(0, dtype=np.int64)
+
+        segment_points = self.__label_order[self.__label_offsets[label]:self.__label_offsets[label + 1]]
+        segment_cells = np.unique(self.__point_cells[segment_points], axis=0)
+        neighbourhood = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+        cells = np.unique((segment_cells[:, None, :] + neighbourhood).reshape(-1, 2), axis=0)
+
+        neighbours = np.unique(self.__labels[self.__cell_points(cells)])
+        return neighbours[neighbours != label]
+
+    def __build(self) -> None:
+        """
+        Sorts the point indexes by grid cell
+        :return:
+        """
+        xy = np.asarray(self.__points[:, :2], dtype=np.float64)
+        self.__origin = xy.min(axis=0) if len(xy) else np.zeros(2)
+        self.__point_cells = np.floor((xy - self.__origin) / self.cell_size).astype(np.int64)
+        self.__column_count = int(self.__point_cells[:, 0].max()) + 1 if len(xy) else 1
+        self.__row_count = int(self.__point_cells[:, 1].max()) + 1 if len(xy) else 1
+
+        keys = self.__point_cells[:, 1] * self.__column_count + self.__point_cells[:, 0]
+        self.__order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[self.__order]
+        self.__cell_keys, self.__cell_starts = np.unique(sorted_keys, return_index=True)
+        self.__cell_ends = np.append(self.__cell_starts[1:], len(sorted_keys))
+
+        if self.__labels is not None:
+            self.__label_order = np.argsort(self.__labels, kind="stable")
+            label_count = int(self.__labels.max()) + 1 if len(self.__labels) else 0
+            self.__label_offsets = np.searchsorted(self.__labels[self.__label_order], np.arange(label_count + 1))
+
+        self.logger.debug("Indexed %d points in %d grid cells", len(xy), len(self.__cell_keys))
+
+    def __candidates(self, minimum: np.ndarray, maximum: np.ndarray) -> np.ndarray:
+        """
+        Returns the indexes of the points in all cells overlapping an XY rectangle
+        :param minimum:
+        :param maximum:
+        :return:
+        """
+        lower = np.floor((minimum - self.__origin) / self.cell_size).astype(np.int64)
+        upper = np.floor((maximum - self.__origin) / self.cell_size).astype(np.int64)
+        lower = np.maximum(lower, 0)
+        upper = np.minimum(upper, [self.__column_count - 1, self.__row_count - 1])
+
+        if np.any(lower > upper):
+            return np.empty(0, dtype=np.int64)
+
+        columns, rows = np.meshgrid(np.arange(lower[0], upper[0] + 1), np.arange(lower[1], upper[1] + 1))
+        return self.__cell_points(np.column_stack((columns.ravel(), rows.ravel())))
+
+    def __cell_points(self, cells: np.ndarray) -> np.ndarray:
+        """
+        Returns the indexes of the points in the given (column, row) cells
+        :param cells:
+        :return:
+        """
+        inside = (
+            (cells[:, 0] >= 0) & (cells[:, 0] < self.__column_count)
+            & (cells[:, 1] >= 0) & (cells[:, 1] < self.__row_count)
+        )
+        keys = cells[inside, 1] * self.__column_count + cells[inside, 0]
+
+        positions = np.searchsorted(self.__cell_keys, keys)
+        found = positions < len(self.__cell_keys)
+        found[found] = self.__cell_keys[positions[found]] == keys[found]  # Skipping empty cells
+        starts = self.__cell_starts[positions[found]]
+        lengths = self.__cell_ends[positions[found]] - starts
+
+        # Concatenating the ranges starts[i]:starts[i] + lengths[i] of the sorted point indexes
+        ranges = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return self.__order[ranges]
+
+    def __len__(self) -> int:
+        return len(self.__points)
+
+    def __repr__(self) -> str:
+        return f"no. of points: {len(self.__points)}; " \
+               f"cell size: {self.cell_size}; " \
+               f"no. of cells: {len(self.__cell_keys)};"
@@ -0,0 +1,198 @@
+import math
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+from config import Config
+from src.logger.logger import Logger
+from src.model.coordinate_frame import CoordinateFrame
+from src.processing.sliding_window import SlidingWindowFitter
+
+
+@dataclass
+class Tiling:
+    order: np.ndarray  # Permutation that sorts the points by tile
+    offsets: np.ndarray  # Start of each tile in the sorted points, followed by the total no. of points
+    tile_ids: np.ndarray  # Id of each non-empty tile
+
+    def __len__(self) -> int:
+        return len(self.tile_ids)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """
+        Yields the start and end of each tile in the sorted points
+        :return:
+        """
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            yield int(start), int(end)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+
+class Tiler:
+    __mode: str
+    __tile_size: float
+    __rows_per_split: int
+
+    MODES = ("index", "grid", "along_track")
+
+    def __init__(
+            self,
+            mode: str = Config.SEGMENTATION_MODE.value,
+            tile_size: float = Config.TILE_SIZE.value,
+            rows_per_split: int = None
+    ) -> None:
+        """
+        Assigns every point of a point cloud to a tile in one vectorized pass
+        :param mode: Either 'index' (contiguous rows), 'grid' (fixed XY grid) or 'along_track' (fixed-length bins
+        along the principal driving direction)
+        :param tile_size: Side length of a grid tile or length of an along-track bin
+        :param rows_per_split: No. of rows per tile, only used in 'index' mode
+        """
+        self.logger = Logger.get_logger(__name__)
+        self.mode = mode
+        self.tile_size = tile_size
+        self.rows_per_split = rows_per_split
+
+    @classmethod
+    def segment(
+            cls,
+            points: np.ndarray,
+            frame: CoordinateFrame,
+            split_scale_factor: float = Config.SPLIT_SCALE_FACTOR.value
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Splits a point cloud into the segments of the pipeline, with Config.SEGMENTATION_MODE and Config.TILE_SIZE.
+        With sliding window plane fitting the sorted points are split into blocks of Config.WINDOW_STRIDE points
+        :param points: (n, 3) array of coordinates
+        :param frame: Used to convert Config.TILE_SIZE to the units of the points
+        :param split_scale_factor: Sets the no. of rows per segment in 'index' mode
+        :return: The segment offsets of the sorted points, and the order that sorts the points, None in 'index' mode
+        where the points are already sorted
+        """
+        tiler = cls(
+            tile_size=frame.distance(Config.TILE_SIZE.value, axis=0),
+            rows_per_split=cls.rows_per_split_of(len(points), split_scale_factor)
+        )
+        tiling = tiler.tile(points)
+        offsets = tiling.offsets
+        order = None if tiler.mode == "index" else tiling.order
+
+        if Config.PLANE_FITTING.value == "sliding_window":
+            # Blocks of stride points along the sorted points, each flagged with the plane of its window
+            offsets = SlidingWindowFitter().block_offsets(len(points))
+
+        return offsets, order
+
+    @staticmethod
+    def rows_per_split_of(point_count: int, split_scale_factor: float = Config.SPLIT_SCALE_FACTOR.value) -> int:
+        """
+        Calculates the no. of rows in each segment of a point cloud with point_count points in 'index' mode
+        :param point_count:
+        :param split_scale_factor:
+        :return:
+        """
+        return max(math.floor(split_scale_factor * 3 * point_count), 1)  # TODO: Setup a new formula for this
+
+    @property
+    def mode(self) -> str:
+        return self.__mode
+
+    @mode.setter
+    def mode(self, mode: str) -> None:
+        if mode not in Tiler.MODES:
+            raise ValueError(f"Mode must be one of {', '.join(Tiler.MODES)}")
+
+        self.__mode = mode
+
+    @property
+    def tile_size(self) -> float:
+        return self.__tile_size
+
+    @tile_size.setter
+    def tile_size(self, tile_size: float) -> None:
+        if tile_size is None or tile_size <= 0:
+            raise ValueError("Tile size must be larger than 0")
+
+        self.__tile_size = tile_size
+
+    @property
+    def rows_per_split(self) -> int:
+        return self.__rows_per_split
+
+    @rows_per_split.setter
+    def rows_per_split(self, rows_per_split: int) -> None:
+        if rows_per_split is not None and rows_per_split <= 0:
+            raise ValueError("Rows per split must be larger than 0")
+
+        self.__rows_per_split = rows_per_split
+
+    def tile(self, points: np.ndarray) -> Tiling:
+        """
+        Tiles the points and returns the sorting permutation together with the offsets of each tile
+        :param points: (n, 3) array of coordinates
+        :return:
+        """
+        point_count = len(points)
+
+        if point_count == 0:
+            return Tiling(
+                order=np.empty(0, dtype=np.int64),
+                offsets=np.zeros(1, dtype=np.int64),
+                tile_ids=np.empty(0, dtype=np.int64)
+            )
+
+        match self.mode:
+            case "index":
+                if self.rows_per_split is None:
+                    raise ValueError("Rows per split must be set in 'index' mode")
+
+                starts = np.arange(0, point_count, self.rows_per_split, dtype=np.int64)
+                return Tiling(
+                    order=np.arange(point_count, dtype=np.int64),
+                    offsets=np.append(starts, point_count),
+                    tile_ids=np.arange(len(starts), dtype=np.int64)
+                )
+            case "grid":
+                keys = self.__grid_keys(points)
+            case "along_track":
+                keys = self.__along_track_keys(points)
+
+        order = np.argsort(keys, kind="stable")  # Stable sort keeps the original point order inside a tile
+        sorted_keys = keys[order]
+
+        is_start = np.empty(point_count, dtype=bool)
+        is_start[0] = True
+        np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+        starts = np.flatnonzero(is_start)
+
+        self.logger.debug("Assigned %d points to %d tiles", point_count, len(starts))
+        return Tiling(order=order, offsets=np.append(starts, point_count), tile_ids=sorted_keys[starts])
+
+    def __grid_keys(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the row-major id of the XY grid cell of every point
+        :param points:
+        :return:
+        """
+        xy_min = points[:, :2].min(axis=0)
+        cells = np.floor((points[:, :2] - xy_min) / self.tile_size).astype(np.int64)
+        column_count = cells[:, 0].max() + 1
+        return cells[:, 1] * column_count + cells[:, 0]
+
+    def __along_track_keys(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculates the bin id of every point along the principal driving direction
+        :param points:
+        :return:
+        """
+        xy = points[:, :2] - points[:, :2].mean(axis=0)
+        covariance = xy.T @ xy
+        _, eigenvectors = np.linalg.eigh(covariance)
+        direction = eigenvectors[:, -1]  # Eigenvector with the largest eigenvalue
+
+        distance = xy @ direction  # Distance along the driving direction
+        return np.floor((distance - distance.min()) / self.tile_size).astype(np.int64)
@@ -1,22 +1,20 @@
 import numpy as np
 from config import Config
 from src.file_handling.las import LAS
-from itertools import pairwise
+from src.metrics.metrics import Metrics
+from src.processing.detection import EventDetector
 
 def main() -> None:
-    las = LAS(file_path=Config.SPEEDBUMP_DATA_PATH.value)
-    las.flag_LAS()
-    segmented_LAS = las.segmented_LAS
-    flagged_LAS = []
-
-    for i, j in pairwise(segmented_LAS):
-        if i.flagged and j.flagged:
-            flagged_LAS.append(i)
-            flagged_LAS.append(j)
+    las = LAS(file_path=Config.SPEEDBUMP_DATA_PATH.value)  # Segments are flagged when the object is created
+    events = EventDetector().detect(las.segment_table)  # Runs of consecutive flagged segments
 
     pc = las.point_cloud
-    merged_pc = las.merge_segmented_pc(*flagged_LAS)
-    mean = np.mean([l.SD(l.point_cloud) for l in segmented_LAS])
+    merged_pc = las.merge_segmented_pc(segments=events.mask(len(las.segment_table)))
+    mean = np.nanmean(las.segment_table.SDs)
+
+    if Metrics.enabled():
+        Metrics.export(Config.METRICS_PATH.value)
+
     # las.display(pc)
     las.display(merged_pc)
 
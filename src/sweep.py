@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import Config
+from src.file_handling.las_reader import LASChunkReader
+from src.lazy_module import LazyModule
+from src.logger.logger import Logger
+from src.model.coordinate_frame import CoordinateFrame
+from src.model.segment_table import SegmentTable
+from src.processing.detection import EventDetector
+from src.processing.downsampling import VoxelDownsampler
+from src.processing.plane_fitting import PlaneFitter
+from src.processing.sliding_window import SlidingWindowFitter
+from src.processing.tiling import Tiler
+
+pd = LazyModule("pandas")  # Only imported to build the results table
+logger = Logger.get_logger(__name__)
+
+# Config fields that can be swept. SD_THRESHOLD values are the lower bound used to flag the segments
+PARAMETERS = ("SPLIT_SCALE_FACTOR", "DISTANCE_THRESHOLD", "NUM_ITERATIONS", "SD_THRESHOLD")
+# Parameters without effect when the planes are fitted to sliding windows of WINDOW_STRIDE blocks
+SLIDING_WINDOW_UNUSED = ("SPLIT_SCALE_FACTOR", "DISTANCE_THRESHOLD", "NUM_ITERATIONS")
+
+_points: np.ndarray = None  # Decoded points attached from shared memory in each worker process
+_memory: shared_memory.SharedMemory = None  # Kept alive for as long as the worker uses the points
+
+
+def _attach_points(name: str, shape: tuple[int, int], dtype: str) -> None:
+    """
+    Attaches a worker process to the shared point buffer
+    :param name: Name of the shared memory block
+    :param shape:
+    :param dtype:
+    :return:
+    """
+    global _points, _memory
+    _memory = shared_memory.SharedMemory(name=name)
+    _points = np.ndarray(shape, dtype=dtype, buffer=_memory.buf)
+
+
+def default_grid() -> dict[str, list]:
+    """
+    Returns a grid holding only the current Config value of every parameter
+    :return:
+    """
+    return {
+        "SPLIT_SCALE_FACTOR": [Config.SPLIT_SCALE_FACTOR.value],
+        "DISTANCE_THRESHOLD": [Config.DISTANCE_THRESHOLD.value],
+        "NUM_ITERATIONS": [Config.NUM_ITERATIONS.value],
+        "SD_THRESHOLD": [Config.SD_THRESHOLD.value[0]],
+    }
+
+
+def segment(points: np.ndarray, split_scale_factor: float, frame: CoordinateFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Segments the points like LAS does, with the given split scale factor
+    :param points:
+    :param split_scale_factor:
+    :param frame: Used to convert Config.TILE_SIZE to the units of the points
+    :return: The segment offsets and the order of the sorted points, None in index mode
+    """
+    return Tiler.segment(points, frame, split_scale_factor)
+
+
+def evaluate(
+        offsets: np.ndarray,
+        order: np.ndarray,
+        distance_threshold: float,
+        num_iterations: int,
+        sd_thresholds: list[float],
+        downsampler: VoxelDownsampler = None
+) -> list[dict]:
+    """
+    Fits the planes of one segmentation once, then flags and detects events for every SD threshold. Runs in a
+    worker process on the shared points
+    :param offsets: Segment offsets of the sorted points
+    :param order: Order of the sorted points, None if the points are already sorted
+    :param distance_threshold: In the units of the points
+    :param num_iterations:
+    :param sd_thresholds: Lower SD thresholds to flag the segments with, in the units of the points
+    :param downsampler: Fits the planes to the voxel downsampled segments when set
+    :return: One row per SD threshold
+    """
+    points = _points if order is None else _points[order]
+
+    start = time.perf_counter()
+    if Config.PLANE_FITTING.value == "sliding_window":
+        fits = SlidingWindowFitter().fit_blocks(points, offsets)
+    else:
+        fits = PlaneFitter(workers=1, distance_threshold=distance_threshold, num_iterations=num_iterations).fit(
+            points, offsets, downsampler
+        )
+    segment_table = SegmentTable.from_fits(points, offsets, fits, order=order)
+    fitting_seconds = time.perf_counter() - start
+
+    rows = []
+    for sd_threshold in sd_thresholds:
+        start = time.perf_counter()
+        flags = segment_table.flag(sd_threshold)
+        events = EventDetector().detect(segment_table)
+
+        rows.append({
+            "SD_THRESHOLD": sd_threshold,
+            "segments": len(segment_table),
+            "flagged_segments": int(flags.sum()),
+            "events": len(events),
+            "event_segments": int(events.lengths.sum()),
+            "fitting_seconds": fitting_seconds if not rows else 0.0,  # The planes are fitted once per group
+            "flagging_seconds": time.perf_counter() - start,
+        })
+
+    return rows
+
+
+def run(file_path: str, grid: dict[str, list] = None, workers: int = Config.BATCH_WORKERS.value) -> pd.DataFrame:
+    """
+    Evaluates every combination of the parameter grid. The file is decoded once into shared memory, every split
+    scale factor is segmented once, and the planes of every segmentation, distance threshold and no. of iterations
+    are fitted once and flagged with all SD thresholds
+    :param file_path: Path to the LAS file
+    :param grid: Values of each parameter in PARAMETERS, missing parameters keep their Config value. Distances are in
+    Config.DISTANCE_UNITS
+    :param workers: No. of plane fitting groups evaluated at the same time
+    :return: One row per configuration with its detections and timings
+    """
+    grid = {**default_grid(), **(grid or {})}
+    unknown = set(grid) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Parameters must be among {', '.join(PARAMETERS)}, got {', '.join(sorted(unknown))}")
+
+    if Config.PLANE_FITTING.value == "sliding_window":
+        unused = [name for name in SLIDING_WINDOW_UNUSED if len(grid[name]) > 1]
+        if unused:
+            raise ValueError(f"Sliding window plane fitting does not use {', '.join(unused)}, so it cannot be swept")
+
+    start = time.perf_counter()
+    reader = LASChunkReader(file_path)
+    points, frame = reader.read(), reader.frame
+    downsampler = None
+
+    if Config.VOXEL_PLACEMENT.value != "none":
+        downsampler = VoxelDownsampler(voxel_size=frame.distance(Config.VOXEL_SIZE.value, axis=0))
+
+        if Config.VOXEL_PLACEMENT.value == "global":
+            points, _ = downsampler.downsample(points)
+            downsampler = None
+
+    open_seconds = time.perf_counter() - start
+    logger.info(f"Decoded {len(points)} points in {open_seconds:.3f}s")
+
+    segmentations = {}
+    for split_scale_factor in grid["SPLIT_SCALE_FACTOR"]:
+        start = time.perf_counter()
+        segmentations[split_scale_factor] = (*segment(points, split_scale_factor, frame), time.perf_counter() - start)
+
+    groups = list(itertools.product(grid["SPLIT_SCALE_FACTOR"], grid["DISTANCE_THRESHOLD"], grid["NUM_ITERATIONS"]))
+    logger.info(
+        f"Sweeping {len(groups) * len(grid['SD_THRESHOLD'])} configurations in {len(groups)} plane fitting groups"
+    )
+
+    points = np.ascontiguousarray(points)
+    memory = shared_memory.SharedMemory(create=True, size=max(points.nbytes, 1))
+    rows = []
+
+    try:
+        np.ndarray(points.shape, dtype=points.dtype, buffer=memory.buf)[:] = points
+
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_attach_points,
+                initargs=(memory.name, points.shape, points.dtype.str)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    evaluate,
+                    segmentations[split_scale_factor][0],
+                    segmentations[split_scale_factor][1],
+                    frame.distance(distance_threshold),
+                    num_iterations,
+                    [frame.distance(sd_threshold) for sd_threshold in grid["SD_THRESHOLD"]],
+                    downsampler
+                ) for split_scale_factor, distance_threshold, num_iterations in groups
+            ]
+
+            for (split_scale_factor, distance_threshold, num_iterations), future in zip(groups, futures):
+                for i, row in enumerate(future.result()):
+                    rows.append({
+                        "SPLIT_SCALE_FACTOR": split_scale_factor,
+                        "DISTANCE_THRESHOLD": distance_threshold,
+                        "NUM_ITERATIONS": num_iterations,
+                        **row,
+                        "SD_THRESHOLD": grid["SD_THRESHOLD"][i],  # In Config.DISTANCE_UNITS, not in raw units
+                        "open_seconds": open_seconds,
+                        "segmentation_seconds": segmentations[split_scale_factor][2],
+                        "reused_planes": i > 0,
+                    })
+    finally:
+        memory.close()
+        memory.unlink()
+
+    return pd.DataFrame(rows)
+
+
+def main(argv: list[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Evaluates a grid of pipeline parameters on one LAS file")
+    parser.add_argument("file", help="LAS file to evaluate")
+    parser.add_argument("--split-scale-factor", type=float, nargs="+", default=[Config.SPLIT_SCALE_FACTOR.value])
+    parser.add_argument("--distance-threshold", type=float, nargs="+", default=[Config.DISTANCE_THRESHOLD.value])
+    parser.add_argument("--num-iterations", type=int, nargs="+", default=[Config.NUM_ITERATIONS.value])
+    parser.add_argument("--sd-threshold", type=float, nargs="+", default=[Config.SD_THRESHOLD.value[0]])
+    parser.add_argument("--workers", type=int, default=Config.BATCH_WORKERS.value, help="No. of parallel groups")
+    parser.add_argument("--output", default="sweep_results.csv", help="Path of the CSV table")
+    args = parser.parse_args(argv)
+
+    results = run(args.file, {
+        "SPLIT_SCALE_FACTOR": args.split_scale_factor,
+        "DISTANCE_THRESHOLD": args.distance_threshold,
+        "NUM_ITERATIONS": args.num_iterations,
+        "SD_THRESHOLD": args.sd_threshold,
+    }, workers=args.workers)
+
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
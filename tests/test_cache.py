@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from src.file_handling.cache import PipelineCache
+
+
+def test_store_and_load(tmp_path) -> None:
+    cache = PipelineCache(str(tmp_path), max_bytes=1 << 20)
+    key = cache.stage_key("planes", "0" * 64)
+
+    assert cache.load("planes", key) is None
+
+    cache.store("planes", key, {"offsets": np.arange(5), "points": np.ones((4, 3))})
+    arrays = cache.load("planes", key)
+
+    np.testing.assert_array_equal(arrays["offsets"], np.arange(5))
+    np.testing.assert_array_equal(arrays["points"], np.ones((4, 3)))
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_keys_depend_on_the_stage_and_file(tmp_path) -> None:
+    cache = PipelineCache(str(tmp_path))
+
+    assert cache.stage_key("planes", "a" * 64) == cache.stage_key("planes", "a" * 64)
+    assert cache.stage_key("planes", "a" * 64) != cache.stage_key("segments", "a" * 64)
+    assert cache.stage_key("planes", "a" * 64) != cache.stage_key("planes", "b" * 64)
+
+    with pytest.raises(ValueError):
+        cache.stage_key("flags", "a" * 64)
+
+
+def test_file_hash(tmp_path) -> None:
+    cache = PipelineCache(str(tmp_path / "cache"))
+    file_path = tmp_path / "tile.las"
+    file_path.write_bytes(b"points")
+
+    file_hash = cache.file_hash(str(file_path))
+    assert file_hash == hashlib.sha256(b"points").hexdigest()
+    assert cache.file_hash(str(file_path)) == file_hash
+
+    file_path.write_bytes(b"other points")  # A new size invalidates the remembered hash
+    assert cache.file_hash(str(file_path)) == hashlib.sha256(b"other points").hexdigest()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path) -> None:
+    cache = PipelineCache(str(tmp_path), max_bytes=3_000)
+    array = {"values": np.zeros(128)}  # 1152 bytes with the .npy header
+
+    cache.store("points", "first", array)
+    cache.store("points", "second", array)
+    os.utime(tmp_path / "points-first", (0, 0))  # Older than the second entry
+    cache.store("points", "third", array)
+
+    assert cache.load("points", "first") is None
+    assert cache.load("points", "second") is not None
+    assert cache.load("points", "third") is not None
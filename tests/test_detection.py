@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from src.model.coordinate_frame import CoordinateFrame
+from src.model.segment_table import SegmentTable
+from src.processing.detection import EventDetector
+
+
+def test_runs_within_length_limits() -> None:
+    flags = np.array([1, 0, 1, 1, 0, 1, 1, 1, 1, 0, 1, 1, 1], dtype=bool)
+
+    starts, ends = EventDetector(min_run_length=2, max_run_length=3).runs(flags)
+
+    np.testing.assert_array_equal(starts, [2, 10])
+    np.testing.assert_array_equal(ends, [4, 13])  # A run ending at the last segment is kept
+
+
+def test_detect_measures_events() -> None:
+    points = np.array([[i, 10 * i, 100 + i] for i in range(10)], dtype=np.float64)
+    offsets = np.array([0, 2, 4, 6, 8, 10])
+    planes = np.tile([0, 0, 1, 0], (5, 1))
+    residual_SDs = np.array([1, 4, 3, 1, 5])
+    table = SegmentTable(
+        points, offsets, planes, np.arange(10), offsets, residual_SDs=residual_SDs, means=np.zeros(5), VARs=np.zeros(5)
+    )
+    table.flag(2)
+
+    events = EventDetector(min_run_length=1).detect(table)
+
+    np.testing.assert_array_equal(events.starts, [1, 4])
+    np.testing.assert_array_equal(events.ends, [3, 5])
+    np.testing.assert_array_equal(events.minimums, [[2, 20, 102], [8, 80, 108]])
+    np.testing.assert_array_equal(events.maximums, [[5, 50, 105], [9, 90, 109]])
+    np.testing.assert_array_equal(events.peak_residual_SDs, [4, 5])
+    np.testing.assert_array_equal(events.mask(5), [False, True, True, False, True])
+
+    records = events.to_records(CoordinateFrame(scale=(0.01, 0.01, 0.01), offset=(0, 0, 10)))
+    assert records[0]["min"] == pytest.approx([0.02, 0.2, 11.02])
+    assert records[0]["peak_residual_SD"] == pytest.approx(0.04)
+
+
+def test_invalid_run_lengths() -> None:
+    with pytest.raises(TypeError):
+        EventDetector(min_run_length=1.5)
+
+    with pytest.raises(ValueError):
+        EventDetector(min_run_length=3, max_run_length=2)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.processing.downsampling import VoxelDownsampler
+
+POINTS = np.array([[0.1, 0.1, 0.1], [0.3, 0.5, 0.1], [1.5, 0.2, 0.2], [0.2, 0.2, 0.9], [1.1, 0.9, 0.4]])
+
+
+def test_centroid_mode() -> None:
+    downsampler = VoxelDownsampler(voxel_size=1, mode="centroid")
+
+    sampled_points, offsets = downsampler.downsample(POINTS)
+
+    np.testing.assert_allclose(sampled_points, [[0.2, 0.8 / 3, 1.1 / 3], [1.3, 0.55, 0.3]])
+    np.testing.assert_array_equal(offsets, [0, 2])
+    assert downsampler.reduction == pytest.approx(0.6)
+
+
+def test_first_mode_keeps_the_original_order() -> None:
+    sampled_points, _ = VoxelDownsampler(voxel_size=1, mode="first").downsample(POINTS)
+
+    np.testing.assert_array_equal(sampled_points, POINTS[[0, 2]])
+
+
+def test_random_mode_is_seeded() -> None:
+    sampled_points, _ = VoxelDownsampler(voxel_size=1, mode="random", seed=3).downsample(POINTS)
+    repeated_points, _ = VoxelDownsampler(voxel_size=1, mode="random", seed=3).downsample(POINTS)
+
+    np.testing.assert_array_equal(sampled_points, repeated_points)
+    assert len(sampled_points) == 2
+    assert all(any(np.array_equal(point, original) for original in POINTS) for point in sampled_points)
+
+
+def test_voxels_never_span_two_segments() -> None:
+    sampled_points, offsets = VoxelDownsampler(voxel_size=1, mode="first").downsample(POINTS, np.array([0, 1, 5]))
+
+    np.testing.assert_array_equal(sampled_points, POINTS[[0, 1, 2]])
+    np.testing.assert_array_equal(offsets, [0, 1, 3])
+
+
+def test_empty_points() -> None:
+    sampled_points, offsets = VoxelDownsampler(voxel_size=1).downsample(np.empty((0, 3)), np.array([0, 0, 0]))
+
+    assert sampled_points.shape == (0, 3)
+    np.testing.assert_array_equal(offsets, [0, 0, 0])
+
+
+def test_invalid_settings() -> None:
+    with pytest.raises(ValueError):
+        VoxelDownsampler(voxel_size=0)
+
+    with pytest.raises(ValueError):
+        VoxelDownsampler(mode="median")
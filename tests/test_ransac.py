@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.processing.ransac import NumpyRANSAC
+
+
+def test_iterations_without_inliers() -> None:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1e9, 1e9, size=(800_000, 3))
+    ransac = NumpyRANSAC(distance_threshold=1e-3, max_iterations=25, seed=0)
+
+    ransac.fit(points)
+
+    # (3 / 800k) ** 3 is lost when subtracted from 1, so no early stop is possible and every iteration is used
+    assert ransac.iterations == 25
+
+
+def test_fit_stops_early_on_a_plane() -> None:
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(-100, 100, size=(1_000, 2))
+    points = np.column_stack((xy, 0.5 * xy[:, 0] - 0.25 * xy[:, 1] + 3))
+    ransac = NumpyRANSAC(distance_threshold=1e-3, max_iterations=150, batch_size=8, seed=0)
+
+    plane_model, inlier_indexes = ransac.fit(points)
+
+    assert ransac.iterations == 8  # Every point is an inlier, so the first batch reaches the confidence
+    assert len(inlier_indexes) == len(points)
+    np.testing.assert_allclose(plane_model, np.array([-0.5, 0.25, 1, -3]) / np.sqrt(1.3125), atol=1e-9)
+
+
+def test_fit_with_effectively_no_inliers() -> None:
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1e9, 1e9, size=(800_000, 3))  # Only the 3 sampled points lie within the threshold
+
+    plane_model, inlier_indexes = NumpyRANSAC(distance_threshold=1e-3, max_iterations=3, seed=0).fit(points)
+
+    assert plane_model.shape == (4,)
+    assert len(inlier_indexes) < 10
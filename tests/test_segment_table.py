@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from src.model.segment_table import SegmentTable
+
+
+def horizontal_fits(points: np.ndarray, offsets: np.ndarray, first_segment: int) -> list:
+    """
+    Fits a horizontal plane through the z mean of each segment, keeping every point as an inlier
+    """
+    return [
+        (np.array([0, 0, 1, -points[start:end, 2].mean()]), np.arange(end - start))
+        for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+
+
+@pytest.fixture
+def segments() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(60, 3)) * [10, 10, 1]
+    points[20:40, 2] *= 5  # Rougher middle segment
+    return points, np.array([0, 20, 40, 60])
+
+
+def test_statistics_match_numpy(segments: tuple[np.ndarray, np.ndarray]) -> None:
+    points, offsets = segments
+
+    table = SegmentTable.from_fits(points, offsets, horizontal_fits(points, offsets, 0))
+
+    for i, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+        assert table.means[i] == pytest.approx(points[start:end, 2].mean())
+        assert table.VARs[i] == pytest.approx(points[start:end, 2].var(ddof=1))
+
+    np.testing.assert_array_equal(table.lengths, [20, 20, 20])
+    np.testing.assert_array_equal(table.inlier_counts, [20, 20, 20])
+
+
+def test_lazy_planes_match_eager_planes(segments: tuple[np.ndarray, np.ndarray]) -> None:
+    points, offsets = segments
+    eager = SegmentTable.from_fits(points, offsets, horizontal_fits(points, offsets, 0))
+    fitted_tables = []
+
+    lazy = SegmentTable(points, offsets, fit=horizontal_fits, on_fitted=fitted_tables.append)
+    np.testing.assert_array_equal(lazy.fitted, [False, False, False])
+
+    np.testing.assert_allclose(lazy.plane_model(1), eager.plane_model(1))
+    np.testing.assert_array_equal(lazy.fitted, [False, True, False])  # Only the plane that was used is fitted
+    assert not fitted_tables
+
+    lazy.fit_planes()
+    assert fitted_tables == [lazy]
+    np.testing.assert_allclose(lazy.residual_SDs, eager.residual_SDs)
+    np.testing.assert_array_equal(lazy.inlier_offsets, eager.inlier_offsets)
+    np.testing.assert_array_equal(lazy.gather_inliers([0, 2]), points[np.r_[0:20, 40:60]])
+
+
+def test_flag_rough_segments(segments: tuple[np.ndarray, np.ndarray]) -> None:
+    points, offsets = segments
+    table = SegmentTable(points, offsets, fit=horizontal_fits)
+
+    table.flag_lazily(2.5)
+    np.testing.assert_array_equal(table.fitted, [False, False, False])  # Nothing is fitted until flags are read
+
+    np.testing.assert_array_equal(table.flags, [False, True, False])
+    assert table.planes_fitted
+
+
+def test_planes_or_fit_required(segments: tuple[np.ndarray, np.ndarray]) -> None:
+    with pytest.raises(TypeError):
+        SegmentTable(*segments)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from src.processing.sliding_window import SlidingWindowFitter
+
+
+def test_planes_of_a_plane() -> None:
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 100, size=(1_000, 2))
+    points = np.column_stack((xy, 0.5 * xy[:, 0] - 0.25 * xy[:, 1] + 3))
+    fitter = SlidingWindowFitter(window_size=300, stride=100)
+
+    plane_coefficients, residual_SDs = fitter.fit(points, fitter.block_offsets(len(points)))
+
+    assert len(plane_coefficients) == 10
+    expected = np.array([-0.5, 0.25, 1, -3]) / np.sqrt(1.3125)
+    np.testing.assert_allclose(plane_coefficients, np.tile(expected, (10, 1)), atol=1e-9)
+    np.testing.assert_allclose(residual_SDs, 0, atol=1e-5)  # Square root of the rounding error of the window sums
+
+
+def test_windows_match_a_direct_fit() -> None:
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(500, 3)) * [50, 5, 1]
+    fitter = SlidingWindowFitter(window_size=300, stride=100)
+
+    plane_coefficients, residual_SDs = fitter.fit(points, fitter.block_offsets(len(points)))
+
+    # Block 2 is the centre of the window of blocks 1 to 3, block 0 of the window clipped to blocks 0 and 1
+    for block, (start, end) in ((2, (100, 400)), (0, (0, 200))):
+        window = points[start:end]
+        design = np.column_stack((window[:, 0], window[:, 1], np.ones(len(window))))
+        (alpha, beta, gamma), residuals, _, _ = np.linalg.lstsq(design, window[:, 2], rcond=None)
+        expected = np.array([-alpha, -beta, 1, -gamma]) / np.sqrt(alpha ** 2 + beta ** 2 + 1)
+
+        np.testing.assert_allclose(plane_coefficients[block], expected, atol=1e-9)
+        assert residual_SDs[block] == pytest.approx(np.sqrt(residuals[0] / (len(window) - 3)))
+
+
+def test_fit_blocks_scores_every_point() -> None:
+    points = np.random.default_rng(2).normal(size=(250, 3))
+    fitter = SlidingWindowFitter(window_size=100, stride=100)
+
+    fits = fitter.fit_blocks(points, fitter.block_offsets(len(points)))
+
+    assert [len(inlier_indexes) for _, inlier_indexes in fits] == [100, 100, 50]
+
+
+def test_invalid_settings() -> None:
+    with pytest.raises(TypeError):
+        SlidingWindowFitter(window_size=100.0, stride=10)
+
+    with pytest.raises(ValueError):
+        SlidingWindowFitter(window_size=5, stride=10)
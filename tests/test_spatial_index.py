@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.processing.spatial_index import SpatialIndex
+
+
+@pytest.fixture
+def points() -> np.ndarray:
+    return np.random.default_rng(0).uniform(0, 100, size=(2_000, 3))
+
+
+def test_box(points: np.ndarray) -> None:
+    index = SpatialIndex(points, cell_size=7)
+
+    expected = np.flatnonzero(np.all((points[:, :2] >= [20, 30]) & (points[:, :2] <= [45, 60]), axis=1))
+    np.testing.assert_array_equal(index.box([20, 30], [45, 60]), expected)
+
+    expected = np.flatnonzero(np.all((points >= [20, 30, 10]) & (points <= [45, 60, 50]), axis=1))
+    np.testing.assert_array_equal(index.box([20, 30, 10], [45, 60, 50]), expected)
+
+
+def test_radius(points: np.ndarray) -> None:
+    index = SpatialIndex(points, cell_size=7)
+    center = np.array([50, 50, 50])
+
+    expected = np.flatnonzero(np.linalg.norm(points - center, axis=1) <= 15)
+    np.testing.assert_array_equal(index.radius(center, 15), expected)
+
+
+def test_nearest(points: np.ndarray) -> None:
+    index = SpatialIndex(points, cell_size=7)
+    point = np.array([10, 90, 50])
+
+    indexes, distances = index.nearest(point, k=5)
+
+    distances_to_all = np.linalg.norm(points - point, axis=1)
+    np.testing.assert_array_equal(indexes, np.argsort(distances_to_all)[:5])
+    np.testing.assert_allclose(distances, np.sort(distances_to_all)[:5])
+    assert len(index.nearest(point, k=len(points) + 1)[0]) == len(points)
+
+
+def test_adjacent() -> None:
+    # Four segments in a row along x, one cell apart, and one far away
+    points = np.array([[x, 0, 0] for x in (0.5, 1.5, 2.5, 3.5, 9.5)], dtype=np.float64)
+    index = SpatialIndex(points, cell_size=1, labels=np.array([0, 1, 2, 3, 4]))
+
+    np.testing.assert_array_equal(index.adjacent(1), [0, 2])
+    np.testing.assert_array_equal(index.adjacent(4), [])
+    np.testing.assert_array_equal(index.adjacent(7), [])
+
+    with pytest.raises(TypeError):
+        SpatialIndex(points, cell_size=1).adjacent(0)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from src.model.statistics_index import StatisticsIndex
+
+
+def make_index(residual_SDs: list) -> StatisticsIndex:
+    count = len(residual_SDs)
+    return StatisticsIndex({
+        "mean": np.arange(count, dtype=np.float64),
+        "SD": np.ones(count),
+        "SE": np.ones(count),
+        "residual_SD": np.array(residual_SDs, dtype=np.float64),
+        "inlier_count": np.full(count, 10),
+    })
+
+
+def test_above_skips_nan() -> None:
+    index = make_index([3.0, np.nan, 1.0, 5.0, 2.0])
+
+    np.testing.assert_array_equal(index.above("residual_SD", 2.0), [0, 3])
+    np.testing.assert_array_equal(index.above("residual_SD", -np.inf), [0, 2, 3, 4])
+
+
+def test_range_is_exclusive() -> None:
+    index = make_index([3.0, np.nan, 1.0, 5.0, 2.0])
+
+    np.testing.assert_array_equal(index.range("residual_SD", 1.0, 5.0), [0, 4])
+    np.testing.assert_array_equal(index.range("mean", 3.0, 1.0), [])
+    np.testing.assert_array_equal(index.mask(index.range("mean", upper_bound=2.0)), [True, True, False, False, False])
+
+
+def test_columns_are_resolved_on_first_query() -> None:
+    calls = []
+    columns = {name: np.zeros(3) for name in StatisticsIndex.COLUMNS}
+    columns["residual_SD"] = lambda: calls.append(1) or np.array([0.5, 2.0, 1.0])
+    index = StatisticsIndex(columns)
+
+    np.testing.assert_array_equal(index.above("SD", 0), [])
+    assert not calls
+
+    np.testing.assert_array_equal(index.above("residual_SD", 0.9), [1, 2])
+    np.testing.assert_array_equal(index.above("residual_SD", 1.5), [1])
+    assert len(calls) == 1
+
+
+def test_invalid_columns() -> None:
+    with pytest.raises(ValueError):
+        StatisticsIndex({"mean": np.zeros(3)})
+
+    with pytest.raises(ValueError):
+        make_index([1.0]).above("median", 0)
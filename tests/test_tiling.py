@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.processing.tiling import Tiler
+
+
+def test_index_mode_splits_rows() -> None:
+    points = np.arange(30, dtype=np.float64).reshape(10, 3)
+
+    tiling = Tiler(mode="index", rows_per_split=4).tile(points)
+
+    np.testing.assert_array_equal(tiling.offsets, [0, 4, 8, 10])
+    np.testing.assert_array_equal(tiling.order, np.arange(10))
+    assert list(tiling) == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_grid_mode_groups_points_by_cell() -> None:
+    points = np.array([[0.5, 0.5, 0], [1.5, 0.5, 0], [0.2, 0.7, 0], [1.5, 1.5, 0], [0.1, 1.9, 0], [1.9, 0.1, 0]])
+
+    tiling = Tiler(mode="grid", tile_size=1).tile(points)
+
+    assert len(tiling) == 4
+    np.testing.assert_array_equal(tiling.lengths, [2, 2, 1, 1])
+    np.testing.assert_array_equal(tiling.order, [0, 2, 1, 5, 4, 3])  # Stable inside a tile
+
+
+def test_along_track_mode_bins_along_the_driving_direction() -> None:
+    distance = np.array([9.5, 0.5, 3.5, 1.5, 6.5, 2.5])
+    points = np.column_stack((distance, 2 * distance, np.zeros_like(distance))) / np.sqrt(5)
+
+    tiling = Tiler(mode="along_track", tile_size=3).tile(points)
+
+    np.testing.assert_array_equal(tiling.lengths, [3, 1, 1, 1])
+    assert set(tiling.order[:3]) == {1, 3, 5}
+
+
+def test_empty_points() -> None:
+    tiling = Tiler(mode="grid", tile_size=1).tile(np.empty((0, 3)))
+
+    assert len(tiling) == 0
+    np.testing.assert_array_equal(tiling.offsets, [0])
+
+
+def test_invalid_settings() -> None:
+    with pytest.raises(ValueError):
+        Tiler(mode="hexagon")
+
+    with pytest.raises(ValueError):
+        Tiler(mode="index").tile(np.zeros((3, 3)))  # Rows per split are required in 'index' mode